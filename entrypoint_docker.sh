@@ -1,4 +1,4 @@
 #!/bin/sh
 
 flask one-time-db
-exec gunicorn -w 4 -b :5000 app:app
+exec gunicorn -w 4 -k gthread --threads 16 -b :5000 app:app
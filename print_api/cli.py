@@ -2,13 +2,29 @@ import os
 import subprocess
 import time
 import urllib.parse
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 
 import click
-from sqlalchemy import inspect
+import orjson
+from flask import json
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import inspect, text
+
+from print_api.common.analytics import refresh_rollups
+from print_api.common.imports import (
+    IMPORT_FORMATS,
+    detect_format,
+    import_jobs,
+    open_import_file,
+    read_records,
+)
+from print_api.common.routing import JSON_OPTIONS
+from print_api.common.serializers import compile_serializer
 
 from print_api.models import (
     db,
+    DB_EXTENSIONS,
+    create_extensions,
     Role,
     Permission,
     RolePermission,
@@ -16,7 +32,10 @@ from print_api.models import (
     Printer,
     PrinterType,
     PrinterLocation,
+    PrintJob,
+    PrintJobSchema,
 )
+from print_api.models.print_jobs import JobStatus, ProjectTypes
 
 
 def register_commands(app):
@@ -106,6 +125,11 @@ def register_commands(app):
         """Drop the database."""
         drop_db()
 
+    @app.cli.command("create-db-extensions")
+    def meta_create_db_extensions():
+        """Create the postgres extensions the models depend on, run before migrating."""
+        create_db_extensions()
+
     @app.cli.command("init-db")
     def meta_init_db():
         """Initialise the database."""
@@ -193,6 +217,50 @@ def register_commands(app):
                 click.style(f"Cleared {num_deleted} blacklisted tokens.", fg="green")
             )
 
+    @app.cli.command("backfill-requeue-counts")
+    def meta_backfill_requeue_counts():
+        """Set the requeue count of existing jobs from the 'Requeue #' lines of their queue notes."""
+        backfill_requeue_counts()
+
+    @app.cli.command("import-jobs")
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False))
+    @click.option(
+        "--format",
+        "fmt",
+        type=click.Choice(IMPORT_FORMATS),
+        default=None,
+        help="Format of the file, taken from its extension by default.",
+    )
+    def meta_import_jobs(path, fmt):
+        """Import print jobs from a CSV or NDJSON file (optionally gzipped), committing every batch."""
+        import_jobs_file(path, fmt)
+
+    @app.cli.command("refresh-analytics")
+    @click.option("--full", is_flag=True, help="Rebuild every day, not only the changed ones.")
+    def meta_refresh_analytics(full):
+        """Bring the analytics rollups up to date with the print jobs."""
+        refresh_analytics(full)
+
+    @app.cli.command("benchmark-job-indexes")
+    @click.option("--rows", default=1000000, help="Number of print jobs to seed.")
+    def meta_benchmark_job_indexes(rows):
+        """Show the query plans of the hot print job queries with and without their indexes."""
+        if click.confirm(
+            click.style(
+                "This seeds and rolls back a large number of rows and locks the print_jobs table "
+                "while it runs. Only run it against a development database. Continue?",
+                fg="red",
+            ),
+            abort=True,
+        ):
+            benchmark_job_indexes(rows)
+
+    @app.cli.command("benchmark-serialization")
+    @click.option("--rows", default=10000, help="Number of print jobs to serialize.")
+    def meta_benchmark_serialization(rows):
+        """Compare the compiled print job serializer and JSON encoder against marshmallow and flask.json."""
+        benchmark_serialization(rows)
+
 
 def seed_default_printers():
     """Seed the database with default printers."""
@@ -458,6 +526,13 @@ def drop_db():
     click.echo(click.style("Dropped the database.", fg="red"))
 
 
+def create_db_extensions():
+    """Create the postgres extensions the models depend on."""
+    create_extensions(db.metadata, db.session.connection())
+    db.session.commit()
+    click.echo(click.style(f"Created extensions: {', '.join(DB_EXTENSIONS)}", fg="green"))
+
+
 def init_db():
     """Initialize the database."""
     db.create_all()
@@ -545,6 +620,224 @@ def restore_db(app):
         click.echo(click.style(f"Error: {e}", fg="red"))
 
 
+def backfill_requeue_counts():
+    """
+    Count the 'Requeue #' lines that used to be appended to queue notes into requeue_count, for jobs
+    requeued before the counter existed
+    """
+    result = db.session.execute(
+        text(
+            "UPDATE print_jobs SET requeue_count = sub.n FROM ("
+            "SELECT id, (SELECT count(*) FROM regexp_matches(queue_notes, 'Requeue #\\d+', 'g')) AS n "
+            "FROM print_jobs WHERE queue_notes LIKE '%Requeue #%'"
+            ") AS sub WHERE print_jobs.id = sub.id AND print_jobs.requeue_count < sub.n"
+        )
+    )
+    db.session.commit()
+    click.echo(click.style(f"Backfilled {result.rowcount} print jobs.", fg="green"))
+
+
+def refresh_analytics(full=False):
+    """
+    Rebuild the analytics rollups of the days jobs changed since the last refresh, or every day
+    """
+    refreshed = refresh_rollups(full)
+    db.session.commit()
+    if not refreshed:
+        click.echo(click.style("Another analytics refresh is running.", fg="red"))
+        return
+    click.echo(click.style("Refreshed the analytics rollups.", fg="green"))
+
+
+def import_jobs_file(path, fmt=None):
+    """
+    Import the print job records of a file, each batch is committed as soon as it is inserted
+    """
+    fmt = fmt or detect_format(path)
+    if fmt is None:
+        click.echo(click.style("Unknown file type, pass --format.", fg="red"))
+        return
+
+    imported = skipped = 0
+    start = time.perf_counter()
+    try:
+        with open(path, "rb") as raw_file:
+            file = open_import_file(raw_file, path)
+            for count, errors in import_jobs(read_records(file, fmt)):
+                db.session.commit()
+                imported += count
+                skipped += len(errors)
+                for number, messages in errors.items():
+                    click.echo(click.style(f"Record {number} skipped: {messages}", fg="red"))
+    except (ValueError, OSError) as e:
+        db.session.rollback()
+        click.echo(click.style(f"Stopped after {imported} print jobs: {e}", fg="red"))
+        return
+    elapsed = time.perf_counter() - start
+    click.echo(
+        click.style(
+            f"Imported {imported} print jobs ({skipped} skipped) in {elapsed:.1f}s "
+            f"({imported / elapsed:.0f} jobs/s).",
+            fg="green",
+        )
+    )
+
+
+BENCHMARK_USERS = 1000
+
+BENCHMARK_QUERIES = {
+    "Jobs by status (keyset page)": (
+        "SELECT * FROM print_jobs WHERE status = 'queued' "
+        "ORDER BY date_added, id LIMIT 100"
+    ),
+    "Running on printer": (
+        "SELECT EXISTS (SELECT 1 FROM print_jobs WHERE status = 'running' AND printer = :printer_id)"
+    ),
+    "Jobs by user (keyset page)": (
+        "SELECT * FROM print_jobs WHERE user_id = :user_id "
+        "ORDER BY date_added, id LIMIT 100"
+    ),
+    "Jobs by rep (keyset page)": (
+        "SELECT * FROM print_jobs WHERE rep_check = :user_id "
+        "ORDER BY date_added, id LIMIT 100"
+    ),
+}
+
+
+# Terms of the benchmarked job search, they match a job name and the name of its owner
+BENCHMARK_SEARCH = "Benchmark 4242"
+
+
+def benchmark_job_indexes(rows):
+    """
+    Seed the print_jobs table with a synthetic history, print the plans of the hot queries with and
+    without the print_jobs indexes, then roll everything back.
+    """
+    session = db.session
+    try:
+        click.echo(click.style(f"Seeding {BENCHMARK_USERS} users...", fg="yellow"))
+        user_ids = session.execute(
+            text(
+                "INSERT INTO users (email, uid, name, user_score, is_rep, score_editable, completed_count, "
+                "failed_count, rejected_count, slice_completed_count, slice_failed_count, slice_rejected_count) "
+                "SELECT 'bench_' || g || '@bench.local', 'bnch' || g, 'Benchmark ' || g, 0, true, true, "
+                "0, 0, 0, 0, 0, 0 FROM generate_series(1, :n) AS g RETURNING id"
+            ),
+            {"n": BENCHMARK_USERS},
+        ).scalars().all()
+        first_user = min(user_ids)
+        printer_id = session.execute(text("SELECT min(id) FROM printers")).scalar()
+
+        click.echo(click.style(f"Seeding {rows} print jobs...", fg="yellow"))
+        start = time.perf_counter()
+        session.execute(
+            text(
+                "INSERT INTO print_jobs (gcode_slug, filament_usage, print_name, print_time, printer_type, "
+                "project, user_id, rep_check, date_added, printer, status) "
+                "SELECT 'bench_' || g, g % 500, 'Benchmark ' || g, g % 36000, 'prusa', 'personal', "
+                ":first_user + g % :users, :first_user + (g * 7) % :users, "
+                "now() - make_interval(secs => g), "
+                "CASE WHEN g % 1000 = 0 THEN CAST(:printer_id AS integer) END, "
+                "(CASE WHEN g % 1000 = 0 THEN 'running' WHEN g % 100 = 0 THEN 'queued' "
+                "WHEN g % 50 = 0 THEN 'under_review' WHEN g % 10 = 0 THEN 'failed' "
+                "WHEN g % 25 = 0 THEN 'rejected' ELSE 'completed' END)::jobstatus "
+                "FROM generate_series(1, :n) AS g"
+            ),
+            {
+                "n": rows,
+                "first_user": first_user,
+                "users": BENCHMARK_USERS,
+                "printer_id": printer_id,
+            },
+        )
+        session.execute(text("ANALYZE users"))
+        session.execute(text("ANALYZE print_jobs"))
+        click.echo(f"Seeded in {time.perf_counter() - start:.1f}s")
+
+        params = {"printer_id": printer_id, "user_id": first_user + 1}
+        # The search is benchmarked with the exact statement the search endpoint runs
+        search = PrintJob.search_statement(BENCHMARK_SEARCH, 20).compile(dialect=db.engine.dialect)
+
+        def print_plan(name, plan):
+            click.echo(click.style(f"\n{name}", fg="yellow"))
+            for line in plan.scalars():
+                click.echo(f"  {line}")
+
+        def explain_all(heading):
+            click.echo(click.style(f"\n{heading}", fg="green", bold=True))
+            for name, query in BENCHMARK_QUERIES.items():
+                print_plan(
+                    name, session.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {query}"), params)
+                )
+            print_plan(
+                "Job search",
+                session.connection().exec_driver_sql(
+                    f"EXPLAIN (ANALYZE, BUFFERS) {search}", search.params
+                ),
+            )
+
+        explain_all("With print_jobs indexes:")
+
+        for index in PrintJob.__table__.indexes:
+            session.execute(text(f"DROP INDEX {index.name}"))
+        session.execute(text("ANALYZE print_jobs"))
+
+        explain_all("Without print_jobs indexes:")
+    finally:
+        session.rollback()
+        click.echo(click.style("\nRolled back benchmark data.", fg="green"))
+
+
+def benchmark_serialization(rows):
+    """
+    Serialize a list of in memory print jobs with PrintJobSchema and with the compiled serializer, then
+    encode the result with flask.json and with the response encoder. Nothing touches the database.
+    """
+    schema = PrintJobSchema()
+    serialize = compile_serializer(schema)
+    now = datetime.now(timezone.utc)
+    statuses = list(JobStatus)
+    jobs = []
+    for i in range(rows):
+        job = PrintJob(
+            {
+                "gcode_slug": f"bench_{i}",
+                "filament_usage": i % 500,
+                "print_name": f"Benchmark {i}",
+                "print_time": i % 36000,
+                "printer_type": PrinterType.prusa,
+                "project": ProjectTypes.personal,
+                "user_id": i % 1000,
+                "rep_check": (i * 7) % 1000,
+                "status": JobStatus.approval,
+                "stl_slug": f"bench_{i}",
+            }
+        )
+        job.id = i
+        job.status = statuses[i % len(statuses)]
+        job.date_added = now - timedelta(seconds=i)
+        jobs.append(job)
+
+    def timed(name, fn):
+        start = time.perf_counter()
+        result = fn()
+        click.echo(f"  {name:<32} {(time.perf_counter() - start) * 1000:8.1f}ms")
+        return result
+
+    click.echo(click.style(f"Serializing {rows} print jobs", fg="green", bold=True))
+    slow = timed("PrintJobSchema.dump per row", lambda: [schema.dump(job) for job in jobs])
+    timed("PrintJobSchema.dump(many=True)", lambda: schema.dump(jobs, many=True))
+    fast = timed("compiled serializer", lambda: [serialize(job) for job in jobs])
+    if slow != fast:
+        click.echo(click.style("Compiled serializer output differs from PrintJobSchema!", fg="red"))
+        return
+
+    click.echo(click.style("Encoding the serialized jobs", fg="green", bold=True))
+    res = {"payload": {"data": {"print_jobs": fast}}}
+    timed("flask.json.dumps", lambda: json.dumps(res))
+    timed("orjson.dumps", lambda: orjson.dumps(res, default=DefaultJSONProvider.default, option=JSON_OPTIONS))
+
+
 SEED_FUNCTIONS = {
     "Auth": seed_default_auth,
     "Printers": seed_default_printers,
@@ -0,0 +1,204 @@
+import logging
+from datetime import datetime, time, timedelta, timezone
+
+from sqlalchemy import (
+    Integer,
+    and_,
+    cast,
+    delete,
+    extract,
+    func,
+    insert,
+    literal,
+    literal_column,
+    select,
+    union,
+    union_all,
+)
+
+from print_api.models import (
+    AnalyticsWatermark,
+    DailyJobStats,
+    PrintJob,
+    PrinterDailyStats,
+    RepDailyStats,
+    db,
+)
+
+logger = logging.getLogger()
+
+ROLLUP_WATERMARK = "daily_rollups"
+# Key of the advisory lock that keeps two refreshes from rebuilding the same days at once
+REFRESH_LOCK_ID = 24_024
+
+
+def utc_day(column):
+    """
+    Function to build the SQL expression of the UTC day of a timestamp
+    :param column: the timestamp column
+    :return clause: the day as a date
+    """
+    # Inlined rather than bound so the same expression can be grouped by
+    return cast(func.timezone(literal_column("'UTC'"), column), db.Date)
+
+
+def changed_days(jobs, since, until):
+    """
+    Function to build the query of every day a job changed between two versions counts towards,
+    that is the days it was added, started and ended
+    :param jobs: the subquery of all jobs
+    :param int since: the inclusive lower version
+    :param int until: the exclusive upper version
+    :return statement: select of the distinct days
+    """
+    changed = and_(jobs.c.version >= since, jobs.c.version < until)
+    return union(
+        *(
+            select(utc_day(column).label("day")).where(changed, column.is_not(None))
+            for column in (jobs.c.date_added, jobs.c.date_started, jobs.c.date_ended)
+        )
+    )
+
+
+def _in_days(column, days):
+    """
+    Function to build the condition that a timestamp falls on one of a set of UTC days
+    :param column: the timestamp column
+    :param list days: the days, or None for a full rebuild
+    :return clause: the condition
+    """
+    if days is None:
+        return column.is_not(None)
+    # The range lets the timestamp indexes narrow the rows down before the days are compared
+    start = datetime.combine(min(days), time.min, tzinfo=timezone.utc)
+    end = datetime.combine(max(days) + timedelta(days=1), time.min, tzinfo=timezone.utc)
+    return and_(column >= start, column < end, utc_day(column).in_(days))
+
+
+def _in_rollup_days(day, days):
+    return day.is_not(None) if days is None else day.in_(days)
+
+
+def rebuild_daily_job_stats(jobs, days):
+    """
+    Function to rebuild the jobs added and started, and the queue wait, of some days
+    :param jobs: the subquery of all jobs
+    :param list days: the days to rebuild, or None for every day
+    """
+    added_day = utc_day(jobs.c.date_added)
+    started_day = utc_day(jobs.c.date_started)
+    events = union_all(
+        select(
+            added_day.label("day"),
+            literal(1).label("added"),
+            literal(0).label("started"),
+            literal(0).label("wait"),
+        ).where(_in_days(jobs.c.date_added, days)),
+        select(
+            started_day.label("day"),
+            literal(0),
+            literal(1),
+            cast(extract("epoch", jobs.c.date_started - jobs.c.date_added), Integer),
+        ).where(_in_days(jobs.c.date_started, days)),
+    ).subquery()
+    db.session.execute(delete(DailyJobStats).where(_in_rollup_days(DailyJobStats.day, days)))
+    db.session.execute(
+        insert(DailyJobStats).from_select(
+            ["day", "jobs_added", "jobs_started", "wait_seconds"],
+            select(
+                events.c.day,
+                func.sum(events.c.added),
+                func.sum(events.c.started),
+                func.coalesce(func.sum(events.c.wait), 0),
+            ).group_by(events.c.day),
+        )
+    )
+
+
+def rebuild_printer_daily_stats(jobs, days):
+    """
+    Function to rebuild the completed and failed jobs of every printer on some days
+    :param jobs: the subquery of all jobs
+    :param list days: the days to rebuild, or None for every day
+    """
+    day = utc_day(jobs.c.date_ended)
+    db.session.execute(
+        delete(PrinterDailyStats).where(_in_rollup_days(PrinterDailyStats.day, days))
+    )
+    db.session.execute(
+        insert(PrinterDailyStats).from_select(
+            ["day", "printer_id", "completed_count", "failed_count", "filament_used", "print_seconds"],
+            select(
+                day,
+                jobs.c.printer,
+                func.count().filter(jobs.c.status == "completed"),
+                func.count().filter(jobs.c.status == "failed"),
+                func.sum(jobs.c.filament_usage),
+                func.sum(jobs.c.print_time),
+            )
+            .where(
+                _in_days(jobs.c.date_ended, days),
+                jobs.c.printer.is_not(None),
+                jobs.c.status.in_(["completed", "failed"]),
+            )
+            .group_by(day, jobs.c.printer),
+        )
+    )
+
+
+def rebuild_rep_daily_stats(jobs, days):
+    """
+    Function to rebuild the outcomes of the jobs every rep checked on some days
+    :param jobs: the subquery of all jobs
+    :param list days: the days to rebuild, or None for every day
+    """
+    day = utc_day(jobs.c.date_ended)
+    db.session.execute(delete(RepDailyStats).where(_in_rollup_days(RepDailyStats.day, days)))
+    db.session.execute(
+        insert(RepDailyStats).from_select(
+            ["day", "rep_id", "completed_count", "failed_count", "rejected_count"],
+            select(
+                day,
+                jobs.c.rep_check,
+                func.count().filter(jobs.c.status == "completed"),
+                func.count().filter(jobs.c.status == "failed"),
+                func.count().filter(jobs.c.status == "rejected"),
+            )
+            .where(
+                _in_days(jobs.c.date_ended, days),
+                jobs.c.status.in_(["completed", "failed", "rejected"]),
+            )
+            .group_by(day, jobs.c.rep_check),
+        )
+    )
+
+
+ROLLUPS = (rebuild_daily_job_stats, rebuild_printer_daily_stats, rebuild_rep_daily_stats)
+
+
+def refresh_rollups(full=False):
+    """
+    Function to bring the analytics rollups up to date. Only the days that jobs changed since the
+    last refresh count towards are rebuilt, from the queued and archived jobs, unless full is set or
+    the rollups were never built. Nothing is committed.
+    :param bool full: rebuild every day instead of only the changed ones
+    :return bool refreshed: False if another refresh is running and this one was skipped
+    """
+    if not db.session.execute(select(func.pg_try_advisory_xact_lock(REFRESH_LOCK_ID))).scalar():
+        return False
+
+    until = PrintJob.get_visible_version()
+    since = AnalyticsWatermark.get_version(ROLLUP_WATERMARK)
+    jobs = PrintJob.all_jobs_subquery()
+    if full or since is None:
+        days = None
+        logger.info("Rebuilding every day of the analytics rollups")
+    else:
+        days = db.session.execute(changed_days(jobs, since, until)).scalars().all()
+        logger.info(f"Rebuilding {len(days)} days of the analytics rollups")
+
+    if days is None or days:
+        for rebuild in ROLLUPS:
+            rebuild(jobs, days)
+    AnalyticsWatermark.set_version(ROLLUP_WATERMARK, until)
+    return True
@@ -0,0 +1,71 @@
+from dataclasses import dataclass
+
+from flask import current_app
+
+from print_api.models import User
+from print_api.models.print_jobs import JobStatus
+
+
+@dataclass(frozen=True)
+class AutoreviewPolicy:
+    """
+    Thresholds deciding whether a new job can skip review and go straight to the queue
+    """
+
+    fail_threshold: float
+    start_threshold: int
+    time_threshold: int
+
+    @staticmethod
+    def from_config(config):
+        """
+        Function to build the policy from the AUTOREVIEW_* config values
+        :param config: the flask config
+        :return AutoreviewPolicy policy: the policy
+        """
+        return AutoreviewPolicy(
+            fail_threshold=config["AUTOREVIEW_FAIL_THRESHOLD"],
+            start_threshold=config["AUTOREVIEW_START_THRESHOLD"],
+            time_threshold=config["AUTOREVIEW_TIME_THRESHOLD"],
+        )
+
+    def classify(self, rep, print_time):
+        """
+        Function to decide the status of a new job. It is queued when its rep has checked enough
+        prints, few enough of those failed or were rejected, and the print is short enough.
+        :param rep: the user who checked the slicing of the job, or None if they do not exist
+        :param int print_time: the print time of the job in seconds
+        :return JobStatus status: queued or under_review
+        """
+        if rep is None:
+            return JobStatus.under_review
+        total_jobs = (
+            rep.slice_completed_count + rep.slice_failed_count + rep.slice_rejected_count
+        )
+        if total_jobs == 0 or total_jobs < self.start_threshold:
+            return JobStatus.under_review
+        fail_rate = (rep.slice_failed_count + rep.slice_rejected_count) / total_jobs
+        if fail_rate < self.fail_threshold and print_time < self.time_threshold:
+            return JobStatus.queued
+        return JobStatus.under_review
+
+    def classify_jobs(self, jobs):
+        """
+        Function to decide the status of many new jobs, fetching all their reps in one query
+        :param list jobs: (rep PK, print time) tuples
+        :return list statuses: the JobStatus of each job in order
+        """
+        reps = User.get_users_by_ids([rep_id for rep_id, _ in jobs])
+        return [self.classify(reps.get(rep_id), print_time) for rep_id, print_time in jobs]
+
+
+def get_autoreview_policy():
+    """
+    Function to get the autoreview policy of the current app, built from its config on first use
+    :return AutoreviewPolicy policy: the policy
+    """
+    policy = current_app.extensions.get("autoreview_policy")
+    if policy is None:
+        policy = AutoreviewPolicy.from_config(current_app.config)
+        current_app.extensions["autoreview_policy"] = policy
+    return policy
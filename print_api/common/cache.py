@@ -2,6 +2,19 @@ import json
 from urllib.parse import urlparse
 
 import redis
+from flask import current_app
+
+
+def get_redis():
+    """
+    Function to get the redis client shared by the application for events and versions
+    :return redis client: the client connected to REDIS_URI
+    """
+    if "redis" not in current_app.extensions:
+        current_app.extensions["redis"] = redis.Redis.from_url(
+            current_app.config["REDIS_URI"]
+        )
+    return current_app.extensions["redis"]
 
 
 class RedisCache(object):
@@ -0,0 +1,163 @@
+import heapq
+import threading
+from collections import defaultdict, namedtuple
+
+from print_api.common.etags import get_table_versions
+from print_api.models import PrintJob
+
+FIFO = "fifo"
+SHORTEST_FIRST = "shortest"
+FAIR_SHARE = "fair_share"
+POLICIES = (FIFO, SHORTEST_FIRST, FAIR_SHARE)
+DEFAULT_POLICY = FIFO
+
+# The dispatcher is rebuilt whenever either table has changed since it was last built
+DISPATCH_TABLES = ("print_jobs", "printers")
+
+QueuedJob = namedtuple(
+    "QueuedJob", ["id", "user_id", "printer_type", "print_time", "date_added"]
+)
+
+
+class JobHeap:
+    """
+    Queued jobs of one printer type in a binary heap ordered by a policy key
+    """
+
+    def __init__(self, jobs, key):
+        self._heap = [(key(job), job.id, job) for job in jobs]
+        heapq.heapify(self._heap)
+
+    def peek(self, count=1):
+        """
+        Function to get the next jobs without removing them
+        :param int count: the number of jobs to get
+        :return list jobs: up to count jobs, next first
+        """
+        if count == 1:
+            return [self._heap[0][2]] if self._heap else []
+        return [job for _, _, job in heapq.nsmallest(count, self._heap)]
+
+
+class FairShareQueue:
+    """
+    Queued jobs of one printer type shared between users. The user with the fewest running jobs is
+    served next, ties go to whoever has been waiting longest, and each user's jobs go oldest first.
+    """
+
+    def __init__(self, jobs, running_counts):
+        # jobs arrive oldest first, so every user's list is already in order
+        self._jobs = defaultdict(list)
+        for job in jobs:
+            self._jobs[job.user_id].append(job)
+        self._users = [
+            (running_counts.get(user_id, 0), user_jobs[0].date_added, user_jobs[0].id, user_id)
+            for user_id, user_jobs in self._jobs.items()
+        ]
+        heapq.heapify(self._users)
+
+    def peek(self, count=1):
+        """
+        Function to get the next jobs without removing them, counting each job handed out as running
+        :param int count: the number of jobs to get
+        :return list jobs: up to count jobs, next first
+        """
+        if count == 1:
+            return [self._jobs[self._users[0][3]][0]] if self._users else []
+
+        users = list(self._users)
+        served = defaultdict(int)
+        result = []
+        while users and len(result) < count:
+            running, _, _, user_id = heapq.heappop(users)
+            user_jobs = self._jobs[user_id]
+            result.append(user_jobs[served[user_id]])
+            served[user_id] += 1
+            if served[user_id] < len(user_jobs):
+                waiting = user_jobs[served[user_id]]
+                heapq.heappush(users, (running + 1, waiting.date_added, waiting.id, user_id))
+        return result
+
+
+class Dispatcher:
+    """
+    Suggests which queued job each printer should run next. The queued jobs are held in memory per
+    printer type and policy, and rebuilt from the database only when the print_jobs or printers
+    table versions move, so suggestions between changes cost a heap peek.
+
+    The heaps are rebuilt on read rather than updated from job events on purpose. Job events are
+    only delivered in-process to the worker that made the change, so heaps patched from them would
+    drift from the jobs changed by every other worker, while the table versions are shared through
+    Redis. A rebuild costs two indexed queries (the queued jobs and the printer occupancy) and an
+    O(n) heapify over the n queued jobs, paid once by the first read after a change. Printers that
+    become free are picked up by the next plan or suggest call, nothing is pushed to them.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions = None
+        self._jobs = {}
+        self._idle_printers = {}
+        self._running_counts = {}
+        self._queues = {}
+
+    def _refresh(self):
+        versions = get_table_versions(DISPATCH_TABLES)
+        if versions is not None and versions == self._versions:
+            return
+
+        jobs = defaultdict(list)
+        for row in PrintJob.get_queued_jobs():
+            jobs[row.printer_type].append(QueuedJob(*row))
+        idle_printers = defaultdict(list)
+        for printer, running_job_id in PrintJob.get_printer_occupancy():
+            if running_job_id is None:
+                idle_printers[printer.printer_type].append(printer.id)
+
+        self._jobs = jobs
+        self._idle_printers = idle_printers
+        self._running_counts = PrintJob.get_running_counts_by_user()
+        self._queues = {}
+        self._versions = versions
+
+    def _queue(self, printer_type, policy):
+        queue = self._queues.get((printer_type, policy))
+        if queue is None:
+            jobs = self._jobs.get(printer_type, [])
+            if policy == FAIR_SHARE:
+                queue = FairShareQueue(jobs, self._running_counts)
+            elif policy == SHORTEST_FIRST:
+                queue = JobHeap(jobs, key=lambda job: (job.print_time, job.date_added))
+            else:
+                queue = JobHeap(jobs, key=lambda job: job.date_added)
+            self._queues[(printer_type, policy)] = queue
+        return queue
+
+    def suggest(self, printer_type, policy=DEFAULT_POLICY, count=1):
+        """
+        Function to suggest the next queued jobs for a printer type
+        :param printer_type: the PrinterType of the printer that is free
+        :param str policy: one of POLICIES
+        :param int count: the number of jobs to suggest
+        :return list jobs: up to count QueuedJob, best first
+        """
+        with self._lock:
+            self._refresh()
+            return self._queue(printer_type, policy).peek(count)
+
+    def plan(self, policy=DEFAULT_POLICY):
+        """
+        Function to suggest a queued job for every idle printer
+        :param str policy: one of POLICIES
+        :return list plan: (printer id, QueuedJob) for every idle printer with a job to run
+        """
+        with self._lock:
+            self._refresh()
+            plan = []
+            for printer_type, printer_ids in self._idle_printers.items():
+                jobs = self._queue(printer_type, policy).peek(len(printer_ids))
+                plan.extend(zip(printer_ids, jobs))
+            return plan
+
+
+dispatcher = Dispatcher()
@@ -3,6 +3,7 @@ import time
 from flask import render_template
 
 from print_api.common import tasks
+from print_api.common.unit_of_work import after_commit
 from print_api.models import User
 
 COMPLETED_EMAIL_HEADER = "Your Print Has Finished"
@@ -27,8 +28,40 @@ def email(user_id, job_name, status):
     user = User.get_user_by_id(user_id)
     if user is None:
         return False
-    user_email = user.email
+    msg_data = render_email(user, job_name, status)
 
+    # Dispatch to Celery once the job change has been committed
+    after_commit(lambda: tasks.send_email.apply_async(kwargs={"msg_data": msg_data}))
+
+    return True
+
+
+def email_many(notifications):
+    """
+    Emails many users about their print jobs, looking the users up in one query and sending every
+    email from a single Celery task.
+    :param list notifications: (user id, job name, status) tuples
+    :return set missing: the ids of the users that were not found and so were not emailed
+    """
+    users = User.get_users_by_ids([user_id for user_id, _, _ in notifications])
+    messages = [
+        render_email(users[user_id], job_name, status)
+        for user_id, job_name, status in notifications
+        if user_id in users
+    ]
+    if messages:
+        after_commit(lambda: tasks.send_emails.apply_async(kwargs={"messages": messages}))
+    return {user_id for user_id, _, _ in notifications if user_id not in users}
+
+
+def render_email(user, job_name, status):
+    """
+    Renders the email telling a user about their print job.
+    :param user: The user to email
+    :param str job_name: The name of the job
+    :param str status: Either "completed", "failed" or "rejected".
+    :return dict msg_data: The subject, recipients and body of the email.
+    """
     if user.short_name is None:
         user_name = user.name
     else:
@@ -46,13 +79,8 @@ def email(user_id, job_name, status):
         timestamp=cur_time,
     )
 
-    msg_data = {
+    return {
         "subject": EMAIL_HEADERS[status],
-        "recipients": [user_email],
+        "recipients": [user.email],
         "body": email_body,
     }
-
-    # Dispatch to Celery
-    tasks.send_email.apply_async(kwargs={"msg_data": msg_data})
-
-    return True
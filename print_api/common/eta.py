@@ -0,0 +1,131 @@
+import heapq
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+
+import redis
+
+from print_api.common.cache import get_redis
+from print_api.common.events import on_job_event
+from print_api.models import PrintJob, Printer, PrinterType
+
+logger = logging.getLogger()
+
+ETA_CACHE_PREFIX = "print_api_eta:"
+ETA_GENERATION_PREFIX = "print_api_eta_generation:"
+# Estimates drift as running jobs overrun, so they are recomputed at least this often
+ETA_CACHE_SECONDS = 60
+
+
+def simulate_queue(queued_jobs, running_jobs, printer_count, now):
+    """
+    Function to estimate when each queued job of a printer type starts and finishes. Every printer is
+    held in a heap by the time it becomes free, each queued job in turn takes the first free printer.
+    :param list queued_jobs: (id, print_time) of the queued jobs in queue order
+    :param list running_jobs: (date_started, print_time) of the running jobs
+    :param int printer_count: the number of printers of the type
+    :param datetime now: the time to estimate from
+    :return list estimates: (id, estimated start, estimated finish) for every queued job
+    """
+    if printer_count == 0:
+        return [(job_id, None, None) for job_id, _ in queued_jobs]
+
+    free_at = [
+        max(now, (date_started or now) + timedelta(seconds=print_time))
+        for date_started, print_time in running_jobs
+    ]
+    free_at += [now] * max(printer_count - len(free_at), 0)
+    heapq.heapify(free_at)
+
+    estimates = []
+    for job_id, print_time in queued_jobs:
+        start = heapq.heappop(free_at)
+        finish = start + timedelta(seconds=print_time)
+        heapq.heappush(free_at, finish)
+        estimates.append((job_id, start, finish))
+    return estimates
+
+
+def compute_estimates(printer_type):
+    """
+    Function to estimate the start and finish of every queued job of a printer type from the database
+    :param printer_type: the PrinterType to estimate
+    :return list estimates: the serialized estimates in queue order
+    """
+    queued_jobs = [(row.id, row.print_time) for row in PrintJob.get_queued_jobs(printer_type)]
+    estimates = simulate_queue(
+        queued_jobs,
+        PrintJob.get_running_jobs(printer_type),
+        Printer.get_printer_count_by_type(printer_type),
+        datetime.now(timezone.utc),
+    )
+    return [
+        {
+            "id": job_id,
+            "printer_type": printer_type.name,
+            "estimated_start": start.isoformat() if start else None,
+            "estimated_finish": finish.isoformat() if finish else None,
+        }
+        for job_id, start, finish in estimates
+    ]
+
+
+def get_estimates(printer_type):
+    """
+    Function to get the estimates of a printer type, from the cache when nothing has changed since
+    they were computed. The cache key carries a generation that every job event of the type moves on,
+    so estimates computed concurrently with a change are never read back.
+
+    A change is handled by recomputing the whole type rather than patching the cached estimates.
+    Every queued job behind the changed one can move, since it may now take a different printer, so
+    a patch would redo most of the simulation anyway, and events carry only the new state of the
+    job. A recompute is two indexed queries and O(n log p) for n queued jobs on p printers, paid by
+    the first read after a change and at most once a minute otherwise.
+    :param printer_type: the PrinterType to estimate
+    :return list estimates: the serialized estimates in queue order
+    """
+    try:
+        client = get_redis()
+        generation = int(client.get(ETA_GENERATION_PREFIX + printer_type.name) or 0)
+        key = f"{ETA_CACHE_PREFIX}{printer_type.name}:{generation}"
+        cached = client.get(key)
+        if cached is not None:
+            return json.loads(cached)
+    except redis.RedisError as e:
+        logger.warning(f"Could not read cached estimates for {printer_type.name}: {e}")
+        return compute_estimates(printer_type)
+
+    estimates = compute_estimates(printer_type)
+    try:
+        client.set(key, json.dumps(estimates), ex=ETA_CACHE_SECONDS)
+    except redis.RedisError as e:
+        logger.warning(f"Could not cache estimates for {printer_type.name}: {e}")
+    return estimates
+
+
+def get_all_estimates():
+    """
+    Function to get the estimates of every queued job across all printer types
+    :return list estimates: the serialized estimates grouped by printer type, each in queue order
+    """
+    return [estimate for printer_type in PrinterType for estimate in get_estimates(printer_type)]
+
+
+def invalidate_estimates(printer_type):
+    """
+    Function to drop the cached estimates of a printer type, by moving its generation on
+    :param str printer_type: key of the printer type enum
+    """
+    try:
+        get_redis().incr(ETA_GENERATION_PREFIX + printer_type)
+    except redis.RedisError as e:
+        logger.warning(f"Could not invalidate estimates for {printer_type}: {e}")
+
+
+@on_job_event
+def _invalidate_estimates(event_type, data):
+    # Only the printer type of the job that changed has to be recomputed
+    printer_type = data.get("printer_type")
+    if printer_type is None:
+        return
+    invalidate_estimates(printer_type)
@@ -0,0 +1,115 @@
+import hashlib
+import logging
+import time
+from functools import wraps
+from itertools import chain
+
+import redis
+from flask import Response, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from print_api.common.cache import get_redis
+
+logger = logging.getLogger()
+
+TABLE_VERSION_PREFIX = "print_api_table_version:"
+TOUCHED_TABLES_KEY = "touched_tables"
+
+
+# Every table written by a transaction has its version bumped once the transaction commits.
+# Bumping after the commit means a version can only ever be older than the data it tags, so a
+# stale ETag always misses rather than wrongly matching.
+@event.listens_for(Session, "after_flush")
+def _track_flushed_tables(session, flush_context):
+    tables = session.info.setdefault(TOUCHED_TABLES_KEY, set())
+    for obj in chain(session.new, session.dirty, session.deleted):
+        tables.add(obj.__table__.name)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_statement_tables(orm_execute_state):
+    if orm_execute_state.is_select or orm_execute_state.bind_mapper is None:
+        return
+    tables = orm_execute_state.session.info.setdefault(TOUCHED_TABLES_KEY, set())
+    tables.add(orm_execute_state.bind_mapper.local_table.name)
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_touched_tables(session):
+    tables = session.info.pop(TOUCHED_TABLES_KEY, None)
+    if tables and has_app_context():
+        bump_table_versions(tables)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_touched_tables(session):
+    session.info.pop(TOUCHED_TABLES_KEY, None)
+
+
+def bump_table_versions(tables):
+    """
+    Function to bump the version counter of tables after they have been written to
+    :param tables: the names of the tables
+    """
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for table in tables:
+            pipe.incr(TABLE_VERSION_PREFIX + table)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning(f"Could not bump table versions {tables}: {e}")
+
+
+def get_table_versions(tables):
+    """
+    Function to get the version counters of tables, seeding missing counters with the current time
+    so a flushed cache can never hand out a version that was already used
+    :param tables: the names of the tables
+    :return list versions: the versions of the tables or None if redis is unavailable
+    """
+    keys = [TABLE_VERSION_PREFIX + table for table in tables]
+    try:
+        client = get_redis()
+        versions = client.mget(keys)
+        if None in versions:
+            for key, version in zip(keys, versions):
+                if version is None:
+                    client.set(key, time.time_ns(), nx=True)
+            versions = client.mget(keys)
+        return [int(version) for version in versions]
+    except redis.RedisError as e:
+        logger.warning(f"Could not read table versions {tables}: {e}")
+        return None
+
+
+def conditional(*tables):
+    """
+    Decorator to give a GET endpoint strong ETags derived from the versions of the tables it reads.
+    A matching If-None-Match is answered with 304 before the endpoint runs any query.
+    :param tables: the names of the tables the endpoint reads
+    """
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            versions = get_table_versions(tables)
+            if versions is None:
+                return fn(*args, **kwargs)
+
+            etag = hashlib.sha1(
+                f"{request.full_path}|{versions}".encode()
+            ).hexdigest()
+            if request.if_none_match.contains(etag):
+                response = Response(status=304)
+                response.set_etag(etag)
+                return response
+
+            response = fn(*args, **kwargs)
+            if response.status_code == 200:
+                response.set_etag(etag)
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,72 @@
+import json
+import logging
+
+import redis
+
+from print_api.common.cache import get_redis
+from print_api.common.unit_of_work import after_commit
+
+logger = logging.getLogger()
+
+JOB_EVENTS_CHANNEL = "print_api_job_events"
+
+JOB_CREATED = "job-created"
+JOB_TRANSITIONED = "job-transitioned"
+JOB_DELETED = "job-deleted"
+JOBS_IMPORTED = "jobs-imported"
+
+HEARTBEAT_SECONDS = 15
+
+# Functions called with (event_type, data) in the worker that made each change, after it commits
+_job_event_listeners = []
+
+
+def on_job_event(listener):
+    """
+    Decorator to register a function to be called in-process with (event_type, data) for every job
+    event, once the transaction that caused it has committed
+    :param listener: the function to register
+    """
+    _job_event_listeners.append(listener)
+    return listener
+
+
+def publish_job_event(event_type, data):
+    """
+    Function to publish a job event to every worker once the current transaction commits.
+    The Server-Sent Events frame is rendered once here, so subscribers only forward it.
+    :param str event_type: one of JOB_CREATED, JOB_TRANSITIONED, JOB_DELETED or JOBS_IMPORTED
+    :param dict data: the serialized job (its id, printer type and printer for deletions, the printer
+    type and number of jobs for imports)
+    """
+    client = get_redis()
+    frame = f"event: {event_type}\ndata: {json.dumps(data)}\n\n"
+
+    def publish():
+        try:
+            client.publish(JOB_EVENTS_CHANNEL, frame)
+        except redis.RedisError as e:
+            logger.warning(f"Could not publish {event_type} event: {e}")
+        for listener in _job_event_listeners:
+            listener(event_type, data)
+
+    after_commit(publish)
+
+
+def job_event_stream():
+    """
+    Generator of Server-Sent Events frames for every job event published by any worker,
+    with a comment frame every HEARTBEAT_SECONDS to keep idle connections open
+    """
+    pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(JOB_EVENTS_CHANNEL)
+    try:
+        yield ": connected\n\n"
+        while True:
+            message = pubsub.get_message(timeout=HEARTBEAT_SECONDS)
+            if message is None:
+                yield ": keep-alive\n\n"
+                continue
+            yield message["data"].decode()
+    finally:
+        pubsub.close()
@@ -0,0 +1,135 @@
+import csv
+import gzip
+import importlib.util
+import logging
+import os
+import time
+from datetime import datetime
+
+import orjson
+from flask import current_app
+from sqlalchemy import DateTime, Integer
+
+from print_api.models import PrintJob, db
+
+logger = logging.getLogger()
+
+CSV = "csv"
+NDJSON = "ndjson"
+PARQUET = "parquet"
+# File extension of each export format, the row formats are gzipped, parquet compresses itself
+EXPORT_FORMATS = {CSV: "csv.gz", NDJSON: "ndjson.gz", PARQUET: "parquet"}
+
+
+def is_format_available(fmt):
+    """
+    Function to check whether an export format can be written, parquet needs the optional pyarrow
+    :param str fmt: one of EXPORT_FORMATS
+    :return bool available: True if the format can be written
+    """
+    if fmt == PARQUET:
+        return importlib.util.find_spec("pyarrow") is not None
+    return fmt in EXPORT_FORMATS
+
+
+def get_export_dir():
+    """
+    Function to get the directory exports are written to, shared by the web and celery workers
+    :return str path: the absolute path of the EXPORT_LOCATION directory
+    """
+    path = os.path.abspath(current_app.config["EXPORT_LOCATION"])
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def export_job_history(export_id, fmt, since=None, until=None):
+    """
+    Function to write the history of every print job into an export file. The joined query is read
+    from a server side cursor and written a chunk at a time, so memory stays constant however many
+    jobs there are. The file is written under a temporary name and moved into place once complete.
+    :param str export_id: the unique id of the export, used as the file name
+    :param str fmt: one of EXPORT_FORMATS
+    :param datetime since: optional start of the date_added range to export
+    :param datetime until: optional end (exclusive) of the date_added range to export
+    :return tuple export: (file name in the export directory, number of jobs written)
+    """
+    filename = f"{export_id}.{EXPORT_FORMATS[fmt]}"
+    path = os.path.join(get_export_dir(), filename)
+    partial_path = path + ".partial"
+
+    statement = PrintJob.job_history_statement(since, until)
+    columns = [(column.key, column.type) for column in statement.selected_columns]
+    chunks = db.session.execute(statement).partitions()
+    writers = {CSV: _write_csv, NDJSON: _write_ndjson, PARQUET: _write_parquet}
+    try:
+        rows = writers[fmt](chunks, columns, partial_path)
+        os.replace(partial_path, path)
+    finally:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+    return filename, rows
+
+
+def _csv_value(value):
+    # Dates are written in ISO 8601 like the API returns them
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _write_csv(chunks, columns, path):
+    rows = 0
+    with gzip.open(path, "wt", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow([name for name, _ in columns])
+        for chunk in chunks:
+            writer.writerows([_csv_value(value) for value in row] for row in chunk)
+            rows += len(chunk)
+    return rows
+
+
+def _write_ndjson(chunks, columns, path):
+    rows = 0
+    with gzip.open(path, "wb") as file:
+        for chunk in chunks:
+            file.write(b"".join(orjson.dumps(row._asdict()) + b"\n" for row in chunk))
+            rows += len(chunk)
+    return rows
+
+
+def _write_parquet(chunks, columns, path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    def arrow_type(sql_type):
+        if isinstance(sql_type, Integer):
+            return pa.int64()
+        if isinstance(sql_type, DateTime):
+            return pa.timestamp("us", tz="UTC")
+        return pa.string()
+
+    schema = pa.schema([(name, arrow_type(sql_type)) for name, sql_type in columns])
+    rows = 0
+    # Every chunk is written as a row group of its own
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for chunk in chunks:
+            writer.write_table(pa.Table.from_pylist([row._asdict() for row in chunk], schema))
+            rows += len(chunk)
+    return rows
+
+
+def prune_exports(max_age_seconds):
+    """
+    Function to delete export files older than a maximum age
+    :param int max_age_seconds: the age in seconds past which exports are deleted
+    :return int count: the number of files deleted
+    """
+    directory = get_export_dir()
+    cutoff = time.time() - max_age_seconds
+    count = 0
+    for entry in os.scandir(directory):
+        if entry.is_file() and entry.stat().st_mtime < cutoff:
+            try:
+                os.remove(entry.path)
+                count += 1
+            except OSError as e:
+                logger.warning(f"Could not delete export {entry.name}: {e}")
+    return count
@@ -0,0 +1,126 @@
+import hashlib
+import json
+import logging
+from functools import wraps
+
+import redis
+from flask import Response, request
+from flask_jwt_extended import get_jwt_identity
+
+from print_api.common.cache import get_redis
+from print_api.common.routing import custom_response
+from print_api.common.unit_of_work import after_commit, after_rollback
+
+logger = logging.getLogger()
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_PREFIX = "print_api_idempotency:"
+# How long a stored response is replayed for
+IDEMPOTENCY_TTL_SECONDS = 24 * 60 * 60
+# How long a request holds its key before a retry may run it again, should it never finish
+IDEMPOTENCY_LOCK_SECONDS = 60
+MAX_KEY_LENGTH = 255
+
+PENDING = "pending"
+
+
+def idempotent(fn):
+    """
+    Decorator to let clients safely retry a write endpoint by sending an Idempotency-Key header.
+    The first successful response for a key is stored once the request has committed and replayed for
+    every retry with the same key, so the write is only ever applied once. Responses that fail, and
+    requests whose commit fails, are rolled back and not stored, so the request may be retried. Must
+    be applied below jwt_required.
+    """
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if key is None:
+            return fn(*args, **kwargs)
+        if not 1 <= len(key) <= MAX_KEY_LENGTH:
+            return custom_response(
+                status_code=400,
+                details=f"{IDEMPOTENCY_HEADER} must be between 1 and {MAX_KEY_LENGTH} characters",
+            )
+
+        redis_key = (
+            f"{IDEMPOTENCY_PREFIX}{get_jwt_identity()}:{request.method}:{request.path}:{key}"
+        )
+        fingerprint = hashlib.sha256(request.get_data()).hexdigest()
+        try:
+            client = get_redis()
+            claimed = client.set(redis_key, PENDING, nx=True, ex=IDEMPOTENCY_LOCK_SECONDS)
+            if not claimed:
+                return replay(client.get(redis_key), fingerprint)
+        except redis.RedisError as e:
+            logger.warning(f"Could not check {IDEMPOTENCY_HEADER} {key}: {e}")
+            return fn(*args, **kwargs)
+
+        try:
+            response = fn(*args, **kwargs)
+        except Exception:
+            release(client, redis_key)
+            raise
+
+        if response.status_code >= 400:
+            release(client, redis_key)
+            return response
+
+        record = json.dumps(
+            {
+                "fingerprint": fingerprint,
+                "status": response.status_code,
+                "mimetype": response.mimetype,
+                "body": response.get_data(as_text=True),
+            }
+        )
+
+        def store():
+            try:
+                client.set(redis_key, record, ex=IDEMPOTENCY_TTL_SECONDS)
+            except redis.RedisError as e:
+                logger.warning(f"Could not store {IDEMPOTENCY_HEADER} {key}: {e}")
+
+        after_commit(store)
+        # The key is also given up if the commit of the request fails
+        after_rollback(lambda: release(client, redis_key))
+        return response
+
+    return wrapper
+
+
+def replay(stored, fingerprint):
+    """
+    Function to answer a retry from the stored response of its key
+    :param bytes stored: the value stored under the key, or None if it expired in the meantime
+    :param str fingerprint: the hash of the retried request body
+    :return response: the stored response or 409 if the first request is still running
+    """
+    if stored is None or stored.decode() == PENDING:
+        return custom_response(
+            status_code=409, details=f"A request with this {IDEMPOTENCY_HEADER} is in progress"
+        )
+    record = json.loads(stored)
+    if record["fingerprint"] != fingerprint:
+        return custom_response(
+            status_code=422,
+            details=f"{IDEMPOTENCY_HEADER} was already used for a different request",
+        )
+    response = Response(
+        response=record["body"], status=record["status"], mimetype=record["mimetype"]
+    )
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+def release(client, redis_key):
+    """
+    Function to give up a key so a retry of a failed request runs again
+    :param client: the redis client
+    :param str redis_key: the key to release
+    """
+    try:
+        client.delete(redis_key)
+    except redis.RedisError as e:
+        logger.warning(f"Could not release {redis_key}: {e}")
@@ -0,0 +1,202 @@
+import csv
+import gzip
+import io
+from collections import Counter
+from datetime import datetime, timezone
+from itertools import islice
+
+import orjson
+from marshmallow import EXCLUDE, ValidationError
+from sqlalchemy import insert
+
+from print_api.common.autoreview import get_autoreview_policy
+from print_api.common.events import JOBS_IMPORTED, publish_job_event
+from print_api.models import PrintJob, PrintJobEvent, PrintJobSchema, Printer, User, db
+
+CSV = "csv"
+NDJSON = "ndjson"
+IMPORT_FORMATS = (CSV, NDJSON)
+# Records validated, looked up and inserted together
+IMPORT_BATCH_SIZE = 1000
+
+# Columns an imported record may set, anything else in the record is ignored
+IMPORT_COLUMNS = (
+    "gcode_slug",
+    "filament_usage",
+    "print_name",
+    "print_time",
+    "printer_type",
+    "project",
+    "project_string",
+    "user_id",
+    "rep_check",
+    "colour",
+    "printer",
+    "queue_notes",
+    "upload_notes",
+    "status",
+    "stl_slug",
+    "date_added",
+    "date_started",
+    "date_ended",
+)
+
+import_schema = PrintJobSchema(unknown=EXCLUDE)
+
+
+def detect_format(filename):
+    """
+    Function to tell the format of an import file from its name
+    :param str filename: the name of the file, optionally ending in .gz
+    :return str fmt: one of IMPORT_FORMATS or None if the extension is not known
+    """
+    name = filename.lower().removesuffix(".gz")
+    if name.endswith(".csv"):
+        return CSV
+    if name.endswith((".ndjson", ".jsonl")):
+        return NDJSON
+    return None
+
+
+def open_import_file(file, filename):
+    """
+    Function to wrap an import file so gzipped files are read decompressed
+    :param file: the binary file
+    :param str filename: the name of the file
+    :return file: the binary file to read records from
+    """
+    if filename.lower().endswith(".gz"):
+        return gzip.GzipFile(fileobj=file)
+    return file
+
+
+def read_records(file, fmt):
+    """
+    Function to read job records one at a time from a CSV (with a header row) or NDJSON file
+    :param file: the binary file to read
+    :param str fmt: one of IMPORT_FORMATS
+    :return generator records: a dict per record, with the empty CSV cells left out
+    :raises ValueError: if an NDJSON line is not a JSON object
+    """
+    if fmt == CSV:
+        for record in csv.DictReader(io.TextIOWrapper(file, encoding="utf-8-sig", newline="")):
+            yield {key: value for key, value in record.items() if key and value not in ("", None)}
+        return
+    for line_number, line in enumerate(file, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = orjson.loads(line)
+        except orjson.JSONDecodeError as err:
+            raise ValueError(f"line {line_number} is not valid JSON") from err
+        if not isinstance(record, dict):
+            raise ValueError(f"line {line_number} is not a JSON object")
+        yield record
+
+
+def import_jobs(records, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Function to import job records in batches. Records may name their user, rep and printer by
+    user_email, rep_email and printer_name instead of their ids. Records without a status are given
+    one by the autoreview policy. Invalid records are skipped and reported, the rest are inserted.
+    Nothing is committed, so callers decide how many batches go in a transaction.
+    :param records: an iterable of record dicts
+    :param int batch_size: the number of records per batch
+    :return generator results: (number of jobs imported, {record number: errors}) per batch
+    """
+    records = iter(records)
+    printers = Printer.get_all_printers()
+    printers_by_id = {printer.id: printer for printer in printers}
+    printers_by_name = {printer.printer_name: printer for printer in printers}
+    first = 1
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            return
+        yield _import_batch(batch, first, printers_by_id, printers_by_name)
+        first += len(batch)
+
+
+def _import_batch(batch, first, printers_by_id, printers_by_name):
+    errors = {}
+    emails = {
+        record[key] for record in batch for key in ("user_email", "rep_email") if key in record
+    }
+    users_by_email = User.get_users_by_emails(emails)
+
+    loaded = []
+    for number, record in enumerate(batch, start=first):
+        record, error = _resolve_names(record, users_by_email, printers_by_name)
+        if error:
+            errors[number] = error
+            continue
+        try:
+            data = import_schema.load(record)
+        except ValidationError as err:
+            errors[number] = err.messages
+            continue
+        data.setdefault("rep_check", data["user_id"])
+        loaded.append((number, data))
+
+    users = User.get_users_by_ids(
+        [u_id for _, data in loaded for u_id in (data["user_id"], data["rep_check"])]
+    )
+    policy = get_autoreview_policy()
+    now = datetime.now(timezone.utc)
+    rows = []
+    for number, data in loaded:
+        error = _check_references(data, users, printers_by_id)
+        if error:
+            errors[number] = error
+            continue
+        if data.get("status") is None:
+            data["status"] = policy.classify(users[data["rep_check"]], data["print_time"])
+        # Every row gets the same keys so the whole batch is one multi-row INSERT
+        row = {column: data.get(column) for column in IMPORT_COLUMNS}
+        row["date_added"] = row["date_added"] or now
+        row["queue_notes"] = row["queue_notes"] or ""
+        rows.append(row)
+
+    if not rows:
+        return 0, errors
+    statement = insert(PrintJob).returning(
+        PrintJob.id, PrintJob.status, PrintJob.printer, PrintJob.printer_type
+    )
+    jobs = db.session.execute(statement, rows).all()
+    PrintJobEvent.record(jobs, None)
+    for printer_type, count in Counter(job.printer_type for job in jobs).items():
+        publish_job_event(JOBS_IMPORTED, {"printer_type": printer_type.name, "count": count})
+    return len(jobs), errors
+
+
+def _resolve_names(record, users_by_email, printers_by_name):
+    # Swap the emails and printer name of a record for the ids they refer to
+    record = dict(record)
+    for email_key, id_key in (("user_email", "user_id"), ("rep_email", "rep_check")):
+        if email_key in record and id_key not in record:
+            user = users_by_email.get(record[email_key])
+            if user is None:
+                return record, {email_key: ["user not found"]}
+            record[id_key] = user.id
+    if "printer_name" in record and "printer" not in record:
+        printer = printers_by_name.get(record["printer_name"])
+        if printer is None:
+            return record, {"printer_name": ["printer not found"]}
+        record["printer"] = printer.id
+    return record, None
+
+
+def _check_references(data, users, printers_by_id):
+    if data["user_id"] not in users:
+        return {"user_id": ["user not found"]}
+    if data["rep_check"] not in users:
+        return {"rep_check": ["user not found"]}
+    if data.get("printer") is not None:
+        printer = printers_by_id.get(data["printer"])
+        if printer is None:
+            return {"printer": ["printer not found"]}
+        if printer.printer_type != data["printer_type"]:
+            return {"printer": ["printer type mismatch"]}
+    if len(data["print_name"]) > PrintJob.print_name.type.length:
+        return {"print_name": [f"longer than {PrintJob.print_name.type.length} characters"]}
+    return None
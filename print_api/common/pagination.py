@@ -0,0 +1,80 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+
+from flask import request
+
+DEFAULT_PAGE_LIMIT = 100
+MAX_PAGE_LIMIT = 1000
+# Ranked results can not be paged by keyset, so how deep offset paging may go is capped instead
+MAX_PAGE_OFFSET = 1000
+
+
+def encode_cursor(date_added: datetime, row_id: int) -> str:
+    """
+    Function to encode the keyset of the last row on a page into an opaque cursor
+    :param datetime date_added: the date_added value of the last row
+    :param int row_id: the PK of the last row
+    :return str cursor: url safe cursor string
+    """
+    raw = json.dumps([date_added.isoformat(), row_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Function to decode an opaque cursor back into its keyset
+    :param str cursor: the cursor supplied by the client
+    :return tuple keyset: (date_added, id) of the last row of the previous page
+    :raises ValueError: if the cursor is malformed
+    """
+    try:
+        date_added, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(date_added), int(row_id)
+    except (TypeError, ValueError, UnicodeDecodeError) as err:
+        raise ValueError("Invalid cursor") from err
+
+
+def get_limit_arg() -> int:
+    """
+    Function to read the `limit` pagination argument from the current request
+    :return int limit: the page size
+    :raises ValueError: if the argument is invalid
+    """
+    try:
+        limit = int(request.args.get("limit", DEFAULT_PAGE_LIMIT))
+    except ValueError as err:
+        raise ValueError("limit must be an integer") from err
+    if not 1 <= limit <= MAX_PAGE_LIMIT:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_LIMIT}")
+    return limit
+
+
+def get_page_args() -> Tuple[int, Optional[Tuple[datetime, int]]]:
+    """
+    Function to read the `limit` and `after` pagination arguments from the current request
+    :return tuple page_args: (limit, keyset or None)
+    :raises ValueError: if either argument is invalid
+    """
+    limit = get_limit_arg()
+    after = request.args.get("after")
+    if after is not None:
+        after = decode_cursor(after)
+    return limit, after
+
+
+def get_offset_page_args() -> Tuple[int, int]:
+    """
+    Function to read the `limit` and `offset` pagination arguments from the current request
+    :return tuple page_args: (limit, offset)
+    :raises ValueError: if either argument is invalid
+    """
+    limit = get_limit_arg()
+    try:
+        offset = int(request.args.get("offset", 0))
+    except ValueError as err:
+        raise ValueError("offset must be an integer") from err
+    if not 0 <= offset <= MAX_PAGE_OFFSET:
+        raise ValueError(f"offset must be between 0 and {MAX_PAGE_OFFSET}")
+    return limit, offset
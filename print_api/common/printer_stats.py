@@ -0,0 +1,176 @@
+import json
+import logging
+from datetime import datetime, time, timedelta, timezone
+
+import redis
+from sqlalchemy import Integer, cast, extract, func, select
+
+from print_api.common.analytics import utc_day
+from print_api.common.cache import get_redis
+from print_api.common.events import on_job_event
+from print_api.models import PrintJob, db
+from print_api.models.print_jobs import JobStatus
+
+logger = logging.getLogger()
+
+PRINTER_STATS_CACHE_PREFIX = "print_api_printer_stats:"
+PRINTER_STATS_GENERATION_PREFIX = "print_api_printer_stats_generation:"
+# Running jobs keep adding busy time, so reports covering today are recomputed at least this often
+PRINTER_STATS_CACHE_SECONDS = 300
+
+RUN_STATUSES = (JobStatus.running.name, JobStatus.completed.name, JobStatus.failed.name)
+END_STATUSES = (JobStatus.completed.name, JobStatus.failed.name)
+
+
+def busy_statement(printer_id, start, end, now):
+    """
+    Function to build the query of how long a printer was busy in a time range, and how many of its
+    jobs completed and failed in it. Each job is clipped to the range, and overlapping jobs are only
+    counted once by starting every job no earlier than the latest end of the jobs before it, found
+    with a running max window.
+    :param int printer_id: the PK of the printer
+    :param datetime start: the start of the range
+    :param datetime end: the end (exclusive) of the range
+    :param datetime now: the time running jobs are counted up to
+    :return statement: select of (busy_seconds, completed_count, failed_count)
+    """
+    jobs = PrintJob.all_jobs_subquery()
+    ended_in_range = (jobs.c.date_ended >= start) & (jobs.c.date_ended < end)
+    intervals = (
+        select(
+            func.greatest(jobs.c.date_started, start).label("busy_from"),
+            func.least(func.coalesce(jobs.c.date_ended, now), end).label("busy_until"),
+            jobs.c.status,
+            ended_in_range.label("ended_in_range"),
+        )
+        .where(
+            jobs.c.printer == printer_id,
+            jobs.c.status.in_(RUN_STATUSES),
+            jobs.c.date_started < end,
+            func.coalesce(jobs.c.date_ended, now) >= start,
+        )
+        .subquery()
+    )
+    covered = (
+        select(
+            intervals,
+            func.max(intervals.c.busy_until)
+            .over(
+                order_by=(intervals.c.busy_from, intervals.c.busy_until),
+                rows=(None, -1),
+            )
+            .label("covered_until"),
+        )
+    ).subquery()
+    busy_from = func.greatest(
+        covered.c.busy_from, func.coalesce(covered.c.covered_until, covered.c.busy_from)
+    )
+    busy_seconds = func.greatest(extract("epoch", covered.c.busy_until - busy_from), 0)
+    return select(
+        cast(func.coalesce(func.sum(busy_seconds), 0), Integer).label("busy_seconds"),
+        func.count()
+        .filter(covered.c.ended_in_range, covered.c.status == JobStatus.completed.name)
+        .label("completed_count"),
+        func.count()
+        .filter(covered.c.ended_in_range, covered.c.status == JobStatus.failed.name)
+        .label("failed_count"),
+    )
+
+
+def filament_statement(printer_id, start, end):
+    """
+    Function to build the query of the filament a printer used each UTC day of a time range, by the
+    day its completed and failed jobs ended
+    :param int printer_id: the PK of the printer
+    :param datetime start: the start of the range
+    :param datetime end: the end (exclusive) of the range
+    :return statement: select of (day, filament_used) ordered by day
+    """
+    jobs = PrintJob.all_jobs_subquery()
+    day = utc_day(jobs.c.date_ended).label("day")
+    return (
+        select(day, func.sum(jobs.c.filament_usage).label("filament_used"))
+        .where(
+            jobs.c.printer == printer_id,
+            jobs.c.status.in_(END_STATUSES),
+            jobs.c.date_ended >= start,
+            jobs.c.date_ended < end,
+        )
+        .group_by(day)
+        .order_by(day)
+    )
+
+
+def compute_printer_stats(printer_id, since, until):
+    """
+    Function to compute the utilization, mean time between failures and daily filament use of a
+    printer from the queued and archived jobs. Utilization is the share of the range the printer was
+    busy, up to now for ranges that include today. The mean time between failures is the busy time
+    per failed job.
+    :param int printer_id: the PK of the printer
+    :param date since: the first day of the range
+    :param date until: the last day of the range
+    :return dict stats: the serialized stats
+    """
+    now = datetime.now(timezone.utc)
+    start = datetime.combine(since, time.min, tzinfo=timezone.utc)
+    end = min(datetime.combine(until + timedelta(days=1), time.min, tzinfo=timezone.utc), now)
+    wall_seconds = max(int((end - start).total_seconds()), 0)
+
+    busy = db.session.execute(busy_statement(printer_id, start, end, now)).one()
+    filament = db.session.execute(filament_statement(printer_id, start, end)).all()
+    return {
+        "printer_id": printer_id,
+        "since": since.isoformat(),
+        "until": until.isoformat(),
+        "wall_seconds": wall_seconds,
+        "busy_seconds": busy.busy_seconds,
+        "utilization": busy.busy_seconds / wall_seconds if wall_seconds else None,
+        "completed_count": busy.completed_count,
+        "failed_count": busy.failed_count,
+        "mtbf_seconds": busy.busy_seconds / busy.failed_count if busy.failed_count else None,
+        "filament_per_day": [
+            {"day": row.day.isoformat(), "filament_used": row.filament_used} for row in filament
+        ],
+    }
+
+
+def get_printer_stats(printer_id, since, until):
+    """
+    Function to get the stats of a printer, from the cache when none of its jobs changed since they
+    were computed. The cache key carries a generation that every job event of the printer moves on,
+    the same way the queue estimates are invalidated.
+    :param int printer_id: the PK of the printer
+    :param date since: the first day of the range
+    :param date until: the last day of the range
+    :return dict stats: the serialized stats
+    """
+    try:
+        client = get_redis()
+        generation = int(client.get(f"{PRINTER_STATS_GENERATION_PREFIX}{printer_id}") or 0)
+        key = f"{PRINTER_STATS_CACHE_PREFIX}{printer_id}:{generation}:{since}:{until}"
+        cached = client.get(key)
+        if cached is not None:
+            return json.loads(cached)
+    except redis.RedisError as e:
+        logger.warning(f"Could not read cached stats for printer {printer_id}: {e}")
+        return compute_printer_stats(printer_id, since, until)
+
+    stats = compute_printer_stats(printer_id, since, until)
+    try:
+        client.set(key, json.dumps(stats), ex=PRINTER_STATS_CACHE_SECONDS)
+    except redis.RedisError as e:
+        logger.warning(f"Could not cache stats for printer {printer_id}: {e}")
+    return stats
+
+
+@on_job_event
+def _invalidate_printer_stats(event_type, data):
+    # Jobs moved off a printer no longer name it, their old printer catches up when its cache expires
+    printer = data.get("printer")
+    if printer is None:
+        return
+    try:
+        get_redis().incr(f"{PRINTER_STATS_GENERATION_PREFIX}{printer}")
+    except redis.RedisError as e:
+        logger.warning(f"Could not invalidate stats for printer {printer}: {e}")
@@ -1,13 +1,28 @@
-from typing import Any, Dict, Optional
-from flask import Response, json
+from datetime import date, datetime, timedelta, timezone
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
 
+import orjson
+from flask import Response, request, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 
-def custom_response(status_code: int, details: Optional[Any] = None, extra_info: Optional[Any] = None) -> Response:
+# Same output as flask.json.dumps: sorted keys, HTTP dates and the flask fallbacks for other types
+JSON_OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+# Rows fetched from the server side cursor, and written to the client, at a time when streaming
+STREAM_CHUNK_SIZE = 1000
+# Days covered by a report when no ?since= is given
+DEFAULT_RANGE_DAYS = 90
+
+
+def custom_response(status_code: int, details: Optional[Any] = None, extra_info: Optional[Any] = None,
+                    meta: Optional[Dict[str, Any]] = None) -> Response:
     """
     Custom Response Function to encapsulate a json response with a status code.
     :param int status_code: http status code
     :param details: Success-specific data or Error-specific message
     :param extra_info: None or optional success message or Error-specific data
+    :param dict meta: None or extra keys to add to the meta block (e.g. pagination cursors)
     :return response: response object
 
     iForge Standard Response Format:
@@ -21,7 +36,8 @@ def custom_response(status_code: int, details: Optional[Any] = None, extra_info:
         }
       },
       "meta": {
-        "message": { Optional success message }
+        "message": { Optional success message },
+        ...{ Optional extra meta keys }
       }
     }
     """
@@ -50,8 +66,77 @@ def custom_response(status_code: int, details: Optional[Any] = None, extra_info:
         }
         res["meta"]["message"] = extra_info
 
+    if meta:
+        res["meta"].update(meta)
+
     return Response(
         mimetype="application/json",
-        response=json.dumps(res),
+        response=orjson.dumps(res, default=DefaultJSONProvider.default, option=JSON_OPTIONS),
         status=status_code
     )
+
+
+def _dumps(obj: Any) -> bytes:
+    return orjson.dumps(obj, default=DefaultJSONProvider.default, option=JSON_OPTIONS)
+
+
+def is_stream_requested() -> bool:
+    """
+    Function to check whether the client asked for a streamed listing with ?stream=true
+    :return bool stream: True if the listing should be streamed
+    """
+    return request.args.get("stream", "false").lower() == "true"
+
+
+def get_day_range() -> Tuple[date, date]:
+    """
+    Function to read the ?since= and ?until= ISO date arguments of a report from the current request.
+    Both are inclusive, until defaults to today and since to DEFAULT_RANGE_DAYS before it.
+    :return tuple day_range: (since, until) dates
+    :raises ValueError: if either argument is invalid
+    """
+    try:
+        until = request.args.get("until")
+        until = date.fromisoformat(until) if until else datetime.now(timezone.utc).date()
+        since = request.args.get("since")
+        since = date.fromisoformat(since) if since else until - timedelta(DEFAULT_RANGE_DAYS - 1)
+    except ValueError as err:
+        raise ValueError("since and until must be ISO dates") from err
+    if since > until:
+        raise ValueError("since must not be after until")
+    return since, until
+
+
+def streaming_response(key: str, items: Iterable[Any], serialize: Callable[[Any], Any],
+                       extra_info: Optional[Any] = None,
+                       meta: Optional[Dict[str, Any]] = None) -> Response:
+    """
+    Streaming variant of custom_response for large listings. Writes the same iForge success envelope,
+    byte for byte, with payload.data set to {key: [...]}, but serializes and sends the items a chunk at
+    a time as they are iterated, so only one chunk is ever held in memory.
+    :param str key: the key of the list in payload.data
+    :param items: a lazy iterable of the items, run once the response starts (e.g. a generator over a
+    yield_per query). It runs after the request has committed, in a transaction of its own.
+    :param serialize: function turning one item into JSON serializable data
+    :param extra_info: None or optional success message
+    :param dict meta: None or extra keys to add to the meta block, must be known before streaming
+    :return response: streamed response object
+    """
+    meta_block: Dict[str, Any] = {"message": extra_info}
+    if meta:
+        meta_block.update(meta)
+
+    def generate():
+        # Keys are written in the sorted order custom_response encodes them in
+        yield b'{"meta":' + _dumps(meta_block) + b',"payload":{"data":{' + _dumps(key) + b":["
+        rows = iter(items)
+        separator = b""
+        while True:
+            chunk = list(islice(rows, STREAM_CHUNK_SIZE))
+            if not chunk:
+                break
+            yield separator + b",".join(_dumps(serialize(item)) for item in chunk)
+            separator = b","
+        yield b']},"error":null},"status":"success"}'
+
+    return Response(stream_with_context(generate()), mimetype="application/json", status=200)
@@ -0,0 +1,62 @@
+from datetime import date
+
+from marshmallow import fields
+from marshmallow_enum import EnumField, LoadDumpOptions
+
+# Source templates of the inline conversion of each field type, `{v}` is the attribute value.
+# Anything not listed here falls back to the fields own serialize method.
+_IDENTITY = "{v}"
+_ISOFORMAT = "(None if ({v}) is None else ({v}).isoformat())"
+_DATE_ISOFORMAT = "(None if ({v}) is None else _date_isoformat({v}))"
+_ENUM_NAME = "(None if ({v}) is None else ({v}).name)"
+_ENUM_VALUE = "(None if ({v}) is None else ({v}).value)"
+
+
+def _field_template(field):
+    """
+    Function to pick the inline conversion of a marshmallow field, matching what field.serialize returns
+    :param field: the marshmallow field
+    :return str template: the conversion template or None if the field must use field.serialize
+    """
+    if isinstance(field, EnumField):
+        return _ENUM_VALUE if field.dump_by == LoadDumpOptions.value else _ENUM_NAME
+    if isinstance(field, (fields.Integer, fields.String, fields.Boolean)) and not getattr(
+        field, "as_string", False
+    ):
+        return _IDENTITY
+    if isinstance(field, fields.DateTime) and type(field) in (fields.DateTime, fields.AwareDateTime) \
+            and field.format in (None, "iso", "iso8601"):
+        return _ISOFORMAT
+    if type(field) is fields.Date and field.format in (None, "iso", "iso8601"):
+        return _DATE_ISOFORMAT
+    return None
+
+
+def compile_serializer(schema):
+    """
+    Function to compile a marshmallow schema into a plain function that dumps one object to a dict.
+    The function is built once per schema and produces the same output as schema.dump, without the
+    per-row field lookups, hooks and error handling of marshmallow. Works for ORM objects and Core
+    result rows alike since both expose their columns as attributes.
+    :param schema: the marshmallow schema instance to compile (only, exclude and data_key are honoured)
+    :return function serializer: function taking an object and returning its serialized dict
+    """
+    namespace = {"_date_isoformat": date.isoformat}
+    lines = ["def serialize(obj):"]
+    items = []
+    for i, (name, field) in enumerate(schema.dump_fields.items()):
+        attribute = field.attribute or name
+        key = field.data_key if field.data_key is not None else name
+        template = _field_template(field)
+
+        if template is None or not attribute.isidentifier():
+            namespace[f"_field_{i}"] = field
+            expression = f"_field_{i}.serialize({attribute!r}, obj)"
+        else:
+            lines.append(f"    v{i} = obj.{attribute}")
+            expression = template.format(v=f"v{i}")
+        items.append(f"        {key!r}: {expression},")
+
+    lines += ["    return {", *items, "    }"]
+    exec("\n".join(lines), namespace)
+    return namespace["serialize"]
@@ -7,8 +7,11 @@ from flask import current_app
 from flask_mail import Message
 
 from print_api.common import cache
+from print_api.common.analytics import refresh_rollups
+from print_api.common.etags import bump_table_versions
+from print_api.common.exports import export_job_history, prune_exports
 from print_api.extensions import mail
-from print_api.models import UserRole, User
+from print_api.models import UserRole, User, PrintJob, db
 
 logger = logging.getLogger()
 celery = Celery(__name__, autofinalize=False)
@@ -40,6 +43,28 @@ def send_email(self, msg_data):
             app.logger.error(e)
 
 
+@celery.task(bind=True)
+def send_emails(self, messages):
+    """
+    Sends many emails over a single mail server connection.
+    """
+    app = current_app._get_current_object()
+
+    with app.app_context():
+        try:
+            with mail.connect() as connection:
+                for msg_data in messages:
+                    connection.send(
+                        Message(
+                            subject=msg_data["subject"],
+                            recipients=msg_data["recipients"],
+                            html=msg_data["body"],
+                        )
+                    )
+        except Exception as e:
+            app.logger.error(e)
+
+
 @celery.task(bind=True)
 def update_user_roles_in_cache(self, user_id):
     """
@@ -72,3 +97,68 @@ def update_all_user_roles_in_cache(self):
     for user in users:
         roles = UserRole.get_all_by_user(user.id)
         store.store_user_permissions(user.id, roles)
+
+
+@celery.task(bind=True)
+def archive_finished_jobs(self):
+    """
+    Moves finished print jobs older than ARCHIVE_AFTER_DAYS into the archive, committing every
+    ARCHIVE_BATCH_SIZE jobs so no transaction holds many row locks for long.
+    """
+    app = current_app._get_current_object()
+    before = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(
+        days=app.config["ARCHIVE_AFTER_DAYS"]
+    )
+    batch_size = app.config["ARCHIVE_BATCH_SIZE"]
+
+    total = 0
+    while True:
+        moved = PrintJob.archive_finished(before, batch_size)
+        db.session.commit()
+        total += moved
+        if moved < batch_size:
+            break
+
+    if total:
+        bump_table_versions(["print_jobs", "print_jobs_archive", "print_job_tombstones"])
+    logger.info(f"Archived {total} finished print jobs")
+    return total
+
+
+@celery.task(bind=True)
+def export_print_jobs(self, fmt, since=None, until=None, requested_by=None):
+    """
+    Writes the history of every print job added between since and until into an export file
+    named after the task id, for the requester to download once the task has succeeded.
+    """
+    since = datetime.datetime.fromisoformat(since) if since else None
+    until = datetime.datetime.fromisoformat(until) if until else None
+    try:
+        filename, rows = export_job_history(self.request.id, fmt, since, until)
+    finally:
+        db.session.rollback()
+    logger.info(f"Exported {rows} print jobs to {filename}")
+    return {"file": filename, "format": fmt, "rows": rows, "requested_by": requested_by}
+
+
+@celery.task(bind=True)
+def prune_old_exports(self):
+    """
+    Deletes export files older than EXPORT_RETENTION_HOURS.
+    """
+    app = current_app._get_current_object()
+    count = prune_exports(app.config["EXPORT_RETENTION_HOURS"] * 60 * 60)
+    logger.info(f"Deleted {count} old exports")
+    return count
+
+
+@celery.task(bind=True)
+def refresh_analytics(self):
+    """
+    Rebuilds the days of the analytics rollups that print jobs changed since the last refresh.
+    """
+    refreshed = refresh_rollups()
+    db.session.commit()
+    if not refreshed:
+        logger.info("Skipped the analytics refresh, another one is running")
+    return refreshed
@@ -0,0 +1,64 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from print_api.models import db
+
+AFTER_COMMIT_KEY = "after_commit_callbacks"
+AFTER_ROLLBACK_KEY = "after_rollback_callbacks"
+
+
+def after_commit(callback):
+    """
+    Function to defer a side effect (emails, events, cache writes) until the current transaction
+    has been committed. If the transaction is rolled back instead the callback is dropped.
+    Callbacks run once the transaction has ended, so they must not use the database session.
+    :param callback: a function taking no arguments
+    """
+    db.session.info.setdefault(AFTER_COMMIT_KEY, []).append(callback)
+
+
+def after_rollback(callback):
+    """
+    Function to undo a side effect made ahead of the current transaction (such as claiming a key) if
+    the transaction is rolled back, including when its commit fails. If the transaction is committed
+    instead the callback is dropped. Callbacks must not use the database session.
+    :param callback: a function taking no arguments
+    """
+    db.session.info.setdefault(AFTER_ROLLBACK_KEY, []).append(callback)
+
+
+@event.listens_for(Session, "after_commit")
+def _run_after_commit_callbacks(session):
+    session.info.pop(AFTER_ROLLBACK_KEY, None)
+    for callback in session.info.pop(AFTER_COMMIT_KEY, []):
+        callback()
+
+
+@event.listens_for(Session, "after_rollback")
+def _run_after_rollback_callbacks(session):
+    session.info.pop(AFTER_COMMIT_KEY, None)
+    for callback in session.info.pop(AFTER_ROLLBACK_KEY, []):
+        callback()
+
+
+def register_unit_of_work(app):
+    """
+    Register the request scoped unit of work. Model save/update/delete only stage their changes,
+    the whole request is then committed once if it succeeded or rolled back if it did not.
+    :param app: the flask application
+    """
+
+    @app.after_request
+    def commit_unit_of_work(response):
+        if response.status_code < 400:
+            db.session.commit()
+        else:
+            db.session.rollback()
+        return response
+
+    @app.teardown_request
+    def rollback_unit_of_work(exception):
+        if exception is not None:
+            db.session.rollback()
+
+    return None
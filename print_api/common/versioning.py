@@ -0,0 +1,21 @@
+from sqlalchemy import BigInteger, Text, cast, func
+
+# Row versions are the id of the transaction that last wrote the row. Every transaction with an id
+# below the xmin of the current snapshot has finished, so a client that has seen every version
+# below xmin can never miss a write that commits later, whatever order transactions commit in.
+
+
+def current_version():
+    """
+    Function to build the SQL expression of the version given to rows written in this transaction
+    :return clause: pg_current_xact_id() as a bigint
+    """
+    return cast(cast(func.pg_current_xact_id(), Text), BigInteger)
+
+
+def visible_version():
+    """
+    Function to build the SQL expression of the high-water mark every version below which is visible
+    :return clause: the xmin of the current snapshot as a bigint
+    """
+    return cast(cast(func.pg_snapshot_xmin(func.pg_current_snapshot()), Text), BigInteger)
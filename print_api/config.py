@@ -45,6 +45,10 @@ class Config:
     AUTOREVIEW_FAIL_THRESHOLD: float
     AUTOREVIEW_START_THRESHOLD: int
     AUTOREVIEW_TIME_THRESHOLD: int
+    ARCHIVE_AFTER_DAYS: int
+    ARCHIVE_BATCH_SIZE: int
+    EXPORT_LOCATION: str
+    EXPORT_RETENTION_HOURS: int
     SENTRY_SAMPLES_RATE: float
     SENTRY_DSN: str
 
@@ -94,6 +98,10 @@ def load_env_vars(env_file):
         AUTOREVIEW_FAIL_THRESHOLD=float(os.getenv("AUTOREVIEW_FAIL_THRESHOLD", 0.1)),
         AUTOREVIEW_START_THRESHOLD=int(os.getenv("AUTOREVIEW_START_THRESHOLD", 5)),
         AUTOREVIEW_TIME_THRESHOLD=int(os.getenv("AUTOREVIEW_TIME_THRESHOLD", 36000)),
+        ARCHIVE_AFTER_DAYS=int(os.getenv("ARCHIVE_AFTER_DAYS", 30)),
+        ARCHIVE_BATCH_SIZE=int(os.getenv("ARCHIVE_BATCH_SIZE", 1000)),
+        EXPORT_LOCATION=os.getenv("EXPORT_LOCATION", "exports"),
+        EXPORT_RETENTION_HOURS=int(os.getenv("EXPORT_RETENTION_HOURS", 24)),
         SENTRY_SAMPLES_RATE=float(os.getenv("SENTRY_SAMPLES_RATE", 0.0)),
         SENTRY_DSN=os.getenv("SENTRY_DSN", ""),
     )
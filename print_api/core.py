@@ -5,6 +5,7 @@ from typing import Union
 
 import sentry_sdk
 from celery import Celery as CeleryType
+from celery.schedules import crontab
 from flask import Flask
 from werkzeug.exceptions import HTTPException
 
@@ -12,10 +13,12 @@ from print_api.cli import register_commands
 from print_api.common import tasks
 from print_api.common.routing import custom_response
 from print_api.common.tasks import celery
+from print_api.common.unit_of_work import register_unit_of_work
 from print_api.config import load_config
 from print_api.extensions import migrate, mail, bootstrap, api, cors, jwt, limiter
 from print_api.models import db
 from print_api.resources.api_routes import (
+    analytics_route,
     auth_route,
     maintenance_route,
     other_routes,
@@ -63,6 +66,8 @@ def entrypoint(
 
     # register extensions
     register_extensions(app)
+    # register the request scoped unit of work
+    register_unit_of_work(app)
     # register error handler
     register_errorhandler(app)
     if mode == "app":
@@ -87,6 +92,23 @@ def configure_celery(app, celery):
     # set broker url and result backend from app config
     celery.conf.broker_url = app.config["CELERY_BROKER_URL"]
     celery.conf.result_backend = app.config["CELERY_RESULT_BACKEND"]
+    # periodic tasks, run by the worker started with -B
+    celery.conf.beat_schedule = {
+        "archive-finished-jobs": {
+            "task": "print_api.common.tasks.archive_finished_jobs",
+            "schedule": crontab(hour=4, minute=0),
+        },
+        "prune-old-exports": {
+            "task": "print_api.common.tasks.prune_old_exports",
+            "schedule": crontab(minute=30),
+        },
+        "refresh-analytics": {
+            "task": "print_api.common.tasks.refresh_analytics",
+            "schedule": crontab(minute="*/10"),
+        },
+    }
+    # Lets export status report that a task is running rather than pending
+    celery.conf.task_track_started = True
 
     # subclass task base for app context
     # http://flask.pocoo.org/docs/0.12/patterns/celery/
@@ -122,6 +144,9 @@ def register_blueprints(app):
     app.register_blueprint(
         print_job_route.print_job_api, url_prefix=f"{api_prefix}/prints"
     )
+    app.register_blueprint(
+        analytics_route.analytics_api, url_prefix=f"{api_prefix}/analytics"
+    )
     app.register_blueprint(other_routes.other_api, url_prefix=f"{api_prefix}/misc")
     app.register_blueprint(auth_route.auth_api, url_prefix=f"{api_prefix}/auth")
     app.register_blueprint(
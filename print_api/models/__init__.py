@@ -1,8 +1,25 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, text
 
 # initialize our db
 db = SQLAlchemy()
 
+# Postgres extensions the models depend on, they have to exist before the tables are created
+DB_EXTENSIONS = ("pg_trgm",)
+
+
+def create_extensions(target, connection, **kw):
+    """
+    Function to create the postgres extensions the models depend on if they do not exist yet
+    :param target: the metadata being created
+    :param connection: the connection to create them on
+    """
+    for extension in DB_EXTENSIONS:
+        connection.execute(text(f"CREATE EXTENSION IF NOT EXISTS {extension}"))
+
+
+event.listen(db.metadata, "before_create", create_extensions)
+
 from .user_role import UserRole
 from .user import User, UserSchema
 from .role_permission import RolePermission
@@ -11,4 +28,17 @@ from .permission import Permission
 from .printers import Printer, PrinterSchema, PrinterType, PrinterLocation
 from .maintenance_logs import MaintenanceLog, MaintenanceSchema
 from .blacklisted_tokens import BlacklistedToken
-from .print_jobs import PrintJob, PrintJobSchema
+from .print_job_tombstones import PrintJobTombstone
+from .print_jobs import (
+    PrintJob,
+    PrintJobSchema,
+    PrintJobEvent,
+    PrintJobEventSchema,
+    ArchivedPrintJob,
+)
+from .analytics import (
+    DailyJobStats,
+    PrinterDailyStats,
+    RepDailyStats,
+    AnalyticsWatermark,
+)
@@ -0,0 +1,169 @@
+from sqlalchemy import BigInteger, Date, cast, func, select
+from sqlalchemy.dialects.postgresql import insert
+
+from print_api.models import db
+
+
+class DailyJobStats(db.Model):
+    """
+    Daily Job Stats Model, the number of jobs added and started each day and how long the started
+    jobs waited in the queue. Rebuilt from the print jobs by the analytics refresh.
+    """
+
+    __tablename__ = "daily_job_stats"
+    day = db.Column(db.Date, primary_key=True)
+    jobs_added = db.Column(db.Integer, nullable=False, server_default="0")
+    jobs_started = db.Column(db.Integer, nullable=False, server_default="0")
+    # Summed over the jobs started on the day
+    wait_seconds = db.Column(db.BigInteger, nullable=False, server_default="0")
+
+    def __repr__(self):
+        return "<Daily Job Stats: %r>" % self.day
+
+    @staticmethod
+    def get_days(since, until):
+        """
+        Function to get the stats of every day with jobs in a range
+        :param date since: the first day of the range
+        :param date until: the last day of the range
+        :return list stats: the daily stats ordered by day
+        """
+        return (
+            DailyJobStats.query.filter(DailyJobStats.day.between(since, until))
+            .order_by(DailyJobStats.day)
+            .all()
+        )
+
+
+class PrinterDailyStats(db.Model):
+    """
+    Printer Daily Stats Model, the completed and failed jobs of each printer by the day they ended
+    """
+
+    __tablename__ = "printer_daily_stats"
+    day = db.Column(db.Date, primary_key=True)
+    # No foreign key, the stats of a printer outlive the printer
+    printer_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    completed_count = db.Column(db.Integer, nullable=False, server_default="0")
+    failed_count = db.Column(db.Integer, nullable=False, server_default="0")
+    # Filament in grams and print time in seconds of the completed and failed jobs
+    filament_used = db.Column(db.BigInteger, nullable=False, server_default="0")
+    print_seconds = db.Column(db.BigInteger, nullable=False, server_default="0")
+
+    def __repr__(self):
+        return "<Printer Daily Stats: %r %r>" % (self.day, self.printer_id)
+
+    @staticmethod
+    def get_weekly_usage(since, until):
+        """
+        Function to get the filament and print time of every printer per week in a range
+        :param date since: the first day of the range
+        :param date until: the last day of the range
+        :return list rows: (week, printer_id, filament_used, print_seconds) ordered by week and printer
+        """
+        week = cast(func.date_trunc("week", PrinterDailyStats.day), Date).label("week")
+        return db.session.execute(
+            select(
+                week,
+                PrinterDailyStats.printer_id,
+                # Sums of bigints are numeric, cast back so they serialize as integers
+                cast(func.sum(PrinterDailyStats.filament_used), BigInteger).label("filament_used"),
+                cast(func.sum(PrinterDailyStats.print_seconds), BigInteger).label("print_seconds"),
+            )
+            .where(PrinterDailyStats.day.between(since, until))
+            .group_by(week, PrinterDailyStats.printer_id)
+            .order_by(week, PrinterDailyStats.printer_id)
+        ).all()
+
+    @staticmethod
+    def get_outcomes(since, until):
+        """
+        Function to get the number of completed and failed jobs of every printer in a range
+        :param date since: the first day of the range
+        :param date until: the last day of the range
+        :return list rows: (printer_id, completed_count, failed_count) ordered by printer
+        """
+        return db.session.execute(
+            select(
+                PrinterDailyStats.printer_id,
+                func.sum(PrinterDailyStats.completed_count).label("completed_count"),
+                func.sum(PrinterDailyStats.failed_count).label("failed_count"),
+            )
+            .where(PrinterDailyStats.day.between(since, until))
+            .group_by(PrinterDailyStats.printer_id)
+            .order_by(PrinterDailyStats.printer_id)
+        ).all()
+
+
+class RepDailyStats(db.Model):
+    """
+    Rep Daily Stats Model, the outcomes of the jobs each rep checked by the day they ended
+    """
+
+    __tablename__ = "rep_daily_stats"
+    day = db.Column(db.Date, primary_key=True)
+    rep_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    completed_count = db.Column(db.Integer, nullable=False, server_default="0")
+    failed_count = db.Column(db.Integer, nullable=False, server_default="0")
+    rejected_count = db.Column(db.Integer, nullable=False, server_default="0")
+
+    def __repr__(self):
+        return "<Rep Daily Stats: %r %r>" % (self.day, self.rep_id)
+
+    @staticmethod
+    def get_outcomes(since, until):
+        """
+        Function to get the number of completed, failed and rejected jobs of every rep in a range
+        :param date since: the first day of the range
+        :param date until: the last day of the range
+        :return list rows: (rep_id, completed_count, failed_count, rejected_count) ordered by rep
+        """
+        return db.session.execute(
+            select(
+                RepDailyStats.rep_id,
+                func.sum(RepDailyStats.completed_count).label("completed_count"),
+                func.sum(RepDailyStats.failed_count).label("failed_count"),
+                func.sum(RepDailyStats.rejected_count).label("rejected_count"),
+            )
+            .where(RepDailyStats.day.between(since, until))
+            .group_by(RepDailyStats.rep_id)
+            .order_by(RepDailyStats.rep_id)
+        ).all()
+
+
+class AnalyticsWatermark(db.Model):
+    """
+    Analytics Watermark Model, the print job version up to which each rollup has been refreshed
+    """
+
+    __tablename__ = "analytics_watermarks"
+    name = db.Column(db.String, primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False)
+
+    def __repr__(self):
+        return "<Analytics Watermark: %r>" % self.name
+
+    @staticmethod
+    def get_version(name):
+        """
+        Function to get the version a rollup has been refreshed up to
+        :param str name: the name of the rollup
+        :return int version: the version or None if the rollup was never refreshed
+        """
+        return db.session.execute(
+            select(AnalyticsWatermark.version).where(AnalyticsWatermark.name == name)
+        ).scalar()
+
+    @staticmethod
+    def set_version(name, version):
+        """
+        Function to record the version a rollup has been refreshed up to
+        :param str name: the name of the rollup
+        :param int version: the version
+        """
+        statement = insert(AnalyticsWatermark).values(name=name, version=version)
+        db.session.execute(
+            statement.on_conflict_do_update(
+                index_elements=[AnalyticsWatermark.name], set_={"version": version}
+            )
+        )
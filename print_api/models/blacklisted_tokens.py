@@ -24,7 +24,7 @@ class BlacklistedToken(db.Model):
 
     def add(self):
         db.session.add(self)
-        db.session.commit()
+        db.session.flush()
 
     @staticmethod
     def is_blacklisted(jti) -> bool:
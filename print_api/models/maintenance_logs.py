@@ -44,25 +44,25 @@ class MaintenanceLog(db.Model):
 
     def save(self):
         """
-        Save Object Function
+        Save Object Function, the change is committed with the rest of the request
         """
         db.session.add(self)
-        db.session.commit()
+        db.session.flush()
 
     def update(self, data):
         """
-        Update attributes function
+        Update attributes function, the change is committed with the rest of the request
         """
         for key, item in data.items():
             setattr(self, key, item)
-        db.session.commit()
+        db.session.flush()
 
     def delete(self):
         """
-        Delete Object Function
+        Delete Object Function, the change is committed with the rest of the request
         """
         db.session.delete(self)
-        db.session.commit()
+        db.session.flush()
 
     @staticmethod
     def get_all_maintenance_logs():
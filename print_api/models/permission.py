@@ -29,7 +29,7 @@ class Permission(db.Model):
             return False
         permission = Permission(name=name, description=description)
         db.session.add(permission)
-        db.session.commit()
+        db.session.flush()
         return True
 
     @staticmethod
@@ -41,7 +41,7 @@ class Permission(db.Model):
         permission = Permission.get(permission_id)
         permission.name = name
         permission.description = description
-        db.session.commit()
+        db.session.flush()
 
     @staticmethod
     def delete(permission_id) -> bool:
@@ -51,5 +51,5 @@ class Permission(db.Model):
         if RolePermission.remove_all_by_permission(permission_id) is False:
             return False
         db.session.delete(permission)
-        db.session.commit()
+        db.session.flush()
         return True
@@ -0,0 +1,47 @@
+from sqlalchemy.sql import func
+
+from print_api.common.versioning import current_version
+from print_api.models import db
+
+
+class PrintJobTombstone(db.Model):
+    """
+    Print Job Tombstones Model, left behind by deleted jobs so delta syncs can report deletions
+    """
+
+    __tablename__ = "print_job_tombstones"
+    job_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    version = db.Column(db.BigInteger, nullable=False, server_default=current_version())
+    deleted_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (db.Index("ix_print_job_tombstones_version", version),)
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+
+    def __repr__(self):
+        return "<Tombstone Job ID: %r>" % self.job_id
+
+    def to_dict(self):
+        return {
+            "job_id": self.job_id,
+            "version": self.version,
+            "deleted_at": self.deleted_at,
+        }
+
+    @staticmethod
+    def get_tombstones_between(since, until):
+        """
+        Function to get the ids of the jobs deleted between two versions
+        :param int since: the inclusive lower version
+        :param int until: the exclusive upper version
+        :return list job_ids: the ids of the deleted jobs
+        """
+        return [
+            job_id
+            for (job_id,) in db.session.query(PrintJobTombstone.job_id)
+            .filter(
+                PrintJobTombstone.version >= since, PrintJobTombstone.version < until
+            )
+            .order_by(PrintJobTombstone.version, PrintJobTombstone.job_id)
+        ]
@@ -1,11 +1,40 @@
 import enum
-import os
 
 from marshmallow import Schema, fields
 from marshmallow_enum import EnumField
+from flask import has_request_context
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import (
+    Integer,
+    String,
+    and_,
+    cast,
+    delete,
+    exists,
+    extract,
+    insert,
+    or_,
+    select,
+    tuple_,
+    union,
+    union_all,
+    update,
+)
+from sqlalchemy.dialects.postgresql import REGCONFIG, TSVECTOR
+from sqlalchemy.orm import aliased, deferred
 from sqlalchemy.sql import func
 
-from print_api.models import User, Printer
+from print_api.common.events import (
+    JOB_CREATED,
+    JOB_DELETED,
+    JOB_TRANSITIONED,
+    publish_job_event,
+)
+from print_api.common.pagination import encode_cursor
+from print_api.common.routing import STREAM_CHUNK_SIZE
+from print_api.common.serializers import compile_serializer
+from print_api.common.versioning import current_version, visible_version
+from print_api.models import User, Printer, PrintJobTombstone
 from print_api.models import db
 from print_api.models.printers import PrinterType
 
@@ -20,6 +49,15 @@ class JobStatus(enum.Enum):
     under_review = "Under Review"
 
 
+# Text search configuration of the job search vector. No stemming or stop words, since print names
+# and colours are rarely english prose.
+SEARCH_CONFIG = "simple"
+
+
+# Statuses a job never leaves, jobs in them are eventually moved to the archive
+FINISHED_STATUSES = (JobStatus.completed, JobStatus.failed, JobStatus.rejected)
+
+
 class ProjectTypes(enum.Enum):
     personal = "Personal"
     uni_module = "Module"
@@ -59,6 +97,58 @@ class PrintJob(db.Model):
     status = db.Column(db.Enum(JobStatus), nullable=False)
     stl_slug = db.Column(db.String, nullable=True)
     upload_notes = db.Column(db.String, nullable=True)
+    requeue_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    # Id of the transaction that last wrote the job, used for delta syncs
+    version = db.Column(
+        db.BigInteger,
+        nullable=False,
+        server_default=current_version(),
+        onupdate=current_version(),
+    )
+    # Weighted text of the searchable columns, kept up to date by postgres
+    search_vector = deferred(
+        db.Column(
+            TSVECTOR,
+            db.Computed(
+                f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(print_name, '')), 'A') || "
+                f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(project_string, '')), 'B') || "
+                f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(colour, '')), 'B') || "
+                f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(upload_notes, '')), 'C')",
+                persisted=True,
+            ),
+        )
+    )
+
+    __table_args__ = (
+        # Keyset pagination of the full listing
+        db.Index("ix_print_jobs_date_added_id", date_added, id),
+        # Keyset pagination of listings filtered by status
+        db.Index("ix_print_jobs_status_date_added_id", status, date_added, id),
+        # Printer occupancy checks only ever look at running jobs
+        db.Index(
+            "ix_print_jobs_running_printer",
+            printer,
+            postgresql_where=(status == JobStatus.running),
+        ),
+        # Keyset pagination of the jobs of a user and the jobs checked by a rep
+        db.Index("ix_print_jobs_user_id_date_added_id", user_id, date_added, id),
+        db.Index("ix_print_jobs_rep_check_date_added_id", rep_check, date_added, id),
+        # Delta syncs of the jobs changed since a version
+        db.Index("ix_print_jobs_version_id", version, id),
+        # Jobs started and ended on a day, for the analytics rollups
+        db.Index("ix_print_jobs_date_started", date_started),
+        db.Index("ix_print_jobs_date_ended", date_ended),
+        # Job history of a printer, for its stats report
+        db.Index("ix_print_jobs_printer_date_started", printer, date_started),
+        # Full-text and fuzzy job search
+        db.Index("ix_print_jobs_search_vector", search_vector, postgresql_using="gin"),
+        db.Index(
+            "ix_print_jobs_print_name_trgm",
+            print_name,
+            postgresql_using="gin",
+            postgresql_ops={"print_name": "gin_trgm_ops"},
+        ),
+    )
 
     # class constructor
     def __init__(self, data):
@@ -115,69 +205,203 @@ class PrintJob(db.Model):
             self.project_string = data.get("project_name")
 
     def _set_job_status(self, data):
-        if data.get("status") == JobStatus.approval:
-            self.status = JobStatus.approval
+        # Jobs that are not waiting for approval get their status from the autoreview policy
+        self.status = data.get("status")
+        if self.status == JobStatus.approval:
             self.stl_slug = data.get("stl_slug")
         else:
             self.stl_slug = None
-            self.status = self._calculate_status_based_on_rep_and_time()
-
-    def _calculate_status_based_on_rep_and_time(self):
-        """Determine job status based on representative's record and print time."""
-        if self._is_rep_new():
-            return JobStatus.under_review
-        if self._is_failure_rate_acceptable() and self._is_print_time_short():
-            return JobStatus.queued
-        return JobStatus.under_review
-
-    def _is_rep_new(self):
-        """Check if the representative is new based on completed jobs."""
-        check_rep = User.get_user_by_id(self.rep_check)
-        total_jobs = (
-            check_rep.slice_completed_count
-            + check_rep.slice_failed_count
-            + check_rep.slice_rejected_count
-        )
-        start_threshold = int(os.getenv("AUTOREVIEW_START_THRESHOLD"))
-        return total_jobs < start_threshold
-
-    def _is_failure_rate_acceptable(self):
-        """Determine if the failure rate is below the acceptable threshold."""
-        check_rep = User.get_user_by_id(self.rep_check)
-        fail_rate = (check_rep.slice_failed_count + check_rep.slice_rejected_count) / (
-            check_rep.slice_completed_count
-            + check_rep.slice_failed_count
-            + check_rep.slice_rejected_count
-        )
-        fail_threshold = float(os.getenv("AUTOREVIEW_FAIL_THRESHOLD"))
-        return fail_rate < fail_threshold
-
-    def _is_print_time_short(self):
-        """Check if the print time is below the threshold."""
-        time_threshold = int(os.getenv("AUTOREVIEW_TIME_THRESHOLD"))
-        return self.print_time < time_threshold
 
     def save(self):
         """
-        Save Object Function
+        Save Object Function, the change is committed with the rest of the request
         """
         db.session.add(self)
-        db.session.commit()
+        db.session.flush()
+        PrintJobEvent.record([self], None)
+        publish_job_event(JOB_CREATED, serialize_job_event(self))
 
     def update(self, data):
         """
-        Update attributes function
+        Update attributes function, the change is committed with the rest of the request
         """
+        from_status = self.status
         for key, item in data.items():
             setattr(self, key, item)
-        db.session.commit()
+        db.session.flush()
+        if self.status != from_status:
+            PrintJobEvent.record([self], from_status)
+        publish_job_event(JOB_TRANSITIONED, serialize_job_event(self))
 
     def delete(self):
         """
-        Delete Object Function
+        Delete Object Function, the change is committed with the rest of the request
         """
+        j_id, printer_type, printer = self.id, self.printer_type, self.printer
         db.session.delete(self)
-        db.session.commit()
+        db.session.add(PrintJobTombstone(j_id))
+        db.session.flush()
+        publish_job_event(
+            JOB_DELETED, {"id": j_id, "printer_type": printer_type.name, "printer": printer}
+        )
+
+    @staticmethod
+    def transition(j_id, expected_status, values, *conditions):
+        """
+        Function to atomically move a print job out of an expected status. The status check and
+        the update are a single UPDATE ... WHERE status = :expected RETURNING statement, so only
+        one of several concurrent transitions on the same job can apply.
+        :param int j_id: the PK of the job
+        :param JobStatus expected_status: the status the job has to be in
+        :param dict values: the column values to set on the job
+        :param conditions: any extra conditions the job has to meet
+        :return PrintJob job: the updated job or None if it did not meet the conditions
+        """
+        statement = (
+            update(PrintJob)
+            .where(PrintJob.id == j_id, PrintJob.status == expected_status, *conditions)
+            .values(values)
+            .returning(PrintJob)
+        )
+        job = db.session.execute(statement).scalars().first()
+        if job is not None:
+            PrintJobEvent.record([job], expected_status)
+            publish_job_event(JOB_TRANSITIONED, serialize_job_event(job))
+        return job
+
+    @staticmethod
+    def transition_many(j_ids, expected_status, values):
+        """
+        Function to atomically move many print jobs out of an expected status in one statement, jobs
+        that are not in the expected status (or do not exist) are left untouched
+        :param list j_ids: the PKs of the jobs
+        :param JobStatus expected_status: the status the jobs have to be in
+        :param dict values: the column values to set on every job
+        :return list jobs: the updated jobs
+        """
+        statement = (
+            update(PrintJob)
+            .where(PrintJob.id.in_(j_ids), PrintJob.status == expected_status)
+            .values(values)
+            .returning(PrintJob)
+        )
+        jobs = db.session.execute(statement).scalars().all()
+        PrintJobEvent.record(jobs, expected_status)
+        for job in jobs:
+            publish_job_event(JOB_TRANSITIONED, serialize_job_event(job))
+        return jobs
+
+    @staticmethod
+    def claim_next(printer_type, values):
+        """
+        Function to atomically start the oldest queued job of a printer type. The job is picked with
+        FOR UPDATE SKIP LOCKED, so concurrent claimers each get a different job without waiting on
+        each other.
+        :param PrinterType printer_type: the type of the printer the job will run on
+        :param dict values: the column values to set on the job
+        :return PrintJob job: the claimed job or None if there is no queued job left to claim
+        """
+        candidate = aliased(PrintJob)
+        next_job_id = (
+            select(candidate.id)
+            .where(
+                candidate.status == JobStatus.queued,
+                candidate.printer_type == printer_type,
+            )
+            .order_by(candidate.date_added, candidate.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        return PrintJob.transition(next_job_id, JobStatus.queued, values)
+
+    @staticmethod
+    def running_on_printer_clause(printer_id):
+        """
+        Function to build a clause that is true when any job is running on a printer
+        :param int printer_id: the PK of the printer
+        :return clause: an EXISTS clause
+        """
+        running = aliased(PrintJob)
+        return exists().where(
+            running.printer == printer_id, running.status == JobStatus.running
+        )
+
+    @staticmethod
+    def is_printer_busy(printer_id):
+        """
+        Function to check if any job is running on a printer, answered from the running printer index
+        :param int printer_id: the PK of the printer
+        :return bool result: True if a job is running on the printer
+        """
+        return db.session.query(PrintJob.running_on_printer_clause(printer_id)).scalar()
+
+    @staticmethod
+    def get_printer_occupancy():
+        """
+        Function to get every printer along with the job running on it in a single query
+        :return list rows: (printer, running job id or None) for every printer
+        """
+        return (
+            db.session.query(Printer, PrintJob.id)
+            .outerjoin(
+                PrintJob,
+                and_(
+                    PrintJob.printer == Printer.id,
+                    PrintJob.status == JobStatus.running,
+                ),
+            )
+            .order_by(Printer.id)
+            .all()
+        )
+
+    @staticmethod
+    def get_queued_jobs(printer_type=None):
+        """
+        Function to get the fields the dispatcher needs of every queued job, oldest first
+        :param printer_type: optional PrinterType to filter by
+        :return list rows: (id, user_id, printer_type, print_time, date_added) for every queued job
+        """
+        query = db.session.query(
+            PrintJob.id,
+            PrintJob.user_id,
+            PrintJob.printer_type,
+            PrintJob.print_time,
+            PrintJob.date_added,
+        ).filter(PrintJob.status == JobStatus.queued)
+        if printer_type is not None:
+            query = query.filter(PrintJob.printer_type == printer_type)
+        return query.order_by(PrintJob.date_added, PrintJob.id).all()
+
+    @staticmethod
+    def get_running_jobs(printer_type):
+        """
+        Function to get when each running job of a printer type started and how long it takes
+        :param printer_type: the PrinterType to filter by
+        :return list rows: (date_started, print_time) for every running job of the type
+        """
+        return (
+            db.session.query(PrintJob.date_started, PrintJob.print_time)
+            .filter(
+                PrintJob.status == JobStatus.running,
+                PrintJob.printer_type == printer_type,
+            )
+            .all()
+        )
+
+    @staticmethod
+    def get_running_counts_by_user():
+        """
+        Function to count the running jobs of every user with at least one running job
+        :return dict counts: user id to the number of their jobs currently running
+        """
+        rows = (
+            db.session.query(PrintJob.user_id, func.count(PrintJob.id))
+            .filter(PrintJob.status == JobStatus.running)
+            .group_by(PrintJob.user_id)
+            .all()
+        )
+        return dict(rows)
 
     @staticmethod
     def get_all_print_jobs():
@@ -187,14 +411,135 @@ class PrintJob(db.Model):
         """
         return PrintJob.query.all()
 
+    @staticmethod
+    def stream_print_jobs():
+        """
+        Function to iterate over all the print jobs ordered by (date_added, id), fetched from a server
+        side cursor a chunk at a time. The query only runs once iteration starts.
+        :return generator jobs: the print jobs
+        """
+        statement = (
+            select(PrintJob)
+            .order_by(PrintJob.date_added, PrintJob.id)
+            .execution_options(yield_per=STREAM_CHUNK_SIZE)
+        )
+        yield from db.session.scalars(statement)
+
     @staticmethod
     def get_print_job_by_id(j_id):
         """
-        Function to get a single print job from the database
+        Function to get a single print job from the database, looking in the archive if it is not
+        in the queue
         :param int j_id: the PK of the job
-        :return query_object: a query object containing the print job
+        :return query_object: a query object containing the print job (or archived print job)
         """
-        return PrintJob.query.get(j_id)
+        job = PrintJob.query.get(j_id)
+        if job is None:
+            job = ArchivedPrintJob.query.get(j_id)
+        return job
+
+    @staticmethod
+    def archive_finished(before, limit):
+        """
+        Function to move finished jobs that ended before a time into the archive. The rows are
+        deleted and inserted into the archive by a single statement, rows locked by someone else
+        are skipped and picked up by a later batch.
+        :param datetime before: jobs that ended (or were added if they never started) before this move
+        :param int limit: the maximum number of jobs to move
+        :return int count: the number of jobs moved
+        """
+        hot = PrintJob.__table__
+        columns = [c.name for c in ArchivedPrintJob.__table__.c if c.name in hot.c]
+        candidates = (
+            select(hot.c.id)
+            .where(
+                hot.c.status.in_(FINISHED_STATUSES),
+                func.coalesce(hot.c.date_ended, hot.c.date_added) < before,
+            )
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        moved = (
+            delete(hot)
+            .where(hot.c.id.in_(candidates))
+            .returning(*(hot.c[name] for name in columns))
+            .cte("moved")
+        )
+        archived = (
+            insert(ArchivedPrintJob.__table__)
+            .from_select(columns, select(*(moved.c[name] for name in columns)))
+            .returning(ArchivedPrintJob.__table__.c.id)
+            .cte("archived")
+        )
+        # Moved jobs leave a tombstone like deleted ones, so delta syncs drop them from the queue
+        statement = insert(PrintJobTombstone.__table__).from_select(
+            ["job_id"], select(archived.c.id)
+        )
+        return db.session.execute(statement).rowcount
+
+    @staticmethod
+    def get_print_jobs_by_ids(j_ids):
+        """
+        Function to get several print jobs from the database in a single query
+        :param list j_ids: the PKs of the jobs
+        :return dict jobs: PK to print job for every job that exists
+        """
+        if not j_ids:
+            return {}
+        return {job.id: job for job in PrintJob.query.filter(PrintJob.id.in_(j_ids))}
+
+    @staticmethod
+    def search_print_jobs(q, limit, offset=0):
+        """
+        Function to search the print jobs by their name, notes, project and colour, and by the name and
+        email of their owner, best match first
+        :param str q: the search terms, in web search syntax ("quoted phrases", -excluded, or)
+        :param int limit: the maximum number of jobs to return
+        :param int offset: the number of best matching jobs to skip
+        :return list jobs: the matching print jobs, best match first
+        """
+        statement = PrintJob.search_statement(q, limit, offset)
+        return db.session.execute(statement).scalars().all()
+
+    @staticmethod
+    def search_statement(q, limit, offset=0):
+        """
+        Function to build the print job search query. Every way of matching is answered from its own
+        index and the union of the matches ranked, so only matching jobs are ever read.
+        :param str q: the search terms, in web search syntax ("quoted phrases", -excluded, or)
+        :param int limit: the maximum number of jobs to return
+        :param int offset: the number of best matching jobs to skip
+        :return statement: select of the matching print jobs, best match first
+        """
+        query = func.websearch_to_tsquery(cast(SEARCH_CONFIG, REGCONFIG), q)
+        owners = select(User.id).where(
+            or_(
+                User.name.icontains(q, autoescape=True),
+                User.email.icontains(q, autoescape=True),
+            )
+        )
+        matches = union(
+            select(PrintJob.id).where(PrintJob.search_vector.op("@@")(query)),
+            # Fuzzy matching of the name catches typos the text search misses
+            select(PrintJob.id).where(PrintJob.print_name.op("%")(q)),
+            select(PrintJob.id).where(PrintJob.user_id.in_(owners)),
+        )
+        owner_rank = func.greatest(
+            func.word_similarity(q, User.name), func.word_similarity(q, User.email)
+        )
+        rank = (
+            func.ts_rank_cd(PrintJob.search_vector, query)
+            + func.similarity(PrintJob.print_name, q)
+            + func.coalesce(owner_rank, 0)
+        )
+        return (
+            select(PrintJob)
+            .outerjoin(User, PrintJob.user_id == User.id)
+            .where(PrintJob.id.in_(matches))
+            .order_by(rank.desc(), PrintJob.id)
+            .limit(limit)
+            .offset(offset)
+        )
 
     @staticmethod
     def get_print_jobs_by_status(status):
@@ -205,6 +550,334 @@ class PrintJob(db.Model):
         """
         return PrintJob.query.filter_by(status=JobStatus[status]).all()
 
+    @staticmethod
+    def get_visible_version():
+        """
+        Function to get the version below which every job change is committed and visible
+        :return int version: the high-water mark to hand to clients for their next delta sync
+        """
+        return db.session.query(visible_version()).scalar()
+
+    @staticmethod
+    def all_jobs_subquery():
+        """
+        Function to build a subquery of the queued and archived print jobs together, with the enum
+        columns read as the enum key since the archive stores them as strings
+        :return subquery: the union of both tables
+        """
+        statements = [
+            select(
+                table.c.id,
+                cast(table.c.status, String).label("status"),
+                table.c.printer,
+                table.c.rep_check,
+                table.c.filament_usage,
+                table.c.print_time,
+                table.c.date_added,
+                table.c.date_started,
+                table.c.date_ended,
+                table.c.version,
+            )
+            for table in (PrintJob.__table__, ArchivedPrintJob.__table__)
+        ]
+        return union_all(*statements).subquery("all_jobs")
+
+    @staticmethod
+    def job_history_statement(since=None, until=None):
+        """
+        Function to build the query of every queued and archived print job joined with the names of
+        its owner, rep and printer and its durations, ordered by (date_added, id). The statement
+        fetches its rows from a server side cursor a chunk at a time.
+        :param datetime since: optional start of the date_added range to get
+        :param datetime until: optional end (exclusive) of the date_added range to get
+        :return statement: the select statement
+        """
+        statements = []
+        for table in (PrintJob.__table__, ArchivedPrintJob.__table__):
+            owner = aliased(User)
+            rep = aliased(User)
+            statement = (
+                select(
+                    table.c.id,
+                    table.c.print_name,
+                    # The archive stores its enums as strings, so both are read as the enum key
+                    cast(table.c.status, String).label("status"),
+                    cast(table.c.project, String).label("project"),
+                    table.c.project_string,
+                    cast(table.c.printer_type, String).label("printer_type"),
+                    Printer.printer_name,
+                    table.c.user_id,
+                    owner.name.label("user_name"),
+                    owner.email.label("user_email"),
+                    rep.name.label("rep_name"),
+                    table.c.colour,
+                    table.c.filament_usage,
+                    table.c.print_time,
+                    table.c.requeue_count,
+                    table.c.date_added,
+                    table.c.date_started,
+                    table.c.date_ended,
+                    cast(
+                        extract("epoch", table.c.date_started - table.c.date_added), Integer
+                    ).label("wait_seconds"),
+                    cast(
+                        extract("epoch", table.c.date_ended - table.c.date_started), Integer
+                    ).label("run_seconds"),
+                )
+                .select_from(table)
+                .outerjoin(owner, owner.id == table.c.user_id)
+                .outerjoin(rep, rep.id == table.c.rep_check)
+                .outerjoin(Printer, Printer.id == table.c.printer)
+            )
+            if since is not None:
+                statement = statement.where(table.c.date_added >= since)
+            if until is not None:
+                statement = statement.where(table.c.date_added < until)
+            statements.append(statement)
+
+        history = union_all(*statements).subquery()
+        return (
+            select(history)
+            .order_by(history.c.date_added, history.c.id)
+            .execution_options(yield_per=STREAM_CHUNK_SIZE)
+        )
+
+    @staticmethod
+    def get_print_job_changes(since):
+        """
+        Function to get the jobs changed and deleted since a version
+        :param int since: the high-water mark returned by the clients previous sync
+        :return tuple changes: (changed jobs, deleted job ids, new high-water mark)
+        """
+        until = PrintJob.get_visible_version()
+        jobs = (
+            PrintJob.query.filter(PrintJob.version >= since, PrintJob.version < until)
+            .order_by(PrintJob.version, PrintJob.id)
+            .all()
+        )
+        deleted = PrintJobTombstone.get_tombstones_between(since, until)
+        return jobs, deleted, until
+
+    @staticmethod
+    def get_print_jobs_page(limit, after=None, status=None, user_id=None, rep_id=None):
+        """
+        Function to get a single page of print jobs ordered by (date_added, id). The jobs of a user
+        or rep are read from the archive as well, so their listings keep the jobs that were archived.
+        :param int limit: the maximum number of jobs to return
+        :param tuple after: the (date_added, id) keyset of the last job on the previous page
+        :param str status: optional key of the status enum to filter by
+        :param int user_id: optional PK of the user whose jobs to get
+        :param int rep_id: optional PK of the rep whose checked jobs to get
+        :return tuple page: a list of print jobs and the cursor of the next page (None if this is the last page)
+        """
+        if user_id is not None or rep_id is not None:
+            jobs = PrintJob._get_all_jobs_page(limit, after, status, user_id, rep_id)
+        else:
+            query = PrintJob.query
+            if status is not None:
+                query = query.filter_by(status=JobStatus[status])
+            if after is not None:
+                query = query.filter(tuple_(PrintJob.date_added, PrintJob.id) > tuple_(*after))
+            jobs = query.order_by(PrintJob.date_added, PrintJob.id).limit(limit + 1).all()
+
+        if len(jobs) <= limit:
+            return jobs, None
+        jobs = jobs[:limit]
+        return jobs, encode_cursor(jobs[-1].date_added, jobs[-1].id)
+
+    @staticmethod
+    def _get_all_jobs_page(limit, after, status, user_id, rep_id):
+        """
+        Function to get up to limit + 1 queued and archived print jobs ordered by (date_added, id).
+        The keys of the page are found first, each table stopping after a page of its own index, and
+        the jobs are then loaded from the queue or, failing that, the archive.
+        :param int limit: the maximum number of jobs to return
+        :param tuple after: the (date_added, id) keyset of the last job on the previous page
+        :param str status: optional key of the status enum to filter by
+        :param int user_id: optional PK of the user whose jobs to get
+        :param int rep_id: optional PK of the rep whose checked jobs to get
+        :return list jobs: the print jobs (and archived print jobs) of the page
+        """
+        statements = []
+        for table in (PrintJob.__table__, ArchivedPrintJob.__table__):
+            statement = select(table.c.date_added, table.c.id)
+            if status is not None:
+                statement = statement.where(table.c.status == JobStatus[status])
+            if user_id is not None:
+                statement = statement.where(table.c.user_id == user_id)
+            if rep_id is not None:
+                statement = statement.where(table.c.rep_check == rep_id)
+            if after is not None:
+                statement = statement.where(
+                    tuple_(table.c.date_added, table.c.id) > tuple_(*after)
+                )
+            statements.append(
+                statement.order_by(table.c.date_added, table.c.id).limit(limit + 1)
+            )
+        keys = union_all(*statements).subquery()
+        ids = db.session.scalars(
+            select(keys.c.id).order_by(keys.c.date_added, keys.c.id).limit(limit + 1)
+        ).all()
+
+        # Queued jobs are looked up first, so a job archived in between is still found
+        jobs = {job.id: job for job in PrintJob.query.filter(PrintJob.id.in_(ids))}
+        missing = [j_id for j_id in ids if j_id not in jobs]
+        if missing:
+            jobs.update(
+                (job.id, job)
+                for job in ArchivedPrintJob.query.filter(ArchivedPrintJob.id.in_(missing))
+            )
+        return [jobs[j_id] for j_id in ids if j_id in jobs]
+
+
+class ArchivedPrintJob(db.Model):
+    """
+    Archived Print Jobs Model, finished jobs moved out of print_jobs so the queue table stays small.
+    Has the same columns as PrintJob, minus the foreign keys.
+    """
+
+    __tablename__ = "print_jobs_archive"
+    gcode_slug = db.Column(db.String, nullable=False)
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    filament_usage = db.Column(db.Integer, nullable=False)
+    print_name = db.Column(db.String, nullable=False)
+    print_time = db.Column(db.Integer, nullable=False)
+    printer_type = db.Column(db.Enum(PrinterType, native_enum=False), nullable=False)
+    project = db.Column(db.Enum(ProjectTypes, native_enum=False), nullable=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    date_added = db.Column(db.DateTime(timezone=True), nullable=True)
+    date_ended = db.Column(db.DateTime(timezone=True), nullable=True)
+    date_started = db.Column(db.DateTime(timezone=True), nullable=True)
+    colour = db.Column(db.String, nullable=True)
+    printer = db.Column(db.Integer, nullable=True)
+    project_string = db.Column(db.String, nullable=True)
+    queue_notes = db.Column(db.String, nullable=True)
+    rep_check = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.Enum(JobStatus, native_enum=False), nullable=False)
+    stl_slug = db.Column(db.String, nullable=True)
+    upload_notes = db.Column(db.String, nullable=True)
+    requeue_count = db.Column(db.Integer, nullable=False, server_default="0")
+    version = db.Column(db.BigInteger, nullable=False)
+    archived_at = db.Column(
+        db.DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
+
+    __table_args__ = (
+        db.Index("ix_print_jobs_archive_user_id_date_added_id", user_id, date_added, id),
+        db.Index("ix_print_jobs_archive_rep_check_date_added_id", rep_check, date_added, id),
+        # Jobs changed since an analytics refresh, archived jobs keep their last version
+        db.Index("ix_print_jobs_archive_version", version),
+        db.Index("ix_print_jobs_archive_date_added", date_added),
+        db.Index("ix_print_jobs_archive_date_started", date_started),
+        db.Index("ix_print_jobs_archive_date_ended", date_ended),
+        db.Index("ix_print_jobs_archive_printer_date_started", printer, date_started),
+    )
+
+    def __repr__(self):
+        return "<Archived Job ID: %r>" % self.id
+
+    def delete(self):
+        """
+        Delete Object Function, the change is committed with the rest of the request
+        """
+        j_id, printer_type, printer = self.id, self.printer_type, self.printer
+        # The job already left a tombstone when it was archived
+        db.session.delete(self)
+        db.session.flush()
+        publish_job_event(
+            JOB_DELETED, {"id": j_id, "printer_type": printer_type.name, "printer": printer}
+        )
+
+
+def current_actor():
+    """
+    Function to get who is making the current change
+    :return str uid: the uid of the authenticated user or None outside of an authenticated request
+    """
+    if not has_request_context():
+        return None
+    try:
+        return get_jwt_identity()
+    except RuntimeError:
+        return None
+
+
+class PrintJobEvent(db.Model):
+    """
+    Print Job Events Model, an append only log of every status change of every job
+    """
+
+    __tablename__ = "print_job_events"
+    id = db.Column(db.BigInteger, primary_key=True)
+    # No foreign key, the history of a job outlives the job
+    job_id = db.Column(db.Integer, nullable=False)
+    from_status = db.Column(db.Enum(JobStatus, native_enum=False), nullable=True)
+    to_status = db.Column(db.Enum(JobStatus, native_enum=False), nullable=False)
+    printer = db.Column(db.Integer, nullable=True)
+    actor = db.Column(db.String, nullable=True)
+    created_at = db.Column(
+        db.DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
+
+    __table_args__ = (
+        # History of a single job
+        db.Index("ix_print_job_events_job_id_id", job_id, id),
+        # Transitions into a status over time, e.g. failures per day
+        db.Index("ix_print_job_events_to_status_created_at", to_status, created_at),
+    )
+
+    def __repr__(self):
+        return "<Job Event ID: %r>" % self.id
+
+    @staticmethod
+    def record(jobs, from_status):
+        """
+        Function to log the status change of jobs, all the rows are inserted in one statement
+        :param list jobs: the jobs after the change
+        :param JobStatus from_status: the status the jobs were in or None if they were just created
+        """
+        if not jobs:
+            return
+        actor = current_actor()
+        db.session.execute(
+            insert(PrintJobEvent),
+            [
+                {
+                    "job_id": job.id,
+                    "from_status": from_status,
+                    "to_status": job.status,
+                    "printer": job.printer,
+                    "actor": actor,
+                }
+                for job in jobs
+            ],
+        )
+
+    @staticmethod
+    def get_events_by_job_id(j_id):
+        """
+        Function to get the history of a job, oldest first
+        :param int j_id: the PK of the job
+        :return list events: the events of the job
+        """
+        return (
+            PrintJobEvent.query.filter_by(job_id=j_id).order_by(PrintJobEvent.id).all()
+        )
+
+
+class PrintJobEventSchema(Schema):
+    """
+    Print Job Event Schema
+    """
+
+    id = fields.Int(dump_only=True)
+    job_id = fields.Int(dump_only=True)
+    from_status = EnumField(JobStatus, dump_only=True)
+    to_status = EnumField(JobStatus, dump_only=True)
+    printer = fields.Int(dump_only=True)
+    actor = fields.String(dump_only=True)
+    created_at = fields.DateTime(dump_only=True)
+
 
 class PrintJobSchema(Schema):
     """
@@ -231,3 +904,7 @@ class PrintJobSchema(Schema):
     status = EnumField(JobStatus, required=False)
     stl_slug = fields.String(required=False)
     upload_notes = fields.String(required=False)
+    requeue_count = fields.Int(dump_only=True)
+
+
+serialize_job_event = compile_serializer(PrintJobSchema())
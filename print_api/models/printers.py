@@ -2,6 +2,8 @@ import enum
 
 from marshmallow import fields, Schema
 from marshmallow_enum import EnumField
+from sqlalchemy import Integer, column, update, values
+from sqlalchemy.sql import func
 
 from print_api.models import db
 
@@ -34,6 +36,15 @@ class Printer(db.Model):
     days_on_time = db.Column(db.Integer(), nullable=True)
     location = db.Column(db.Enum(PrinterLocation), nullable=False)
 
+    # Telemetry counters that can only be incremented
+    TELEMETRY_FIELDS = (
+        "total_time_printed",
+        "completed_prints",
+        "failed_prints",
+        "total_filament_used",
+        "days_on_time",
+    )
+
     # class constructor
 
     def __init__(self, data):
@@ -71,25 +82,25 @@ class Printer(db.Model):
 
     def save(self):
         """
-        Save Object Function
+        Save Object Function, the change is committed with the rest of the request
         """
         db.session.add(self)
-        db.session.commit()
+        db.session.flush()
 
     def update(self, data):
         """
-        Update attributes function
+        Update attributes function, the change is committed with the rest of the request
         """
         for key, item in data.items():
             setattr(self, key, item)
-        db.session.commit()
+        db.session.flush()
 
     def delete(self):
         """
-        Delete Object Function
+        Delete Object Function, the change is committed with the rest of the request
         """
         db.session.delete(self)
-        db.session.commit()
+        db.session.flush()
 
     def get_model_dict(self):
         """
@@ -98,6 +109,70 @@ class Printer(db.Model):
         """
         return self.__dict__
 
+    @staticmethod
+    def increment(p_id, increments):
+        """
+        Function to atomically increment a printers telemetry counters on the database server
+        :param int p_id: the PK of the printer
+        :param dict increments: a dict of TELEMETRY_FIELDS to the amount to add to them
+        :return query_object: the updated printer or None if it does not exist
+        """
+        if not increments:
+            # An UPDATE without any SET clause is invalid, there is nothing to change anyway
+            return Printer.get_printer_by_id(p_id)
+        statement = (
+            update(Printer)
+            .where(Printer.id == p_id)
+            .values(
+                {
+                    key: func.coalesce(getattr(Printer, key), 0) + value
+                    for key, value in increments.items()
+                }
+            )
+            .returning(Printer)
+        )
+        return db.session.execute(statement).scalars().first()
+
+    @staticmethod
+    def increment_many(increments):
+        """
+        Function to atomically increment the telemetry counters of many printers in one statement
+        :param list increments: a list of (printer PK, dict of TELEMETRY_FIELDS to amounts) tuples,
+            increments for the same printer are summed
+        :return list printers: the updated printers
+        """
+        totals = {}
+        for p_id, printer_increments in increments:
+            printer_totals = totals.setdefault(p_id, {})
+            for key, value in printer_increments.items():
+                printer_totals[key] = printer_totals.get(key, 0) + value
+        keys = sorted({key for printer_totals in totals.values() for key in printer_totals})
+        if not keys:
+            return []
+
+        deltas = values(
+            column("id", Integer),
+            *(column(key, Integer) for key in keys),
+            name="deltas",
+        ).data(
+            [
+                (p_id, *(printer_totals.get(key, 0) for key in keys))
+                for p_id, printer_totals in totals.items()
+            ]
+        )
+        statement = (
+            update(Printer)
+            .where(Printer.id == deltas.c.id)
+            .values(
+                {
+                    key: func.coalesce(getattr(Printer, key), 0) + deltas.c[key]
+                    for key in keys
+                }
+            )
+            .returning(Printer)
+        )
+        return db.session.execute(statement).scalars().all()
+
     @staticmethod
     def get_all_printers():
         """
@@ -106,6 +181,15 @@ class Printer(db.Model):
         """
         return Printer.query.all()
 
+    @staticmethod
+    def get_printer_count_by_type(printer_type):
+        """
+        Function to count the printers of a type
+        :param printer_type: the PrinterType to count
+        :return int count: the number of printers of the type
+        """
+        return Printer.query.filter(Printer.printer_type == printer_type).count()
+
     @staticmethod
     def get_printer_by_id(p_id):
         """
@@ -115,6 +199,15 @@ class Printer(db.Model):
         """
         return Printer.query.get(p_id)
 
+    @staticmethod
+    def get_printer_by_id_for_update(p_id):
+        """
+        Function to get a single printer by its ID and lock its row until the end of the transaction
+        :param int p_id: the PK of the printer
+        :return query_object: a query object containing the printer
+        """
+        return Printer.query.filter_by(id=p_id).with_for_update().first()
+
     @staticmethod
     def get_printer_by_name(value):
         """
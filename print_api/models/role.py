@@ -25,7 +25,7 @@ class Role(db.Model):
             return False
         new_role = Role(name=name)
         db.session.add(new_role)
-        db.session.commit()
+        db.session.flush()
         return True
 
     @staticmethod
@@ -40,7 +40,7 @@ class Role(db.Model):
     def update(role_id, name):
         role = Role.get(role_id)
         role.name = name
-        db.session.commit()
+        db.session.flush()
 
     @staticmethod
     def delete(role_id) -> bool:
@@ -54,7 +54,7 @@ class Role(db.Model):
             return False
 
         db.session.delete(role)
-        db.session.commit()
+        db.session.flush()
 
     @staticmethod
     def get_all():
@@ -26,7 +26,7 @@ class RolePermission(db.Model):
             return False
         role_permission = RolePermission(role_id=role_id, permission_id=permission_id)
         db.session.add(role_permission)
-        db.session.commit()
+        db.session.flush()
         return True
 
     @staticmethod
@@ -47,7 +47,7 @@ class RolePermission(db.Model):
         if role_perm is None:
             return False
         db.session.delete(role_perm)
-        db.session.commit()
+        db.session.flush()
         return True
 
     @staticmethod
@@ -57,7 +57,7 @@ class RolePermission(db.Model):
             return False
         for role_perm in role_perms:
             db.session.delete(role_perm)
-        db.session.commit()
+        db.session.flush()
         return True
 
     @staticmethod
@@ -67,5 +67,5 @@ class RolePermission(db.Model):
             return False
         for role_perm in role_perms:
             db.session.delete(role_perm)
-        db.session.commit()
+        db.session.flush()
         return True
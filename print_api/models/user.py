@@ -1,11 +1,17 @@
 from flask import current_app
 from marshmallow import fields, Schema
+from sqlalchemy import Integer, case, column, select, update, values
 from sqlalchemy.sql import func
 
 from print_api.common.ldap import LDAP
+from print_api.common.routing import STREAM_CHUNK_SIZE
 from print_api.models import db, UserRole
 
 
+# Change to the user score of each print outcome
+SCORE_INCREMENTS = {"completed": 1, "failed": -1, "rejected": -1}
+
+
 class User(db.Model):
     """
     User Model
@@ -28,6 +34,22 @@ class User(db.Model):
     slice_failed_count = db.Column(db.Integer, nullable=False, default=0)
     slice_rejected_count = db.Column(db.Integer, nullable=False, default=0)
 
+    __table_args__ = (
+        # Trigram indexes let job search match owners by any part of their name or email
+        db.Index(
+            "ix_users_name_trgm",
+            name,
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ),
+        db.Index(
+            "ix_users_email_trgm",
+            email,
+            postgresql_using="gin",
+            postgresql_ops={"email": "gin_trgm_ops"},
+        ),
+    )
+
     roles = db.relationship("UserRole", back_populates="user")
 
     # class constructor
@@ -98,25 +120,25 @@ class User(db.Model):
 
     def save(self):
         """
-        Save Object Function
+        Save Object Function, the change is committed with the rest of the request
         """
         db.session.add(self)
-        db.session.commit()
+        db.session.flush()
 
     def update(self, data):
         """
-        Update attributes function
+        Update attributes function, the change is committed with the rest of the request
         """
         for key, item in data.items():
             setattr(self, key, item)
-        db.session.commit()
+        db.session.flush()
 
     def delete(self):
         """
-        Delete Object Function
+        Delete Object Function, the change is committed with the rest of the request
         """
         db.session.delete(self)
-        db.session.commit()
+        db.session.flush()
 
     def has_role(self, role_id) -> bool:
         return UserRole.get(self.id, role_id) is not None
@@ -135,6 +157,18 @@ class User(db.Model):
         """
         return User.query.all()
 
+    @staticmethod
+    def stream_users():
+        """
+        Function to iterate over all the users, fetched from a server side cursor a chunk at a time.
+        The query only runs once iteration starts.
+        :return generator users: the users
+        """
+        statement = (
+            select(User).order_by(User.id).execution_options(yield_per=STREAM_CHUNK_SIZE)
+        )
+        yield from db.session.scalars(statement)
+
     @staticmethod
     def get_user_by_id(u_id):
         """
@@ -144,6 +178,64 @@ class User(db.Model):
         """
         return User.query.get(u_id)
 
+    @staticmethod
+    def get_users_by_ids(u_ids):
+        """
+        Function to get several users in a single query
+        :param list u_ids: the PKs of the users
+        :return dict users: PK to user for every user that exists
+        """
+        if not u_ids:
+            return {}
+        return {user.id: user for user in User.query.filter(User.id.in_(set(u_ids)))}
+
+    @staticmethod
+    def record_print_outcomes(outcomes):
+        """
+        Function to atomically apply the counters and scores of finished prints in one statement.
+        The user gets their '{status}_count' and score changed, the rep their 'slice_{status}_count'.
+        The score changes of each user are summed before they are applied and the sum is clamped so
+        scores never drop below 1, so the result does not depend on the order of the outcomes.
+        :param list outcomes: (user PK, rep PK, status) tuples with status one of SCORE_INCREMENTS
+        :return set user_ids: the PKs of the users that were updated
+        """
+        keys = ["user_score"]
+        keys += [f"{status}_count" for status in SCORE_INCREMENTS]
+        keys += [f"slice_{status}_count" for status in SCORE_INCREMENTS]
+
+        totals = {}
+        for user_id, rep_id, status in outcomes:
+            user_totals = totals.setdefault(user_id, dict.fromkeys(keys, 0))
+            user_totals["user_score"] += SCORE_INCREMENTS[status]
+            user_totals[f"{status}_count"] += 1
+            rep_totals = totals.setdefault(rep_id, dict.fromkeys(keys, 0))
+            rep_totals[f"slice_{status}_count"] += 1
+        if not totals:
+            return set()
+
+        deltas = values(
+            column("id", Integer),
+            *(column(key, Integer) for key in keys),
+            name="deltas",
+        ).data(
+            [
+                (u_id, *(user_totals[key] for key in keys))
+                for u_id, user_totals in totals.items()
+            ]
+        )
+        changes = {key: getattr(User, key) + deltas.c[key] for key in keys}
+        changes["user_score"] = case(
+            (deltas.c.user_score == 0, User.user_score),
+            else_=func.greatest(User.user_score + deltas.c.user_score, 1),
+        )
+        statement = (
+            update(User)
+            .where(User.id == deltas.c.id)
+            .values(changes)
+            .returning(User.id)
+        )
+        return set(db.session.execute(statement).scalars().all())
+
     @staticmethod
     def get_user_by_email(value):
         """
@@ -153,6 +245,17 @@ class User(db.Model):
         """
         return User.query.filter_by(email=value).first()
 
+    @staticmethod
+    def get_users_by_emails(emails):
+        """
+        Function to get several users by their emails in a single query
+        :param list emails: the emails of the users
+        :return dict users: email to user for every user that exists
+        """
+        if not emails:
+            return {}
+        return {user.email: user for user in User.query.filter(User.email.in_(set(emails)))}
+
     @staticmethod
     def get_user_by_uid(value):
         """
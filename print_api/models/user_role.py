@@ -28,7 +28,7 @@ class UserRole(db.Model):
             return False
         user_role = UserRole(user_id=user_id, role_id=role_id)
         db.session.add(user_role)
-        db.session.commit()
+        db.session.flush()
         return True
 
     @staticmethod
@@ -49,7 +49,7 @@ class UserRole(db.Model):
         if user_role is None:
             return False
         db.session.delete(user_role)
-        db.session.commit()
+        db.session.flush()
         return True
 
     @staticmethod
@@ -59,7 +59,7 @@ class UserRole(db.Model):
             return False
         for user_role in user_roles:
             db.session.delete(user_role)
-        db.session.commit()
+        db.session.flush()
         return True
 
     @staticmethod
@@ -70,5 +70,5 @@ class UserRole(db.Model):
         # TODO WORK OUT HOW TO DO THIS IN ONE QUERY SO IT CAN BE ROLLEDBACKED IF NOT ALLOWED TO DELETE THE ROLE
         for user_role in user_roles:
             db.session.delete(user_role)
-        db.session.commit()
+        db.session.flush()
         return True
@@ -0,0 +1,171 @@
+from flask import Blueprint
+from flask_jwt_extended import jwt_required
+
+from print_api.common.etags import conditional
+from print_api.common.routing import custom_response, get_day_range
+from print_api.models import DailyJobStats, PrinterDailyStats, RepDailyStats
+
+analytics_api = Blueprint("analytics", __name__)
+
+
+def _rate(part, total):
+    return part / total if total else None
+
+
+def _range_meta(since, until):
+    return {"since": since.isoformat(), "until": until.isoformat()}
+
+
+@analytics_api.route("/jobs/daily", methods=["GET"])
+@jwt_required()
+@conditional("daily_job_stats")
+def get_daily_jobs():
+    """
+    Function to get the number of jobs added and started each day, and how long the started jobs
+    waited in the queue on average. Days without jobs are left out.
+    :return response: error or list of daily job counts
+    """
+    try:
+        since, until = get_day_range()
+    except ValueError as err:
+        return custom_response(status_code=400, details=str(err))
+
+    final_res = [
+        {
+            "day": stats.day.isoformat(),
+            "jobs_added": stats.jobs_added,
+            "jobs_started": stats.jobs_started,
+            "average_wait_seconds": _rate(stats.wait_seconds, stats.jobs_started),
+        }
+        for stats in DailyJobStats.get_days(since, until)
+    ]
+    return custom_response(
+        status_code=200,
+        details=final_res,
+        extra_info="success",
+        meta=_range_meta(since, until),
+    )
+
+
+@analytics_api.route("/queue-wait", methods=["GET"])
+@jwt_required()
+@conditional("daily_job_stats")
+def get_queue_wait():
+    """
+    Function to get how long the jobs started in a range waited in the queue on average
+    :return response: error or the number of jobs started and their average wait in seconds
+    """
+    try:
+        since, until = get_day_range()
+    except ValueError as err:
+        return custom_response(status_code=400, details=str(err))
+
+    days = DailyJobStats.get_days(since, until)
+    jobs_started = sum(stats.jobs_started for stats in days)
+    wait_seconds = sum(stats.wait_seconds for stats in days)
+    final_res = {
+        "jobs_started": jobs_started,
+        "average_wait_seconds": _rate(wait_seconds, jobs_started),
+    }
+    return custom_response(
+        status_code=200,
+        details=final_res,
+        extra_info="success",
+        meta=_range_meta(since, until),
+    )
+
+
+@analytics_api.route("/printers/filament/weekly", methods=["GET"])
+@jwt_required()
+@conditional("printer_daily_stats")
+def get_weekly_filament():
+    """
+    Function to get the filament used, in grams, and the print time of every printer per week.
+    Weeks start on Monday and are cut short by the range.
+    :return response: error or list of weekly printer usage
+    """
+    try:
+        since, until = get_day_range()
+    except ValueError as err:
+        return custom_response(status_code=400, details=str(err))
+
+    final_res = [
+        {
+            "week": row.week.isoformat(),
+            "printer_id": row.printer_id,
+            "filament_used": row.filament_used,
+            "print_seconds": row.print_seconds,
+        }
+        for row in PrinterDailyStats.get_weekly_usage(since, until)
+    ]
+    return custom_response(
+        status_code=200,
+        details=final_res,
+        extra_info="success",
+        meta=_range_meta(since, until),
+    )
+
+
+@analytics_api.route("/printers/failure-rate", methods=["GET"])
+@jwt_required()
+@conditional("printer_daily_stats")
+def get_printer_failure_rates():
+    """
+    Function to get the share of the jobs ended on every printer that failed
+    :return response: error or list of printer failure rates
+    """
+    try:
+        since, until = get_day_range()
+    except ValueError as err:
+        return custom_response(status_code=400, details=str(err))
+
+    final_res = [
+        {
+            "printer_id": row.printer_id,
+            "completed_count": row.completed_count,
+            "failed_count": row.failed_count,
+            "failure_rate": _rate(row.failed_count, row.completed_count + row.failed_count),
+        }
+        for row in PrinterDailyStats.get_outcomes(since, until)
+    ]
+    return custom_response(
+        status_code=200,
+        details=final_res,
+        extra_info="success",
+        meta=_range_meta(since, until),
+    )
+
+
+@analytics_api.route("/reps/failure-rate", methods=["GET"])
+@jwt_required()
+@conditional("rep_daily_stats")
+def get_rep_failure_rates():
+    """
+    Function to get the share of the jobs every rep checked that failed or were rejected, counted
+    the same way as the autoreview fail rate
+    :return response: error or list of rep failure rates
+    """
+    try:
+        since, until = get_day_range()
+    except ValueError as err:
+        return custom_response(status_code=400, details=str(err))
+
+    final_res = [
+        {
+            "rep_id": row.rep_id,
+            "completed_count": row.completed_count,
+            "failed_count": row.failed_count,
+            "rejected_count": row.rejected_count,
+            "failure_rate": _rate(
+                row.failed_count + row.rejected_count,
+                row.completed_count + row.failed_count + row.rejected_count,
+            ),
+        }
+        for row in RepDailyStats.get_outcomes(since, until)
+    ]
+    return custom_response(
+        status_code=200,
+        details=final_res,
+        extra_info="success",
+        meta=_range_meta(since, until),
+    )
@@ -2,11 +2,14 @@ from flask import request, Blueprint
 from flask_jwt_extended import jwt_required
 from marshmallow.exceptions import ValidationError
 
+from print_api.common.etags import conditional
 from print_api.common.routing import custom_response
+from print_api.common.serializers import compile_serializer
 from print_api.models import Printer, MaintenanceLog, MaintenanceSchema
 
 maintenance_api = Blueprint("maintenance logs", __name__)
 maintenance_schema = MaintenanceSchema()
+serialize_log = compile_serializer(maintenance_schema)
 
 NOTFOUNDMAINTENANCE = "maintenance log(s) not found"
 
@@ -26,6 +29,7 @@ def update_by_id(log_id):
 
 @maintenance_api.route("/log/single/<int:log_id>", methods=["GET"])
 @jwt_required()
+@conditional("maintenance_logs")
 def view_single_by_id(log_id):
     """
     Function to get a single log via its ID
@@ -37,6 +41,7 @@ def view_single_by_id(log_id):
 
 @maintenance_api.route("log/printer/name/<string:printer_name>", methods=["GET"])
 @jwt_required()
+@conditional("maintenance_logs", "printers")
 def view_all_by_printer_name(printer_name):
     """
     Get all logs via their linked printers name
@@ -56,6 +61,7 @@ def view_all_by_printer_name(printer_name):
 
 @maintenance_api.route("/log/printer/<int:printer_id>", methods=["GET"])
 @jwt_required()
+@conditional("maintenance_logs")
 def view_all_by_printer_id(printer_id):
     """
     Get all logs via their linked printers name
@@ -104,7 +110,7 @@ def create():
     log = MaintenanceLog(data)
     log.save()
     return custom_response(
-        status_code=200, extra_info="success", details=maintenance_schema.dump(log)
+        status_code=200, extra_info="success", details=serialize_log(log)
     )
 
 
@@ -128,7 +134,7 @@ def get_log_details(log):
     """
     if not log:
         return custom_response(status_code=404, details=NOTFOUNDMAINTENANCE)
-    ser_log = maintenance_schema.dump(log)
+    ser_log = serialize_log(log)
     return custom_response(status_code=200, details=ser_log, extra_info="success")
 
 
@@ -138,10 +144,7 @@ def get_multiple_log_details(logs):
     :param logs: the query object containing all the logs
     :return response: the list of serialized log objects.
     """
-    jason = []
-    final_res = {"maintenance_logs": jason}
-    for log in logs:
-        jason.append(maintenance_schema.dump(log))
+    final_res = {"maintenance_logs": [serialize_log(log) for log in logs]}
     return custom_response(status_code=200, details=final_res, extra_info="success")
 
 
@@ -169,5 +172,5 @@ def update_log_details(log, req_data):
         print(err.valid_data)  # => {"name": "John"}
         return custom_response(status_code=400, details=err.messages)
     log.update(data)
-    ser_log = maintenance_schema.dump(log)
+    ser_log = serialize_log(log)
     return custom_response(status_code=200, details=ser_log, extra_info="success")
@@ -1,18 +1,48 @@
-import re
 from datetime import datetime
 
-from flask import request, Blueprint, Response
-from flask_jwt_extended import jwt_required
+from celery.result import AsyncResult
+from flask import request, Blueprint, Response, send_from_directory, stream_with_context, url_for
+from flask_jwt_extended import get_jwt_identity, jwt_required
 from marshmallow.exceptions import ValidationError
-
-from print_api.common.emails import email
-from print_api.common.routing import custom_response
-from print_api.models import PrintJob, PrintJobSchema, Printer, User
+from sqlalchemy.sql import func
+
+from print_api.common.auth import role_required
+from print_api.common.autoreview import get_autoreview_policy
+from print_api.common.dispatcher import DEFAULT_POLICY, POLICIES, dispatcher
+from print_api.common.emails import email, email_many
+from print_api.common.eta import get_all_estimates, get_estimates
+from print_api.common.exports import EXPORT_FORMATS, get_export_dir, is_format_available
+from print_api.common.etags import conditional
+from print_api.common.events import job_event_stream
+from print_api.common.idempotency import idempotent
+from print_api.common.imports import (
+    IMPORT_FORMATS,
+    detect_format,
+    import_jobs,
+    open_import_file,
+    read_records,
+)
+from print_api.common.pagination import get_offset_page_args, get_page_args
+from print_api.common.routing import custom_response, is_stream_requested, streaming_response
+from print_api.common.serializers import compile_serializer
+from print_api.common.tasks import celery, export_print_jobs
+from print_api.models import (
+    PrintJob,
+    PrintJobEvent,
+    PrintJobEventSchema,
+    PrintJobSchema,
+    Printer,
+    PrinterType,
+    User,
+)
 from print_api.models.print_jobs import JobStatus
+from print_api.models.user import SCORE_INCREMENTS
 from print_api.resources.api_routes.printer_route import increment_printer_details
 
 print_job_api = Blueprint("print jobs", __name__)
 print_job_schema = PrintJobSchema()
+serialize_print_job = compile_serializer(print_job_schema)
+serialize_print_job_event = compile_serializer(PrintJobEventSchema())
 
 JOB_NOT_FOUND = "job(s) not found"
 USER_ID_ERROR = "user(s) not found"
@@ -20,14 +50,25 @@ STATUS_ERROR = "status not found"
 
 APPROVED_ACTIONS = ["accept", "reject", "fail", "complete", "queue", "review", "start"]
 
+# Actions that can be applied to many jobs at once, starting needs a printer per job so is left out
+BATCH_ACTIONS = ["accept", "reject", "fail", "complete", "queue", "review"]
+MAX_BATCH_SIZE = 1000
+
+# How many skipped records an import lists, the rest are only counted
+MAX_REPORTED_IMPORT_ERRORS = 100
+
+# How many suggestions auto-assign tries before giving up, in case others start them first
+AUTO_ASSIGN_ATTEMPTS = 5
+
 
 @print_job_api.route("/job", methods=["POST"])
 @jwt_required()
+@idempotent
 def create():
     req_data = request.get_json()
 
     user_level = check_user_id(req_data["user_id"])
-    validation_error = validate_create_input(req_data)
+    validation_error = validate_create_input(req_data, user_level)
     if validation_error:
         return validation_error
 
@@ -40,15 +81,21 @@ def create():
     except ValidationError as err:
         return custom_response(status_code=400, details=err.messages)
 
+    if data["status"] != JobStatus.approval:
+        # The rep was already loaded by validate_create_input, so this is not another query
+        rep = User.get_user_by_id(data["rep_check"])
+        data["status"] = get_autoreview_policy().classify(rep, data["print_time"])
+
     job = PrintJob(data)
     job.save()
     return custom_response(
-        status_code=200, extra_info="success", details=print_job_schema.dump(job)
+        status_code=200, extra_info="success", details=serialize_print_job(job)
     )
 
 
 @print_job_api.route("/job/<int:job_id>", methods=["GET"])
 @jwt_required()
+@conditional("print_jobs", "print_jobs_archive")
 def view_job_single(job_id):
     """
     Function return a serialized job by its id
@@ -60,64 +107,438 @@ def view_job_single(job_id):
 
 @print_job_api.route("/job/status/<string:status>", methods=["GET"])
 @jwt_required()
+@conditional("print_jobs")
 def view_jobs_by_status(status):
     """
-    Function to return a list of serialized jobs filtered by their status
+    Function to return a page of serialized jobs filtered by their status
     :param str status:  from the job_status enum of which status to filter by
     :return response: error or list of serialized jobs matching filter
     """
     # Sanity check url
     if status not in JobStatus._member_names_:
         return custom_response(status_code=400, details=STATUS_ERROR)
+    try:
+        limit, after = get_page_args()
+    except ValueError as err:
+        return custom_response(status_code=400, details=str(err))
     # Return a list of jason objects that match status query
-    return get_multiple_job_details(PrintJob.get_print_jobs_by_status(status))
+    return get_multiple_job_details(
+        *PrintJob.get_print_jobs_page(limit, after=after, status=status)
+    )
+
+
+@print_job_api.route("/job/user/<int:user_id>", methods=["GET"])
+@jwt_required()
+@conditional("print_jobs", "print_jobs_archive")
+def view_jobs_by_user(user_id):
+    """
+    Function to return a page of a user's serialized jobs, use ?status= to filter them and ?limit=
+    and ?after= to page through them
+    :param int user_id: PK of the user
+    :return response: error or list of the user's serialized jobs
+    """
+    if User.get_user_by_id(user_id) is None:
+        return custom_response(status_code=404, details=USER_ID_ERROR)
+    return get_filtered_job_page(user_id=user_id)
+
+
+@print_job_api.route("/job/rep/<int:rep_id>", methods=["GET"])
+@jwt_required()
+@conditional("print_jobs", "print_jobs_archive")
+def view_jobs_by_rep(rep_id):
+    """
+    Function to return a page of the serialized jobs a rep has checked, use ?status= to filter them
+    and ?limit= and ?after= to page through them
+    :param int rep_id: PK of the rep
+    :return response: error or list of the serialized jobs checked by the rep
+    """
+    if User.get_user_by_id(rep_id) is None:
+        return custom_response(status_code=404, details=USER_ID_ERROR)
+    return get_filtered_job_page(rep_id=rep_id)
 
 
 @print_job_api.route("/job", methods=["GET"])
 @jwt_required()
+@conditional("print_jobs", "print_job_tombstones")
 def view_all_jobs():
     """
-    Function to return a list of all serialised print jobs
+    Function to return a page of serialised print jobs, use ?limit= and ?after= to page through them.
+    The meta block carries a version, pass it back as ?since= to get only the jobs changed and
+    deleted since then. Use ?stream=true to get every job in one streamed response instead.
     :return response: error or list of serialised jobs matching filter
     """
-    return get_multiple_job_details(PrintJob.get_all_print_jobs())
+    if "since" in request.args:
+        return get_job_changes(request.args["since"])
+    if is_stream_requested():
+        return streaming_response(
+            "print_jobs",
+            PrintJob.stream_print_jobs(),
+            serialize_print_job,
+            extra_info="success",
+            meta={"version": PrintJob.get_visible_version()},
+        )
+    try:
+        limit, after = get_page_args()
+    except ValueError as err:
+        return custom_response(status_code=400, details=str(err))
+    version = PrintJob.get_visible_version()
+    return get_multiple_job_details(
+        *PrintJob.get_print_jobs_page(limit, after=after), version=version
+    )
+
+
+@print_job_api.route("/job/search", methods=["GET"])
+@jwt_required()
+@conditional("print_jobs", "users")
+def search_jobs():
+    """
+    Function to search the print jobs by name, notes, project, colour and owner, best match first.
+    Use ?q= for the search terms, and ?limit= and ?offset= to page through the results.
+    :return response: error or list of serialized jobs matching the search
+    """
+    q = request.args.get("q", "").strip()
+    if not q:
+        return custom_response(status_code=400, details="q must not be empty")
+    try:
+        limit, offset = get_offset_page_args()
+    except ValueError as err:
+        return custom_response(status_code=400, details=str(err))
+
+    # One extra job is fetched to know whether there is another page
+    jobs = PrintJob.search_print_jobs(q, limit + 1, offset)
+    next_offset = offset + limit if len(jobs) > limit else None
+    final_res = {"print_jobs": [serialize_print_job(job) for job in jobs[:limit]]}
+    return custom_response(
+        status_code=200,
+        details=final_res,
+        extra_info="success",
+        meta={"next_offset": next_offset},
+    )
+
+
+@print_job_api.route("/stream", methods=["GET"])
+@jwt_required()
+def stream_jobs():
+    """
+    Function to stream job-created, job-transitioned and job-deleted events as Server-Sent Events
+    :return response: a text/event-stream response that stays open
+    """
+    return Response(
+        stream_with_context(job_event_stream()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@print_job_api.route("/job/claim", methods=["POST"])
+@jwt_required()
+@idempotent
+def claim_job():
+    """
+    Function to start the oldest queued job that can run on a printer. Concurrent claims each get a
+    different job, claims for the same printer are serialized on the printer.
+    :return response: error or the claimed job
+    """
+    req_data = request.get_json(silent=True) or {}
+    request_dict = validate_start_queued_input(req_data)
+    if "printer" not in request_dict:
+        return custom_response(status_code=400, details="printer is required")
+    try:
+        data = print_job_schema.load(request_dict, partial=True)
+    except ValidationError as err:
+        return custom_response(status_code=400, details=err.messages)
+
+    printer_id = data["printer"]
+    data["status"] = JobStatus.running
+    data["date_started"] = func.now()
+
+    printer = Printer.get_printer_by_id_for_update(printer_id)
+    if printer is None:
+        return custom_response(status_code=404, details="Printer Not Found")
+    if PrintJob.is_printer_busy(printer_id):
+        return custom_response(status_code=400, details="Associated Printer is in use")
+
+    job = PrintJob.claim_next(printer.printer_type, data)
+    if job is None:
+        return custom_response(status_code=404, details="No queued jobs for this printer type")
+    return get_single_job_details(job)
+
+
+@print_job_api.route("/job/dispatch", methods=["GET"])
+@jwt_required()
+def view_dispatch_plan():
+    """
+    Function to suggest the next queued job for every idle printer, use ?policy= to pick one of
+    fifo, shortest or fair_share
+    :return response: error or the suggested job for each idle printer
+    """
+    policy = request.args.get("policy", DEFAULT_POLICY)
+    error = validate_policy(policy)
+    if error:
+        return error
+
+    plan = dispatcher.plan(policy)
+    jobs = PrintJob.get_print_jobs_by_ids([queued.id for _, queued in plan])
+    final_res = {
+        "assignments": [
+            {"printer": printer_id, "print_job": serialize_print_job(jobs[queued.id])}
+            for printer_id, queued in plan
+            if queued.id in jobs
+        ]
+    }
+    return custom_response(status_code=200, details=final_res, extra_info="success")
+
+
+@print_job_api.route("/job/dispatch/<int:printer_id>", methods=["GET"])
+@jwt_required()
+def view_dispatch_suggestion(printer_id):
+    """
+    Function to suggest the next queued job for a printer, use ?policy= to pick the policy
+    :param int printer_id: PK of the printer
+    :return response: error or the suggested job (null if nothing is queued for the printer type)
+    """
+    policy = request.args.get("policy", DEFAULT_POLICY)
+    error = validate_policy(policy)
+    if error:
+        return error
+    printer = Printer.get_printer_by_id(printer_id)
+    if printer is None:
+        return custom_response(status_code=404, details="Printer Not Found")
+
+    suggestion = dispatcher.suggest(printer.printer_type, policy)
+    job = PrintJob.get_print_job_by_id(suggestion[0].id) if suggestion else None
+    final_res = {"print_job": serialize_print_job(job) if job else None}
+    return custom_response(status_code=200, details=final_res, extra_info="success")
+
+
+@print_job_api.route("/job/dispatch/<int:printer_id>", methods=["PUT"])
+@jwt_required()
+def dispatch_to_printer(printer_id):
+    """
+    Function to start the next queued job on a printer, use ?policy= to pick the policy
+    :param int printer_id: PK of the printer
+    :return response: error or the started job
+    """
+    policy = request.args.get("policy", DEFAULT_POLICY)
+    error = validate_policy(policy)
+    if error:
+        return error
+    printer = Printer.get_printer_by_id(printer_id)
+    if printer is None:
+        return custom_response(status_code=404, details="Printer Not Found")
+
+    # A suggestion can be started by someone else first, that start fails with 409 and the
+    # next suggestion is tried instead
+    for queued in dispatcher.suggest(printer.printer_type, policy, count=AUTO_ASSIGN_ATTEMPTS):
+        response = action_start(queued.id, {"printer": printer_id})
+        if response.status_code != 409:
+            return response
+    return custom_response(status_code=404, details="No queued jobs for this printer type")
+
+
+@print_job_api.route("/job/eta", methods=["GET"])
+@jwt_required()
+def view_queue_estimates():
+    """
+    Function to estimate when every queued job will start and finish, use ?printer_type= to only
+    get the jobs of one printer type
+    :return response: error or the estimates of the queued jobs in queue order
+    """
+    printer_type = request.args.get("printer_type")
+    if printer_type is None:
+        estimates = get_all_estimates()
+    elif printer_type in PrinterType._member_names_:
+        estimates = get_estimates(PrinterType[printer_type])
+    else:
+        return custom_response(status_code=400, details="printer type not found")
+    return custom_response(
+        status_code=200, details={"estimates": estimates}, extra_info="success"
+    )
+
+
+@print_job_api.route("/job/import", methods=["POST"])
+@role_required("root")
+@idempotent
+def import_print_jobs():
+    """
+    Function to import many print jobs from an uploaded CSV or NDJSON file (optionally gzipped) in
+    the `file` form field. The format is taken from the file name, or ?format=. Invalid records are
+    skipped and reported by their number in the file, every other record is imported.
+    :return response: error or the number of jobs imported and the errors of the skipped records
+    """
+    upload = request.files.get("file")
+    if upload is None:
+        return custom_response(status_code=400, details="file is required")
+    fmt = request.args.get("format") or detect_format(upload.filename or "")
+    if fmt not in IMPORT_FORMATS:
+        return custom_response(
+            status_code=400, details=f"format must be one of {', '.join(IMPORT_FORMATS)}"
+        )
+
+    imported = 0
+    errors = {}
+    try:
+        file = open_import_file(upload.stream, upload.filename or "")
+        for count, batch_errors in import_jobs(read_records(file, fmt)):
+            imported += count
+            errors.update(batch_errors)
+    except (ValueError, OSError) as err:
+        return custom_response(status_code=400, details=str(err))
+
+    final_res = {
+        "imported": imported,
+        "skipped": len(errors),
+        "errors": dict(list(errors.items())[:MAX_REPORTED_IMPORT_ERRORS]),
+    }
+    return custom_response(status_code=200, details=final_res, extra_info="success")
+
+
+@print_job_api.route("/job/export", methods=["POST"])
+@jwt_required()
+@idempotent
+def start_export():
+    """
+    Function to start exporting the history of every print job in the background. Takes the format
+    (csv, ndjson or parquet) and optional since and until dates to only export jobs added between them.
+    :return response: error or the id of the export and the url to poll its status from
+    """
+    req_data = request.get_json(silent=True) or {}
+    fmt = req_data.get("format", "csv")
+    if fmt not in EXPORT_FORMATS:
+        return custom_response(
+            status_code=400, details=f"format must be one of {', '.join(EXPORT_FORMATS)}"
+        )
+    if not is_format_available(fmt):
+        return custom_response(status_code=400, details=f"{fmt} exports are not available")
+    for key in ("since", "until"):
+        try:
+            if req_data.get(key) is not None:
+                datetime.fromisoformat(req_data[key])
+        except (TypeError, ValueError):
+            return custom_response(status_code=400, details=f"{key} must be an ISO 8601 date")
+
+    task = export_print_jobs.apply_async(
+        kwargs={
+            "fmt": fmt,
+            "since": req_data.get("since"),
+            "until": req_data.get("until"),
+            "requested_by": get_jwt_identity(),
+        }
+    )
+    final_res = {
+        "id": task.id,
+        "status_url": url_for(".view_export", export_id=task.id),
+    }
+    return custom_response(status_code=202, details=final_res, extra_info="success")
+
+
+@print_job_api.route("/job/export/<string:export_id>", methods=["GET"])
+@jwt_required()
+def view_export(export_id):
+    """
+    Function to return the status of an export, with the url to download it from once it is ready
+    :param str export_id: the id returned when the export was started
+    :return response: error or the status of the export
+    """
+    result = AsyncResult(export_id, app=celery)
+    final_res = {"id": export_id, "state": result.state.lower()}
+    if result.successful():
+        if result.result["requested_by"] != get_jwt_identity():
+            return custom_response(status_code=404, details="Export not found")
+        final_res["rows"] = result.result["rows"]
+        final_res["format"] = result.result["format"]
+        final_res["download_url"] = url_for(".download_export", export_id=export_id)
+    return custom_response(status_code=200, details=final_res, extra_info="success")
+
+
+@print_job_api.route("/job/export/<string:export_id>/download", methods=["GET"])
+@jwt_required()
+def download_export(export_id):
+    """
+    Function to download a finished export
+    :param str export_id: the id returned when the export was started
+    :return response: error or the export file
+    """
+    result = AsyncResult(export_id, app=celery)
+    if not result.successful() or result.result["requested_by"] != get_jwt_identity():
+        return custom_response(status_code=404, details="Export not found")
+    return send_from_directory(get_export_dir(), result.result["file"], as_attachment=True)
+
+
+@print_job_api.route("/job/<int:job_id>/events", methods=["GET"])
+@jwt_required()
+@conditional("print_job_events")
+def view_job_events(job_id):
+    """
+    Function to return the status history of a job, oldest first
+    :param int job_id: PK of the job record
+    :return response: error or the serialized events of the job
+    """
+    events = PrintJobEvent.get_events_by_job_id(job_id)
+    if not events:
+        return custom_response(status_code=404, details=JOB_NOT_FOUND)
+    final_res = {"events": [serialize_print_job_event(event) for event in events]}
+    return custom_response(status_code=200, details=final_res, extra_info="success")
+
+
+@print_job_api.route("/job/<int:job_id>/eta", methods=["GET"])
+@jwt_required()
+def view_job_estimate(job_id):
+    """
+    Function to estimate when a queued job will start and finish
+    :param int job_id: PK of the job record
+    :return response: error or the estimate of the job
+    """
+    job = PrintJob.get_print_job_by_id(job_id)
+    if job is None:
+        return custom_response(status_code=404, details=JOB_NOT_FOUND)
+    if job.status != JobStatus.queued:
+        return custom_response(
+            status_code=400, details=f"Job is {job.status.name}. Only queued jobs have an estimate."
+        )
+    for estimate in get_estimates(job.printer_type):
+        if estimate["id"] == job_id:
+            return custom_response(status_code=200, details=estimate, extra_info="success")
+    return custom_response(status_code=404, details=JOB_NOT_FOUND)
 
 
 @print_job_api.route("/job/<int:job_id>/<string:action>", methods=["PUT"])
 @jwt_required()
+@idempotent
 def action_job(job_id, action):
-    req_data = request.get_json(silent=True)
+    """
+    Function to move a job through the print state machine. Each transition is applied as a
+    single conditional update so concurrent requests cannot both apply it.
+    :param int job_id: PK of the job record
+    :param str action: one of APPROVED_ACTIONS
+    :return response: error, 409 if the job is no longer in the expected status, or the serialized job
+    """
+    req_data = request.get_json(silent=True) or {}
     if action not in APPROVED_ACTIONS:
         return custom_response(status_code=400, details="Invalid action")
 
-    job = PrintJob.get_print_job_by_id(job_id)
-
-    validation_error = validate_job_exists(job)
-    if validation_error:
-        return validation_error
-
     match action.lower():
         case "accept":
-            handler = action_accept(job)
+            handler = action_accept(job_id)
 
         case "reject":
-            handler = action_reject(job)
+            handler = action_reject(job_id)
 
         case "start":
-            handler = action_start(job, req_data)
+            handler = action_start(job_id, req_data)
 
         case "complete":
-            handler = action_complete(job)
+            handler = action_complete(job_id)
 
         case "fail":
             requeue = request.args.get("requeue", default="no")
-            handler = action_fail(job, requeue)
+            handler = action_fail(job_id, requeue)
 
         case "queue":
-            handler = action_queue(job)
+            handler = action_queue(job_id)
 
         case "review":
-            handler = action_review(job)
+            handler = action_review(job_id)
 
         case _:
             return custom_response(status_code=400, details="Invalid action")
@@ -125,6 +546,93 @@ def action_job(job_id, action):
     return handler
 
 
+@print_job_api.route("/job/batch/<string:action>", methods=["PUT"])
+@jwt_required()
+@idempotent
+def batch_action_jobs(action):
+    """
+    Function to apply the same action to many jobs in one transaction. Each transition is a single
+    set based update, and the emails, score and printer changes of all the jobs are applied together.
+    :param str action: one of BATCH_ACTIONS
+    :return response: error or the result of the action for every job id
+    """
+    req_data = request.get_json(silent=True) or {}
+    job_ids = req_data.get("ids")
+    if not isinstance(job_ids, list) or not all(
+        isinstance(job_id, int) and not isinstance(job_id, bool) for job_id in job_ids
+    ):
+        return custom_response(status_code=400, details="ids must be a list of job ids")
+    if not 1 <= len(job_ids) <= MAX_BATCH_SIZE:
+        return custom_response(
+            status_code=400, details=f"ids must contain between 1 and {MAX_BATCH_SIZE} job ids"
+        )
+    job_ids = list(dict.fromkeys(job_ids))
+
+    missing = set()
+    match action.lower():
+        case "accept" | "queue":
+            expected_status = JobStatus.under_review
+            jobs = PrintJob.transition_many(
+                job_ids, expected_status, {"status": JobStatus.queued}
+            )
+
+        case "review":
+            expected_status = JobStatus.queued
+            jobs = PrintJob.transition_many(
+                job_ids, expected_status, {"status": JobStatus.under_review}
+            )
+
+        case "reject":
+            expected_status = JobStatus.under_review
+            jobs = PrintJob.transition_many(
+                job_ids,
+                expected_status,
+                {"status": JobStatus.rejected, "date_ended": func.now()},
+            )
+            missing = record_finished_jobs(jobs, "rejected")
+
+        case "complete":
+            expected_status = JobStatus.running
+            jobs = PrintJob.transition_many(
+                job_ids,
+                expected_status,
+                {"status": JobStatus.completed, "date_ended": func.now()},
+            )
+            missing = record_finished_jobs(jobs, "completed", printer_counter="completed_prints")
+
+        case "fail":
+            requeue = request.args.get("requeue", default="no")
+            if requeue not in ["yes", "no"]:
+                return custom_response(
+                    status_code=400,
+                    details="Invalid Parameters in Request",
+                    extra_info="Requeue needs to be yes or no",
+                )
+            expected_status = JobStatus.running
+            if requeue == "yes":
+                jobs = PrintJob.transition_many(job_ids, expected_status, handle_requeue())
+                missing = record_finished_jobs(jobs, None, printer_counter="failed_prints")
+            else:
+                jobs = PrintJob.transition_many(
+                    job_ids,
+                    expected_status,
+                    {"status": JobStatus.failed, "date_ended": func.now()},
+                )
+                missing = record_finished_jobs(jobs, "failed", printer_counter="failed_prints")
+
+        case _:
+            return custom_response(status_code=400, details="Invalid action")
+
+    if missing:
+        # Like a single job action, the whole batch is rolled back rather than half recorded
+        return custom_response(
+            status_code=404, details=USER_ID_ERROR, extra_info={"user_ids": sorted(missing)}
+        )
+
+    final_res = {"results": get_batch_results(job_ids, jobs, expected_status)}
+    return custom_response(status_code=200, details=final_res, extra_info="success")
+
+
 @print_job_api.route("/job/<int:job_id>", methods=["DELETE"])
 @jwt_required()
 def delete_job(job_id):
@@ -141,30 +649,25 @@ def delete_job(job_id):
 
 
 # Action Callbacks
-def action_accept(job) -> Response:
-    validation_error = validate_job_status(job, JobStatus.under_review)
-    if validation_error:
-        return validation_error
-
-    return update_job_details(job, {"status": "queued"})
-
-
-def action_reject(job):
-    validation_error = validate_job_status(job, JobStatus.under_review)
-    if validation_error:
-        return validation_error
+def action_accept(job_id) -> Response:
+    job, error = apply_transition(
+        job_id, JobStatus.under_review, {"status": JobStatus.queued}
+    )
+    if error:
+        return error
+    return get_single_job_details(job)
 
-    if job.status not in [JobStatus.queued, JobStatus.under_review]:
-        return custom_response(
-            status_code=400, details="Job not under-review (or queued)"
-        )
 
-    job_change_values = {
-        "status": JobStatus.rejected.name,
-        "date_ended": datetime.now().isoformat(),
-    }
+def action_reject(job_id) -> Response:
+    job, error = apply_transition(
+        job_id,
+        JobStatus.under_review,
+        {"status": JobStatus.rejected, "date_ended": func.now()},
+    )
+    if error:
+        return error
 
-    # Email user that the print is failed
+    # Email user that the print is rejected
     result = email(job.user_id, job.print_name, status="rejected")
     if not result:
         return custom_response(status_code=404, details=USER_ID_ERROR)
@@ -174,34 +677,53 @@ def action_reject(job):
     if not result:
         return custom_response(status_code=404, details=STATUS_ERROR)
 
+    return get_single_job_details(job)
+
+
+def action_start(job_id, req_data) -> Response:
+    request_dict = validate_start_queued_input(req_data)
+    if "printer" not in request_dict:
+        return custom_response(status_code=400, details="printer is required")
     try:
-        data = print_job_schema.load(job_change_values, partial=True)
+        data = print_job_schema.load(request_dict, partial=True)
     except ValidationError as err:
-        # => {"email": ['"foo" is not a valid email address.']}
-        print(err.messages)
-        print(err.valid_data)  # => {"name": "John"}
         return custom_response(status_code=400, details=err.messages)
-    job.update(data)
-    ser_job = print_job_schema.dump(job)
-
-    return custom_response(status_code=200, details=ser_job, extra_info="success")
 
+    printer_id = data["printer"]
+    data["status"] = JobStatus.running
+    data["date_started"] = func.now()
 
-def action_start(job, req_data):
-    request_dict = validate_start_queued_input(req_data)
-    validation_error = validate_job_status(job, JobStatus.queued)
-    if validation_error:
-        return validation_error
+    # Lock the printer so concurrent starts on it are serialized, then start the job only if it
+    # is still queued, matches the printer type and nothing else is running on the printer
+    printer = Printer.get_printer_by_id_for_update(printer_id)
+    if printer is None:
+        return custom_response(status_code=404, details="Printer Not Found")
+    job = PrintJob.transition(
+        job_id,
+        JobStatus.queued,
+        data,
+        PrintJob.printer_type == printer.printer_type,
+        ~PrintJob.running_on_printer_clause(printer_id),
+    )
+    if job is None:
+        current = PrintJob.get_print_job_by_id(job_id)
+        if current is None or current.status != JobStatus.queued:
+            return transition_error(current, JobStatus.queued)
+        if current.printer_type != printer.printer_type:
+            return custom_response(status_code=400, details="Printer Type mismatch")
+        return custom_response(status_code=400, details="Associated Printer is in use")
+    return get_single_job_details(job)
 
-    request_dict["status"] = JobStatus.running.name
-    request_dict["date_started"] = datetime.now().isoformat()
-    return update_job_details(job, request_dict)
 
+def action_complete(job_id) -> Response:
+    job, error = apply_transition(
+        job_id,
+        JobStatus.running,
+        {"status": JobStatus.completed, "date_ended": func.now()},
+    )
+    if error:
+        return error
 
-def action_complete(job):
-    validation_error = validate_job_status(job, JobStatus.running)
-    if validation_error:
-        return validation_error
     printer_increment_values = {
         "total_time_printed": job.print_time,
         "completed_prints": 1,
@@ -215,86 +737,57 @@ def action_complete(job):
     if validation_error:
         return validation_error
 
-    job_change_values = {
-        "status": JobStatus.completed.name,
-        "date_ended": datetime.now().isoformat(),
-    }
-
-    try:
-        data = print_job_schema.load(job_change_values, partial=True)
-    except ValidationError as err:
-        return custom_response(status_code=400, details=err.messages)
-    job.update(data)
-    ser_job = print_job_schema.dump(job)
+    return get_single_job_details(job)
 
-    return custom_response(status_code=200, details=ser_job, extra_info="success")
 
+def action_fail(job_id, requeue) -> Response:
+    if requeue == "yes":
+        job_change_values = handle_requeue()
+    else:
+        job_change_values = {"status": JobStatus.failed, "date_ended": func.now()}
 
-def action_fail(job, requeue):
-    validation_error = validate_job_status(job, JobStatus.running)
-    if validation_error:
-        return validation_error
+    job, error = apply_transition(job_id, JobStatus.running, job_change_values)
+    if error:
+        return error
 
     if handle_printer_details(job) is None:
         return custom_response(status_code=400, details="Printer Increment Error")
 
-    job_change_values = handle_requeue(job) if requeue == "yes" else handle_failure(job)
+    if requeue != "yes":
+        validation_error = handle_failure(job)
+        if validation_error:
+            return validation_error
 
-    try:
-        data = print_job_schema.load(job_change_values, partial=True)
-    except ValidationError as err:
-        return custom_response(status_code=400, details=err.messages)
-
-    job.update(data)
-    ser_job = print_job_schema.dump(job)
-    return custom_response(status_code=200, details=ser_job, extra_info="success")
+    return get_single_job_details(job)
 
 
-def action_queue(job):
-    # Check the job is queued or under-review
-    if job.status is not JobStatus.under_review:
-        return custom_response(status_code=400, details="Job not under-review")
-
-    job_change_values = {
-        "status": JobStatus.queued.name,
-    }
-
-    try:
-        data = print_job_schema.load(job_change_values, partial=True)
-    except ValidationError as err:
-        # => {"email": ['"foo" is not a valid email address.']}
-        print(err.messages)
-        print(err.valid_data)  # => {"name": "John"}
-        return custom_response(status_code=400, details=err.messages)
-    job.update(data)
-    ser_job = print_job_schema.dump(job)
-
-    return custom_response(status_code=200, details=ser_job, extra_info="success")
-    pass
-
+def action_queue(job_id) -> Response:
+    job, error = apply_transition(
+        job_id, JobStatus.under_review, {"status": JobStatus.queued}
+    )
+    if error:
+        return error
+    return get_single_job_details(job)
 
-def action_review(job):
-    if job.status is not JobStatus.queued:
-        return custom_response(status_code=400, details="Job not queued")
 
-    job_change_values = {
-        "status": JobStatus.under_review.name,
-    }
+def action_review(job_id) -> Response:
+    job, error = apply_transition(
+        job_id, JobStatus.queued, {"status": JobStatus.under_review}
+    )
+    if error:
+        return error
+    return get_single_job_details(job)
 
-    try:
-        data = print_job_schema.load(job_change_values, partial=True)
-    except ValidationError as err:
-        # => {"email": ['"foo" is not a valid email address.']}
-        print(err.messages)
-        print(err.valid_data)  # => {"name": "John"}
-        return custom_response(status_code=400, details=err.messages)
-    job.update(data)
-    ser_job = print_job_schema.dump(job)
 
-    return custom_response(status_code=200, details=ser_job, extra_info="success")
+# Helper Functions
+def validate_policy(policy):
+    if policy not in POLICIES:
+        return custom_response(
+            status_code=400, details=f"policy must be one of {', '.join(POLICIES)}"
+        )
+    return None
 
 
-# Helper Functions
 def filter_request_to_keys(req, keys):
     """
     Function to take a dict and a list of keys and return the dict containing only the keys supplied
@@ -305,32 +798,6 @@ def filter_request_to_keys(req, keys):
     return {k: req[k] for k in keys if k in req}
 
 
-def check_printer_id(printer_id):
-    """
-    Function to verify that a printer_id exists in the datbase
-    :param int printer_id: PK of the printer to search for
-    :return bool result: true if it exists, false otherwise
-    """
-    if Printer.get_printer_by_id(printer_id) is None:
-        return False
-    return True
-
-
-def running_on_printer(printer_id):
-    """
-    Function to check if a job is running on the same printer as another printer
-    :param int printer_id: ID of the printer to be checked
-    :return bool result: true if it is running on another printer (therefore do not run the job) or False if it is not
-    """
-    used_printer_ids = []
-    running_jobs = PrintJob.get_print_jobs_by_status("running")
-    for job in running_jobs:
-        used_printer_ids.append(print_job_schema.dump(job)["printer"])
-    if printer_id not in used_printer_ids:
-        return False
-    return True
-
-
 def check_user_id(user_id):
     """
     Function to verify a users level.
@@ -364,123 +831,183 @@ def get_single_job_details(job):
     """
     if not job:
         return custom_response(status_code=404, details=JOB_NOT_FOUND)
-    ser_job = print_job_schema.dump(job)
+    ser_job = serialize_print_job(job)
     return custom_response(status_code=200, details=ser_job, extra_info="success")
 
 
-def get_multiple_job_details(jobs):
+def get_multiple_job_details(jobs, next_cursor=None, version=None):
     """
     Function to take a query object of multiple print jobs and serialize them
     :param jobs: the query object containing print jobs
+    :param str next_cursor: the cursor of the next page, or None if there are no more jobs
+    :param int version: optional high-water mark for the next delta sync
     :return response: error or a list of serialized print jobs
     """
-    jason = []
-    final_res = {"print_jobs": jason}
-    for job in jobs:
-        jason.append(print_job_schema.dump(job))
-    return custom_response(status_code=200, details=final_res, extra_info="success")
+    final_res = {"print_jobs": [serialize_print_job(job) for job in jobs]}
+    meta = {"next_cursor": next_cursor}
+    if version is not None:
+        meta["version"] = version
+    return custom_response(
+        status_code=200, details=final_res, extra_info="success", meta=meta
+    )
 
 
-def update_job_details(job, req_data):
+def get_filtered_job_page(user_id=None, rep_id=None):
     """
-    Function to update the details of a job by a request.
-    :param job: the job object to be updated
-    :param dict req_data: the http body containing the data to be updated
-    :return response: error or the serialized updated print job
+    Function to serialize a page of the jobs of a user or rep, read from the ?status=, ?limit= and
+    ?after= arguments of the request
+    :param int user_id: optional PK of the user whose jobs to get
+    :param int rep_id: optional PK of the rep whose checked jobs to get
+    :return response: error or a list of serialized print jobs
     """
-    # Try and load Job data to the schema
+    status = request.args.get("status")
+    if status is not None and status not in JobStatus._member_names_:
+        return custom_response(status_code=400, details=STATUS_ERROR)
     try:
-        data = print_job_schema.load(req_data, partial=True)
-    except ValidationError as err:
-        # => {"email": ['"foo" is not a valid email address.']}
-        print(err.messages)
-        print(err.valid_data)  # => {"name": "John"}
-        return custom_response(status_code=400, details=err.messages)
-    job.update(data)
-    ser_job = print_job_schema.dump(job)
-    return custom_response(status_code=200, details=ser_job, extra_info="success")
+        limit, after = get_page_args()
+    except ValueError as err:
+        return custom_response(status_code=400, details=str(err))
+    return get_multiple_job_details(
+        *PrintJob.get_print_jobs_page(
+            limit, after=after, status=status, user_id=user_id, rep_id=rep_id
+        )
+    )
+
+
+def get_job_changes(since):
+    """
+    Function to serialize the jobs changed and deleted since a version
+    :param str since: the version returned by the clients previous sync
+    :return response: error or the changed jobs, the deleted job ids and the new version
+    """
+    try:
+        since = int(since)
+    except ValueError:
+        return custom_response(status_code=400, details="since must be an integer")
+    if since < 0:
+        return custom_response(status_code=400, details="since must be an integer")
+
+    jobs, deleted, version = PrintJob.get_print_job_changes(since)
+    final_res = {
+        "print_jobs": [serialize_print_job(job) for job in jobs],
+        "deleted": deleted,
+    }
+    return custom_response(
+        status_code=200, details=final_res, extra_info="success", meta={"version": version}
+    )
 
 
 def score_print(user_id, rep_id, status):
     """
+    Function to update the counters and scores of the user and rep of a finished print
+    :param int user_id: PK of the user who submitted the print
+    :param int rep_id: PK of the rep who checked the print
     :param str status: Either "completed", "failed" or "rejected".
+    :return bool result: true if both were updated, false otherwise
     """
-    score_increments = {"completed": 1, "failed": -1, "rejected": -1}
-
-    if status not in score_increments.keys():
+    if status not in SCORE_INCREMENTS:
         return False
-
-    user = User.get_user_by_id(user_id)
-    rep = User.get_user_by_id(rep_id)
-
-    user_data = {}
-    rep_data = {}
-
-    # increment '{status}_count' (eg.'completed_count') depending on print outcome
-    user_data[f"{status}_count"] = getattr(user, f"{status}_count") + 1
-    user_data["user_score"] = user.user_score + score_increments[status]
-    rep_data[f"slice_{status}_count"] = getattr(user, f"slice_{status}_count") + 1
-
-    if user_data["user_score"] < 1:
-        user_data["user_score"] = 1
-    user_data["new_level"] = User.calculate_level_from_score(user_data["user_score"])
-
-    user.update(user_data)
-    rep.update(rep_data)
-
-    return True
-
-
-def validate_user(req_data):
-    user_level = check_user_id(req_data["user_id"])
-    if user_level is None:
-        return None, custom_response(status_code=400, details="user is not found")
-    return user_level, None
+    updated = User.record_print_outcomes([(user_id, rep_id, status)])
+    return {user_id, rep_id} <= updated
 
 
-def validate_rep(req_data, user_level):
-    if "rep_check" not in req_data:
-        req_data["rep_check"] = req_data["user_id"]
-    if not check_rep_id(req_data["rep_check"]) and user_level == "basic":
-        return custom_response(
-            status_code=400, details="rep is incorrect or not permitted to check prints"
+def apply_transition(job_id, expected_status, values):
+    """
+    Function to atomically move a job out of an expected status
+    :param int job_id: PK of the job record
+    :param JobStatus expected_status: the status the job has to be in
+    :param dict values: the column values to set on the job
+    :return tuple result: (updated job, None) or (None, error response)
+    """
+    job = PrintJob.transition(job_id, expected_status, values)
+    if job is None:
+        return None, transition_error(
+            PrintJob.get_print_job_by_id(job_id), expected_status
         )
-    return None
+    return job, None
 
 
-def set_request_status(req_data, user_level):
-    if user_level == "advanced":
-        req_data["status"] = "approval"
-        if "stl_slug" not in req_data:
-            return custom_response(status_code=404, details="stl slug needed")
-    else:
-        req_data["status"] = "queued"
-    return None
-
-
-def set_default_values(req_data):
-    if "filament_usage" not in req_data:
-        req_data["filament_usage"] = 0
-    if "print_time" not in req_data:
-        req_data["print_time"] = 0
+def record_finished_jobs(jobs, status, printer_counter=None):
+    """
+    Function to apply the side effects of many jobs finishing at once: one printer telemetry update,
+    one score update and one email task for all of them
+    :param list jobs: the finished jobs
+    :param str status: "completed", "failed", "rejected" or None to skip the emails and scores
+    :param str printer_counter: optional printer counter to increment along with the time and filament
+    :return set missing: the PKs of the users and reps that could not be emailed or scored
+    """
+    if printer_counter:
+        Printer.increment_many(
+            [
+                (
+                    job.printer,
+                    {
+                        "total_time_printed": job.print_time,
+                        printer_counter: 1,
+                        "total_filament_used": job.filament_usage,
+                    },
+                )
+                for job in jobs
+                if job.printer is not None
+            ]
+        )
+    if not status or not jobs:
+        return set()
+    missing = email_many([(job.user_id, job.print_name, status) for job in jobs])
+    outcomes = [(job.user_id, job.rep_check, status) for job in jobs]
+    updated = User.record_print_outcomes(outcomes)
+    missing |= {u_id for user_id, rep_id, _ in outcomes for u_id in (user_id, rep_id)} - updated
+    return missing
 
 
-def validate_job_exists(job):
+def get_batch_results(job_ids, jobs, expected_status):
+    """
+    Function to build the result of a batch action for every requested job id
+    :param list job_ids: the requested PKs in request order
+    :param list jobs: the jobs the action was applied to
+    :param JobStatus expected_status: the status the jobs had to be in
+    :return list results: the serialized job or the error code and message for each id
+    """
+    updated = {job.id: job for job in jobs}
+    current = PrintJob.get_print_jobs_by_ids([j_id for j_id in job_ids if j_id not in updated])
+    results = []
+    for job_id in job_ids:
+        if job_id in updated:
+            results.append(
+                {"id": job_id, "status": "success", "print_job": serialize_print_job(updated[job_id])}
+            )
+        elif job_id in current:
+            results.append(
+                {
+                    "id": job_id,
+                    "status": "error",
+                    "code": 409,
+                    "message": f"Job is {current[job_id].status.name}. Expected {expected_status.name}.",
+                }
+            )
+        else:
+            results.append(
+                {"id": job_id, "status": "error", "code": 404, "message": JOB_NOT_FOUND}
+            )
+    return results
+
+
+def transition_error(job, expected_status):
+    """
+    Function to explain why a transition did not apply, only called once it has already failed
+    :param job: the current job object or None if it does not exist
+    :param JobStatus expected_status: the status the job had to be in
+    :return response: 404 if the job does not exist, otherwise 409
+    """
     if not job:
         return custom_response(status_code=404, details=JOB_NOT_FOUND)
-    return None
-
-
-def validate_job_status(job, expected_status):
-    if job.status != expected_status:
-        return custom_response(
-            status_code=400, details=f"Disallowed status. Expected {expected_status}."
-        )
-    return None
+    return custom_response(
+        status_code=409,
+        details=f"Job is {job.status.name}. Expected {expected_status.name}.",
+    )
 
 
-def validate_create_input(req_data):
-    user_level = check_user_id(req_data["user_id"])
+def validate_create_input(req_data, user_level):
     if user_level is None:
         return custom_response(status_code=400, details="user is not found")
 
@@ -513,21 +1040,9 @@ def validate_start_queued_input(req_data):
     return request_dict
 
 
-def validate_printer(printer_id, job):
-    if not check_printer_id(printer_id):
-        return custom_response(status_code=404, details="Printer Not Found")
-    if Printer.get_printer_by_id(printer_id).PrinterType != job.PrinterType:
-        return custom_response(status_code=400, details="Printer Type mismatch")
-    if running_on_printer(printer_id):
-        return custom_response(status_code=400, details="Associated Printer is in use")
-    return None
-
-
 def update_printer_telemetry(job, printer_increment_values):
-    ser_printer = increment_printer_details(
-        Printer.get_printer_by_id(job.printer), printer_increment_values
-    )
-    if ser_printer is None:
+    ser_printer = increment_printer_details(job.printer, printer_increment_values)
+    if ser_printer is None or isinstance(ser_printer, Response):
         return custom_response(status_code=400, details="Printer Increment Error")
     return None
 
@@ -543,22 +1058,6 @@ def update_user_and_rep_scores(job):
     return None
 
 
-def validate_input(requeue, job):
-    if requeue not in ["yes", "no"]:
-        return custom_response(
-            status_code=400,
-            details="Invalid Parameters in Request",
-            extra_info="Requeue needs to be yes or no",
-        )
-
-    if not job:
-        return custom_response(status_code=404, details=JOB_NOT_FOUND)
-
-    if job.status != JobStatus.running:
-        return custom_response(status_code=400, details="Job not running")
-    return None
-
-
 def handle_printer_details(job):
     printer_increment_values = {
         "total_time_printed": job.print_time,
@@ -566,21 +1065,12 @@ def handle_printer_details(job):
         "total_filament_used": job.filament_usage,
     }
 
-    return increment_printer_details(
-        Printer.get_printer_by_id(job.printer), printer_increment_values
-    )
+    return increment_printer_details(job.printer, printer_increment_values)
 
 
-def handle_requeue(job):
-    queue_notes = job.queue_notes.splitlines()
-    requeue_lines = [x for x in queue_notes if "Requeue #" in x]
-    if not requeue_lines:
-        queue_notes.append("Requeue #1")
-    else:
-        requeue_n = int(re.findall(r"\d+", requeue_lines[-1])[0])
-        queue_notes.append(f"Requeue #{requeue_n + 1}")
-
-    return {"status": JobStatus.queued.name, "queue_notes": "\n".join(queue_notes)}
+def handle_requeue():
+    # The count is incremented by the database so it is right however many requeues race
+    return {"status": JobStatus.queued, "requeue_count": PrintJob.requeue_count + 1}
 
 
 def handle_failure(job):
@@ -591,8 +1081,4 @@ def handle_failure(job):
         return custom_response(status_code=404, details=USER_ID_ERROR)
     if not score_result:
         return custom_response(status_code=404, details=STATUS_ERROR)
-
-    return {
-        "status": JobStatus.failed.name,
-        "date_ended": datetime.now().isoformat(),
-    }
+    return None
@@ -1,12 +1,18 @@
-from flask import request, Blueprint
+from flask import request, Blueprint, Response
 from flask_jwt_extended import jwt_required
 from marshmallow.exceptions import ValidationError
 
-from print_api.common.routing import custom_response
-from print_api.models import Printer, PrinterSchema
+from print_api.common.eta import invalidate_estimates
+from print_api.common.etags import conditional
+from print_api.common.printer_stats import get_printer_stats
+from print_api.common.routing import custom_response, get_day_range
+from print_api.common.serializers import compile_serializer
+from print_api.common.unit_of_work import after_commit
+from print_api.models import Printer, PrinterSchema, PrintJob
 
 printer_api = Blueprint("printers", __name__)
 printer_schema = PrinterSchema()
+serialize_printer = compile_serializer(printer_schema)
 
 NOTFOUNDPRINTER = "printer(s) not found"
 
@@ -48,8 +54,12 @@ def increment_by_id(printer_id):
         Response: error or serialized incremented printer
     """
     req_data = request.get_json()
-    printer = Printer.get_printer_by_id(printer_id)
-    return increment_printer_details(printer, req_data)
+    ser_printer = increment_printer_details(printer_id, req_data)
+    if ser_printer is None:
+        return custom_response(status_code=404, details=NOTFOUNDPRINTER)
+    if isinstance(ser_printer, Response):
+        return ser_printer
+    return custom_response(status_code=200, details=ser_printer)
 
 
 @printer_api.route("/printer/<string:printer_name>/increment", methods=["PUT"])
@@ -62,14 +72,17 @@ def increment_by_name(printer_name):
     """
     req_data = request.get_json()
     printer = Printer.get_printer_by_name(printer_name)
-    ser_printer = increment_printer_details(printer, req_data)
+    ser_printer = increment_printer_details(printer.id if printer else None, req_data)
     if ser_printer is None:
         return custom_response(status_code=404, details=NOTFOUNDPRINTER)
+    if isinstance(ser_printer, Response):
+        return ser_printer
     return custom_response(status_code=200, details=ser_printer)
 
 
 @printer_api.route("/printer", methods=["GET"])
 @jwt_required()
+@conditional("printers")
 def view_all_printers():
     """
     Function to view all printer records in the database
@@ -78,8 +91,33 @@ def view_all_printers():
     return get_multiple_printer_details(Printer.get_all_printers())
 
 
+@printer_api.route("/occupancy", methods=["GET"])
+@jwt_required()
+@conditional("printers", "print_jobs")
+def view_occupancy():
+    """
+    Function to view whether each printer is busy or idle, and which job it is running
+    :return response: serialized occupancy of every printer
+    """
+    occupancy = []
+    for printer, job_id in PrintJob.get_printer_occupancy():
+        occupancy.append(
+            {
+                "id": printer.id,
+                "printer_name": printer.printer_name,
+                "printer_type": printer.printer_type.name,
+                "location": printer.location.name,
+                "busy": job_id is not None,
+                "job_id": job_id,
+            }
+        )
+    final_res = {"printers": occupancy}
+    return custom_response(status_code=200, details=final_res, extra_info="success")
+
+
 @printer_api.route("/printer/<int:printer_id>", methods=["GET"])
 @jwt_required()
+@conditional("printers")
 def view_by_id(printer_id):
     """
     Function to view a printer record in the database
@@ -89,8 +127,28 @@ def view_by_id(printer_id):
     return get_printer_details(Printer.get_printer_by_id(printer_id))
 
 
+@printer_api.route("/printer/<int:printer_id>/stats", methods=["GET"])
+@jwt_required()
+def view_stats_by_id(printer_id):
+    """
+    Function to view the utilization, mean time between failures and daily filament use of a
+    printer over the ?since= and ?until= dates (default the last 90 days)
+    :param int printer_id: PK of the printer record
+    :return response: error or the printer stats
+    """
+    if Printer.get_printer_by_id(printer_id) is None:
+        return custom_response(status_code=404, details=NOTFOUNDPRINTER)
+    try:
+        since, until = get_day_range()
+    except ValueError as err:
+        return custom_response(status_code=400, details=str(err))
+    final_res = get_printer_stats(printer_id, since, until)
+    return custom_response(status_code=200, details=final_res, extra_info="success")
+
+
 @printer_api.route("/printer/<string:printer_name>", methods=["GET"])
 @jwt_required()
+@conditional("printers")
 def view_by_name(printer_name):
     """
     Function to view a printer record in the database
@@ -149,8 +207,11 @@ def create():
 
     printer = Printer(data)
     printer.save()
+    # Queue estimates depend on how many printers of the type there are
+    printer_type = printer.printer_type.name
+    after_commit(lambda: invalidate_estimates(printer_type))
     return custom_response(
-        status_code=200, extra_info="success", details=printer_schema.dump(printer)
+        status_code=200, extra_info="success", details=serialize_printer(printer)
     )
 
 
@@ -162,7 +223,9 @@ def delete_printer(printer):
     """
     if not printer:
         return custom_response(status_code=404, details=NOTFOUNDPRINTER)
+    printer_type = printer.printer_type.name
     printer.delete()
+    after_commit(lambda: invalidate_estimates(printer_type))
     return custom_response(status_code=200, extra_info="deleted")
 
 
@@ -174,7 +237,7 @@ def get_printer_details(printer):
     """
     if not printer:
         return custom_response(status_code=404, details=NOTFOUNDPRINTER)
-    ser_printer = printer_schema.dump(printer)
+    ser_printer = serialize_printer(printer)
     return custom_response(status_code=200, details=ser_printer, extra_info="success")
 
 
@@ -195,59 +258,42 @@ def update_printer_details(printer, req_data):
         print(err.messages)
         print(err.valid_data)  # => {"name": "John"}
         return custom_response(status_code=400, details=err.messages)
+    old_type = printer.printer_type.name
     printer.update(data)
-    ser_printer = printer_schema.dump(printer)
+    new_type = printer.printer_type.name
+    if new_type != old_type:
+        # Both types have their printer count changed
+        after_commit(lambda: invalidate_estimates(old_type))
+        after_commit(lambda: invalidate_estimates(new_type))
+    ser_printer = serialize_printer(printer)
     return custom_response(status_code=200, details=ser_printer, extra_info="success")
 
 
-def increment_printer_details(printer, req_data):
+def increment_printer_details(printer_id, req_data):
     """
-    Function to take a dictionary of values, and increment the printer telemetry by those values
-    :param printer: the printer object to increment
+    Function to take a dictionary of values, and increment the printer telemetry by those values.
+    The increment is done by the database so concurrent increments are never lost.
+    :param int printer_id: PK of the printer to increment
     :param dict req_data: the dictionary of values used to increment the printer
     :return response: error or serialized updated printer
     """
-    allowed_keys = (
-        "total_time_printed",
-        "completed_prints",
-        "failed_prints",
-        "total_filament_used",
-        "days_on_time",
-    )
-    if not printer:
+    if printer_id is None:
         return None  # Printer not found
 
-    # Calculating what data to fetch from printer model
-    request_dict = {k: req_data[k] for k in allowed_keys if k in req_data}
-
-    # Removing non incrementable values from the printer dict using the keys
-    # to be incremented from the request
-    printer_data = printer.get_model_dict()
-    printer_values = {
-        k: printer_data[k] for k in request_dict.keys() if k in printer_data
-    }
-
-    # Iterate over both dictionaries and increment the printer values by the
-    # request values
-    incremented_items = {}
-    for (_, p_value), (i_key, i_value) in zip(
-        printer_values.items(), request_dict.items()
-    ):
-        if p_value is None:
-            p_value = int(i_value)
-        else:
-            p_value += int(i_value)
-        incremented_items[i_key] = p_value
-    # Try and load printer data to the schema
+    # Only keep the incrementable telemetry values from the request
     try:
-        data = printer_schema.load(incremented_items, partial=True)
-    except ValidationError as err:
-        # => {"email": ['"foo" is not a valid email address.']}
-        print(err.messages)
-        print(err.valid_data)  # => {"name": "John"}
-        return custom_response(status_code=400, details=err.messages)
-    printer.update(data)
-    ser_printer = printer_schema.dump(printer)
+        increments = {
+            k: int(req_data[k]) for k in Printer.TELEMETRY_FIELDS if k in req_data
+        }
+    except (TypeError, ValueError):
+        return custom_response(
+            status_code=400, details="Increment values must be integers"
+        )
+
+    printer = Printer.increment(printer_id, increments)
+    if printer is None:
+        return None  # Printer not found
+    ser_printer = serialize_printer(printer)
     return ser_printer
 
 
@@ -257,8 +303,5 @@ def get_multiple_printer_details(printers):
     :param printers: the query object containing printers
     :return response: error or a list of serialized printers
     """
-    jason = []
-    for printer in printers:
-        jason.append(printer_schema.dump(printer))
-    final_res = {"printers": jason}
+    final_res = {"printers": [serialize_printer(printer) for printer in printers]}
     return custom_response(status_code=200, details=final_res, extra_info="success")
@@ -2,7 +2,8 @@ from flask import request, Blueprint
 from flask_jwt_extended import jwt_required
 from marshmallow.exceptions import ValidationError
 
-from print_api.common.routing import custom_response
+from print_api.common.etags import conditional
+from print_api.common.routing import custom_response, is_stream_requested, streaming_response
 from print_api.models import User, UserSchema
 
 user_api = Blueprint("users", __name__)
@@ -37,6 +38,7 @@ def update_by_email(user_email):
 
 @user_api.route("/user/<int:user_id>", methods=["GET"])
 @jwt_required()
+@conditional("users")
 def view_by_id(user_id):
     """
     Function to serialize a user via their ID
@@ -48,6 +50,7 @@ def view_by_id(user_id):
 
 @user_api.route("/user/<string:user_email>", methods=["GET"])
 @jwt_required()
+@conditional("users")
 def view_by_email(user_email):
     """
     Function to serialize a user via their email
@@ -83,11 +86,16 @@ def delete_by_email(user_email):
 
 @user_api.route("/user", methods=["GET"])
 @jwt_required()
+@conditional("users")
 def view_all_users():
     """
-    Function to serialize all users
+    Function to serialize all users, use ?stream=true to stream them instead
     :return response: error or serialized user
     """
+    if is_stream_requested():
+        return streaming_response(
+            "users", User.stream_users(), User.to_dict, extra_info="success"
+        )
     return get_multiple_user_details(User.get_all_users())
 
 
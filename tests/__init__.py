@@ -1,3 +1,5 @@
 import tests.conftest
 import tests.api.test_users
 import tests.api.test_factory_and_misc
+import tests.api.test_print_jobs
+import tests.api.test_printers
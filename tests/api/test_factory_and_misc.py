@@ -1,4 +1,8 @@
+from sqlalchemy import text
+
 from print_api import create_app
+from print_api.common.unit_of_work import after_commit, after_rollback
+from print_api.models import db
 from tests.conftest import check_response
 
 
@@ -15,3 +19,17 @@ def test_451(app, client):
 def test_418(app, client):
     response = client.make_request('get', "misc/toast")
     check_response(res=response, exp_status_code=418, exp_details=None, exp_extra_info="sweet cheeks")
+
+
+def test_after_rollback_runs_only_on_rollback(app):
+    calls = []
+    db.session.execute(text("SELECT 1"))  # rolling back needs a transaction in progress
+    after_commit(lambda: calls.append("commit"))
+    after_rollback(lambda: calls.append("rollback"))
+    db.session.rollback()
+    assert calls == ["rollback"]
+
+    after_commit(lambda: calls.append("commit"))
+    after_rollback(lambda: calls.append("rollback"))
+    db.session.commit()
+    assert calls == ["rollback", "commit"]
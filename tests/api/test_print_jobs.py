@@ -0,0 +1,521 @@
+import gzip
+import json
+from datetime import datetime, timedelta, timezone
+
+from tests.conftest import check_response
+from print_api.common.analytics import refresh_rollups
+from print_api.common.autoreview import AutoreviewPolicy
+from print_api.common.exports import export_job_history
+from print_api.common.imports import import_jobs
+from print_api.models import (
+    AnalyticsWatermark,
+    ArchivedPrintJob,
+    DailyJobStats,
+    PrintJob,
+    PrintJobEvent,
+    PrintJobSchema,
+    PrintJobTombstone,
+    Printer,
+    PrinterDailyStats,
+    PrinterLocation,
+    PrinterType,
+    RepDailyStats,
+    User,
+    db,
+)
+from print_api.models.print_jobs import JobStatus, ProjectTypes
+
+
+def empty_database():
+    db.session.query(PrintJobEvent).delete()
+    db.session.query(PrintJobTombstone).delete()
+    db.session.query(ArchivedPrintJob).delete()
+    db.session.query(PrintJob).delete()
+    db.session.query(User).delete()
+    db.session.commit()
+
+
+def make_user():
+    return User(
+        {
+            "name": "Test User",
+            "email": "user@test.com",
+            "uid": "test_1",
+            "short_name": "Test",
+            "user_score": 1,
+            "is_rep": True,
+            "score_editable": True,
+            "completed_count": 0,
+            "failed_count": 0,
+            "rejected_count": 0,
+            "slice_completed_count": 0,
+            "slice_failed_count": 0,
+            "slice_rejected_count": 0,
+        }
+    )
+
+
+def seed_user():
+    user = make_user()
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def seed_jobs(n):
+    empty_database()
+    user = seed_user()
+
+    for i in range(1, n + 1):
+        job_params = {
+            "gcode_slug": f"gcode_{i}",
+            "filament_usage": i,
+            "print_name": f"Test Print {i}",
+            "print_time": 60 * i,
+            "printer_type": PrinterType.prusa,
+            "project": ProjectTypes.personal,
+            "user_id": user.id,
+            "rep_check": user.id,
+            "status": JobStatus.approval,
+            "stl_slug": f"stl_{i}",
+        }
+        db.session.add(PrintJob(job_params))
+    db.session.commit()
+
+    return PrintJob.query.order_by(PrintJob.date_added, PrintJob.id).all()
+
+
+def test_get_all_jobs_paginated(app, client):
+    jobs = seed_jobs(5)
+
+    response = client.make_request("get", "prints/job?limit=2")
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert [j["id"] for j in data["payload"]["data"]["print_jobs"]] == [
+        jobs[0].id,
+        jobs[1].id,
+    ]
+    cursor = data["meta"]["next_cursor"]
+    assert cursor is not None
+
+    seen = [j["id"] for j in data["payload"]["data"]["print_jobs"]]
+    while cursor is not None:
+        response = client.make_request("get", f"prints/job?limit=2&after={cursor}")
+        data = json.loads(response.data)
+        seen += [j["id"] for j in data["payload"]["data"]["print_jobs"]]
+        cursor = data["meta"]["next_cursor"]
+
+    assert seen == [job.id for job in jobs]
+
+
+def test_get_all_jobs_streamed(app, client):
+    jobs = seed_jobs(3)
+
+    response = client.make_request("get", "prints/job?stream=true")
+    assert response.status_code == 200
+    assert response.is_streamed
+    data = json.loads(response.data)
+    assert [j["id"] for j in data["payload"]["data"]["print_jobs"]] == [job.id for job in jobs]
+    assert data["status"] == "success"
+    assert data["meta"]["version"] is not None
+
+
+def test_get_jobs_by_user_and_rep(app, client):
+    jobs = seed_jobs(3)
+    jobs[0].status = JobStatus.queued
+    db.session.commit()
+    user_id = jobs[0].user_id
+
+    response = client.make_request("get", f"prints/job/user/{user_id}?limit=2")
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert [j["id"] for j in data["payload"]["data"]["print_jobs"]] == [jobs[0].id, jobs[1].id]
+    assert data["meta"]["next_cursor"] is not None
+
+    response = client.make_request("get", f"prints/job/rep/{user_id}?status=queued")
+    data = json.loads(response.data)
+    assert [j["id"] for j in data["payload"]["data"]["print_jobs"]] == [jobs[0].id]
+
+    response = client.make_request("get", f"prints/job/user/{user_id}?status=nope")
+    assert response.status_code == 400
+    response = client.make_request("get", f"prints/job/rep/{user_id + 1000}")
+    assert response.status_code == 404
+
+
+def test_get_jobs_invalid_cursor(app, client):
+    response = client.make_request("get", "prints/job?after=not-a-cursor")
+    check_response(
+        res=response, exp_status_code=400, exp_details="Invalid cursor", exp_extra_info=None
+    )
+
+
+def test_get_jobs_invalid_limit(app, client):
+    response = client.make_request("get", "prints/job?limit=0")
+    check_response(
+        res=response,
+        exp_status_code=400,
+        exp_details="limit must be between 1 and 1000",
+        exp_extra_info=None,
+    )
+
+
+def test_action_wrong_status_conflict(app, client):
+    jobs = seed_jobs(1)
+    response = client.make_request("put", f"prints/job/{jobs[0].id}/accept")
+    check_response(
+        res=response,
+        exp_status_code=409,
+        exp_details="Job is approval. Expected under_review.",
+        exp_extra_info=None,
+    )
+
+
+def test_action_job_not_found(app, client):
+    empty_database()
+    response = client.make_request("put", "prints/job/1/accept")
+    check_response(
+        res=response, exp_status_code=404, exp_details="job(s) not found", exp_extra_info=None
+    )
+
+
+def test_delta_sync_reports_deleted_jobs(app, client):
+    jobs = seed_jobs(2)
+
+    response = client.make_request("get", "prints/job")
+    version = json.loads(response.data)["meta"]["version"]
+
+    response = client.make_request("delete", f"prints/job/{jobs[0].id}")
+    assert response.status_code == 200
+
+    response = client.make_request("get", f"prints/job?since={version}")
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert data["payload"]["data"] == {"print_jobs": [], "deleted": [jobs[0].id]}
+    assert data["meta"]["version"] > version
+
+
+def test_get_job_matches_schema_dump(app, client):
+    jobs = seed_jobs(1)
+
+    response = client.make_request("get", f"prints/job/{jobs[0].id}")
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert data["payload"]["data"] == PrintJobSchema().dump(jobs[0])
+
+
+def test_dispatch_shortest_job_to_printer(app, client):
+    jobs = seed_jobs(3)
+    for job in jobs:
+        job.status = JobStatus.queued
+    jobs[0].print_time = 100000
+    printer = Printer(
+        {
+            "printer_name": "Dispatch Printer",
+            "printer_type": PrinterType.prusa,
+            "location": PrinterLocation.diamond,
+        }
+    )
+    db.session.add(printer)
+    db.session.commit()
+
+    response = client.make_request("put", f"prints/job/dispatch/{printer.id}?policy=shortest")
+    assert response.status_code == 200
+    data = json.loads(response.data)["payload"]["data"]
+    assert data["id"] == jobs[1].id
+    assert data["status"] == "running"
+    assert data["printer"] == printer.id
+
+
+def test_dispatch_invalid_policy(app, client):
+    response = client.make_request("get", "prints/job/dispatch?policy=random")
+    check_response(
+        res=response,
+        exp_status_code=400,
+        exp_details="policy must be one of fifo, shortest, fair_share",
+        exp_extra_info=None,
+    )
+
+
+def test_queue_estimates_on_single_printer(app, client):
+    jobs = seed_jobs(2)
+    for job in jobs:
+        job.status = JobStatus.queued
+    db.session.query(Printer).filter(Printer.printer_type == PrinterType.prusa).delete()
+    db.session.add(
+        Printer(
+            {
+                "printer_name": "Estimate Printer",
+                "printer_type": PrinterType.prusa,
+                "location": PrinterLocation.diamond,
+            }
+        )
+    )
+    db.session.commit()
+
+    response = client.make_request("get", "prints/job/eta?printer_type=prusa")
+    assert response.status_code == 200
+    estimates = json.loads(response.data)["payload"]["data"]["estimates"]
+    assert [e["id"] for e in estimates] == [job.id for job in jobs]
+    assert estimates[1]["estimated_start"] == estimates[0]["estimated_finish"]
+
+
+def test_claim_oldest_queued_job(app, client):
+    jobs = seed_jobs(2)
+    for job in jobs:
+        job.status = JobStatus.queued
+    printers = [
+        Printer(
+            {
+                "printer_name": f"Claim Printer {i}",
+                "printer_type": PrinterType.prusa,
+                "location": PrinterLocation.diamond,
+            }
+        )
+        for i in range(3)
+    ]
+    db.session.add_all(printers)
+    db.session.commit()
+
+    claimed = []
+    for printer in printers[:2]:
+        response = client.make_request("post", "prints/job/claim", json={"printer": printer.id})
+        assert response.status_code == 200
+        claimed.append(json.loads(response.data)["payload"]["data"]["id"])
+    assert claimed == [job.id for job in jobs]
+
+    response = client.make_request("post", "prints/job/claim", json={"printer": printers[2].id})
+    check_response(
+        res=response,
+        exp_status_code=404,
+        exp_details="No queued jobs for this printer type",
+        exp_extra_info=None,
+    )
+
+
+def test_batch_accept_reports_each_job(app, client):
+    jobs = seed_jobs(3)
+    jobs[0].status = JobStatus.under_review
+    jobs[1].status = JobStatus.under_review
+    db.session.commit()
+    missing_id = jobs[2].id + 1000
+
+    response = client.make_request(
+        "put",
+        "prints/job/batch/accept",
+        json={"ids": [jobs[0].id, jobs[1].id, jobs[2].id, missing_id]},
+    )
+    assert response.status_code == 200
+    results = json.loads(response.data)["payload"]["data"]["results"]
+    assert [r["status"] for r in results] == ["success", "success", "error", "error"]
+    assert results[0]["print_job"]["status"] == "queued"
+    assert results[2]["code"] == 409
+    assert results[3]["code"] == 404
+
+
+def test_print_outcomes_clamp_the_summed_score(app):
+    empty_database()
+    user = seed_user()
+    for outcomes in (["failed", "completed"], ["completed", "failed"]):
+        user.user_score = 1
+        db.session.commit()
+        User.record_print_outcomes([(user.id, user.id, status) for status in outcomes])
+        db.session.commit()
+        db.session.refresh(user)
+        assert user.user_score == 1
+
+
+def test_batch_start_not_allowed(app, client):
+    response = client.make_request("put", "prints/job/batch/start", json={"ids": [1]})
+    check_response(
+        res=response, exp_status_code=400, exp_details="Invalid action", exp_extra_info=None
+    )
+
+
+def test_idempotent_action_is_replayed(app, client):
+    jobs = seed_jobs(1)
+    jobs[0].status = JobStatus.under_review
+    db.session.commit()
+    url = f"prints/job/{jobs[0].id}/accept"
+    key = f"test-accept-{jobs[0].id}"
+
+    first = client.make_request("put", url, headers={"Idempotency-Key": key})
+    assert first.status_code == 200
+
+    retry = client.make_request("put", url, headers={"Idempotency-Key": key})
+    assert retry.status_code == 200
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert json.loads(retry.data) == json.loads(first.data)
+
+
+def test_autoreview_policy_classification(app):
+    policy = AutoreviewPolicy(fail_threshold=0.1, start_threshold=5, time_threshold=3600)
+    rep = make_user()  # classifying needs no database
+
+    assert policy.classify(rep, 60) == JobStatus.under_review  # new rep
+    rep.slice_completed_count = 10
+    assert policy.classify(rep, 60) == JobStatus.queued
+    assert policy.classify(rep, 7200) == JobStatus.under_review  # long print
+    rep.slice_failed_count = 5
+    assert policy.classify(rep, 60) == JobStatus.under_review  # high failure rate
+    assert policy.classify(None, 60) == JobStatus.under_review
+
+
+def test_job_events_record_transitions(app, client):
+    jobs = seed_jobs(1)
+    jobs[0].status = JobStatus.under_review
+    db.session.commit()
+
+    client.make_request("put", f"prints/job/{jobs[0].id}/accept")
+    client.make_request("put", f"prints/job/{jobs[0].id}/review")
+
+    response = client.make_request("get", f"prints/job/{jobs[0].id}/events")
+    assert response.status_code == 200
+    events = json.loads(response.data)["payload"]["data"]["events"]
+    assert [(e["from_status"], e["to_status"]) for e in events] == [
+        ("under_review", "queued"),
+        ("queued", "under_review"),
+    ]
+    assert events[0]["actor"] is not None
+
+
+def test_archived_job_is_still_found(app, client):
+    jobs = seed_jobs(2)
+    jobs[0].status = JobStatus.completed
+    jobs[0].date_ended = datetime.now(timezone.utc) - timedelta(days=60)
+    db.session.commit()
+    job_id = jobs[0].id  # the row is gone once archived, so its id can no longer be reloaded
+
+    assert PrintJob.archive_finished(datetime.now(timezone.utc) - timedelta(days=30), 100) == 1
+    db.session.commit()
+    assert db.session.get(PrintJob, job_id) is None
+    assert db.session.get(PrintJobTombstone, job_id) is not None
+
+    response = client.make_request("get", f"prints/job/{job_id}")
+    assert response.status_code == 200
+    data = json.loads(response.data)["payload"]["data"]
+    assert data["status"] == "completed"
+
+
+def test_archived_jobs_stay_in_user_and_rep_listings(app, client):
+    jobs = seed_jobs(3)
+    jobs[1].status = JobStatus.completed
+    jobs[1].date_ended = datetime.now(timezone.utc) - timedelta(days=60)
+    db.session.commit()
+    job_ids, user_id = [job.id for job in jobs], jobs[0].user_id
+    PrintJob.archive_finished(datetime.now(timezone.utc) - timedelta(days=30), 100)
+    db.session.commit()
+
+    response = client.make_request("get", f"prints/job/user/{user_id}?limit=2")
+    data = json.loads(response.data)
+    assert [j["id"] for j in data["payload"]["data"]["print_jobs"]] == job_ids[:2]
+    cursor = data["meta"]["next_cursor"]
+    response = client.make_request("get", f"prints/job/user/{user_id}?limit=2&after={cursor}")
+    data = json.loads(response.data)
+    assert [j["id"] for j in data["payload"]["data"]["print_jobs"]] == job_ids[2:]
+    assert data["meta"]["next_cursor"] is None
+
+    response = client.make_request("get", f"prints/job/rep/{user_id}?status=completed")
+    data = json.loads(response.data)
+    assert [j["status"] for j in data["payload"]["data"]["print_jobs"]] == ["completed"]
+
+
+def test_search_jobs_ranks_best_match_first(app, client):
+    jobs = seed_jobs(3)
+    jobs[1].print_name = "Benchy Boat"
+    jobs[2].colour = "Benchy orange"
+    db.session.commit()
+
+    response = client.make_request("get", "prints/job/search?q=benchy&limit=1")
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert [job["id"] for job in data["payload"]["data"]["print_jobs"]] == [jobs[1].id]
+    assert data["meta"]["next_offset"] == 1
+
+    response = client.make_request("get", "prints/job/search?q=test%20user")
+    assert len(json.loads(response.data)["payload"]["data"]["print_jobs"]) == 3
+
+    response = client.make_request("get", "prints/job/search?q=")
+    assert response.status_code == 400
+
+
+def test_export_job_history_includes_archive(app, client, tmp_path):
+    app.config["EXPORT_LOCATION"] = str(tmp_path)
+    jobs = seed_jobs(2)
+    jobs[0].status = JobStatus.completed
+    jobs[0].date_ended = datetime.now(timezone.utc) - timedelta(days=60)
+    db.session.commit()
+    job_ids = [job.id for job in jobs]
+    PrintJob.archive_finished(datetime.now(timezone.utc) - timedelta(days=30), 100)
+    db.session.commit()
+
+    filename, rows = export_job_history("test", "ndjson")
+    assert rows == 2
+    with gzip.open(tmp_path / filename) as file:
+        exported = [json.loads(line) for line in file]
+    assert [row["id"] for row in exported] == job_ids
+    assert exported[0]["status"] == "completed"
+    assert exported[1]["user_name"] == "Test User"
+
+    response = client.make_request("post", "prints/job/export", json={"format": "xlsx"})
+    assert response.status_code == 400
+
+
+def test_import_jobs_skips_invalid_records(app):
+    empty_database()
+    user = seed_user()
+    record = {
+        "gcode_slug": "gcode",
+        "filament_usage": "10",
+        "print_name": "Imported",
+        "print_time": "600",
+        "printer_type": "prusa",
+        "project": "personal",
+        "user_email": user.email,
+    }
+    records = [
+        record,
+        {**record, "status": "completed"},
+        {**record, "user_email": "nobody@test.com"},
+        {**record, "print_time": "soon"},
+    ]
+
+    results = list(import_jobs(records, batch_size=3))
+    db.session.commit()
+    assert [count for count, _ in results] == [2, 0]
+    assert sorted(number for _, errors in results for number in errors) == [3, 4]
+
+    jobs = PrintJob.query.order_by(PrintJob.id).all()
+    assert [job.status for job in jobs] == [JobStatus.under_review, JobStatus.completed]
+    assert all(job.rep_check == user.id for job in jobs)
+
+
+def empty_analytics():
+    for model in (DailyJobStats, PrinterDailyStats, RepDailyStats, AnalyticsWatermark):
+        db.session.query(model).delete()
+    db.session.commit()
+
+
+def test_analytics_refresh_rebuilds_changed_days(client):
+    jobs = seed_jobs(2)
+    empty_analytics()
+    assert refresh_rollups(full=True)
+    db.session.commit()
+
+    response = client.make_request("get", "analytics/jobs/daily")
+    assert response.status_code == 200
+    days = response.json["payload"]["data"]
+    assert [day["jobs_added"] for day in days] == [2]
+
+    jobs[0].status = JobStatus.failed
+    jobs[0].date_ended = datetime.now(timezone.utc)
+    db.session.commit()
+    assert refresh_rollups()
+    db.session.commit()
+
+    response = client.make_request("get", "analytics/reps/failure-rate")
+    assert response.status_code == 200
+    reps = response.json["payload"]["data"]
+    assert [(rep["rep_id"], rep["failure_rate"]) for rep in reps] == [(jobs[0].rep_check, 1.0)]
+
+    response = client.make_request("get", "analytics/queue-wait?since=yesterday")
+    assert response.status_code == 400
@@ -0,0 +1,169 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+from print_api.common.printer_stats import compute_printer_stats
+from print_api.models import Printer, PrinterLocation, PrinterType, PrintJob, User, db
+from print_api.models.print_jobs import JobStatus, ProjectTypes
+
+
+def empty_database():
+    db.session.query(PrintJob).delete()
+    db.session.query(Printer).delete()
+    # Users go after the jobs that reference them
+    db.session.query(User).delete()
+    db.session.commit()
+
+
+def seed_printed_job(printer, user, status, started, ended, filament):
+    job = PrintJob(
+        {
+            "gcode_slug": "gcode",
+            "filament_usage": filament,
+            "print_name": "Test Print",
+            "print_time": int((ended - started).total_seconds()),
+            "printer_type": printer.printer_type,
+            "project": ProjectTypes.personal,
+            "user_id": user.id,
+            "rep_check": user.id,
+            "status": status,
+        }
+    )
+    job.printer = printer.id
+    job.date_started = started
+    job.date_ended = ended
+    db.session.add(job)
+
+
+def seed_printers(n):
+    empty_database()
+
+    for i in range(1, n + 1):
+        printer_params = {
+            "printer_name": f"Test Printer {i}",
+            "printer_type": PrinterType.prusa,
+            "location": PrinterLocation.diamond,
+            "total_time_printed": 0,
+            "completed_prints": 0,
+            "failed_prints": 0,
+            "total_filament_used": 0,
+            "days_on_time": 0,
+        }
+        db.session.add(Printer(printer_params))
+    db.session.commit()
+
+    return Printer.query.order_by(Printer.id).all()
+
+
+def test_increment_printer_by_id(app, client):
+    printer = seed_printers(1)[0]
+    url = f"printers/printer/{printer.id}/increment"
+
+    client.make_request("put", url, json={"completed_prints": 1, "total_time_printed": 60})
+    response = client.make_request(
+        "put", url, json={"completed_prints": 2, "total_filament_used": 5}
+    )
+
+    assert response.status_code == 200
+    data = json.loads(response.data)["payload"]["data"]
+    assert data["completed_prints"] == 3
+    assert data["total_time_printed"] == 60
+    assert data["total_filament_used"] == 5
+    assert data["failed_prints"] == 0
+
+
+def test_increment_printer_without_telemetry(app, client):
+    printer = seed_printers(1)[0]
+
+    response = client.make_request(
+        "put", f"printers/printer/{printer.id}/increment", json={"printer_name": "Renamed"}
+    )
+
+    assert response.status_code == 200
+    data = json.loads(response.data)["payload"]["data"]
+    assert data["printer_name"] == "Test Printer 1"
+    assert data["completed_prints"] == 0
+
+
+def test_increment_many_printers(app, client):
+    printers = seed_printers(2)
+
+    Printer.increment_many(
+        [
+            (printers[0].id, {"completed_prints": 1}),
+            (printers[1].id, {"failed_prints": 1}),
+            (printers[0].id, {"completed_prints": 1}),
+        ]
+    )
+    db.session.commit()
+
+    assert Printer.get_printer_by_id(printers[0].id).completed_prints == 2
+    assert Printer.get_printer_by_id(printers[1].id).failed_prints == 1
+
+
+def test_view_occupancy_idle(app, client):
+    printers = seed_printers(2)
+
+    response = client.make_request("get", "printers/occupancy")
+
+    assert response.status_code == 200
+    data = json.loads(response.data)["payload"]["data"]["printers"]
+    assert [p["id"] for p in data] == [p.id for p in printers]
+    assert not any(p["busy"] for p in data)
+
+
+def test_view_printer_not_modified(app, client):
+    printer = seed_printers(1)[0]
+    url = f"printers/printer/{printer.id}"
+
+    response = client.make_request("get", url)
+    etag = response.headers["ETag"]
+
+    response = client.make_request("get", url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    client.make_request("put", f"{url}/increment", json={"completed_prints": 1})
+    response = client.make_request("get", url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+
+
+def test_printer_stats_merge_overlapping_jobs(app, client):
+    printer = seed_printers(1)[0]
+    user = User(
+        {
+            "name": "Test User",
+            "email": "user@test.com",
+            "uid": "test_1",
+            "short_name": "Test",
+            "user_score": 1,
+            "is_rep": True,
+            "score_editable": True,
+            "completed_count": 0,
+            "failed_count": 0,
+            "rejected_count": 0,
+            "slice_completed_count": 0,
+            "slice_failed_count": 0,
+            "slice_rejected_count": 0,
+        }
+    )
+    db.session.add(user)
+    db.session.flush()
+    day = (datetime.now(timezone.utc) - timedelta(days=2)).replace(hour=10, minute=0)
+    seed_printed_job(
+        printer, user, JobStatus.completed, day, day + timedelta(hours=1), 10
+    )
+    seed_printed_job(
+        printer, user, JobStatus.failed, day + timedelta(minutes=30), day + timedelta(hours=2), 5
+    )
+    db.session.commit()
+
+    stats = compute_printer_stats(printer.id, day.date(), day.date())
+    assert stats["busy_seconds"] == 2 * 60 * 60
+    assert stats["utilization"] == 2 / 24
+    assert (stats["completed_count"], stats["failed_count"]) == (1, 1)
+    assert stats["mtbf_seconds"] == 2 * 60 * 60
+    assert stats["filament_per_day"] == [{"day": day.date().isoformat(), "filament_used": 15}]
+
+    response = client.make_request("get", f"printers/printer/{printer.id + 1}/stats")
+    assert response.status_code == 404
+
+    empty_database()